@@ -1,12 +1,10 @@
 from flask import Flask, jsonify, request, send_from_directory
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from pymongo import MongoClient
+import logging
 import os
 import uuid
-import cv2
 from datetime import datetime
-from PIL import Image
 
 # Import configuration and routes
 from config import Config
@@ -17,43 +15,45 @@ from routes.area_map_routes import area_map_bp
 from routes.public_routes import public_bp
 from routes.hall_routes import hall_bp
 from routes.hierarchical_routes import hierarchical_bp
-from detection import detect_rects_by_color, detect_walls_by_lines, draw_overlay
-from detection_hierarchy import detect_rects_with_hierarchy, build_groups, draw_overlay_with_hierarchy
-from detection_subsections import detect_with_subsections
-from subsection_manager import detect_blue_divisions_in_booth, create_subsection_ids
-from yolo_detect import detect_booths
+from json_provider import FastJSONProvider
+from cache import document_cache
+from auth import admin_required
+from compression import init_compression
+from health import dependency_checker
+from metrics import init_metrics
+from stage_timer import StageTimer, init_server_timing, stage
+from logs import init_logging, init_request_ids
+from profiler import init_profiler
+from tracing import init_tracing
+from query_audit import init_query_audit
+from slow_queries import init_slow_query_log
+
+log = logging.getLogger(__name__)
 
 def create_app():
+    init_logging()
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = FastJSONProvider(app)
     
     # Initialize extensions
     jwt = JWTManager(app)
     CORS(app, origins=Config.CORS_ORIGINS)
+    init_compression(app)
+    init_request_ids(app)
+    init_query_audit(app)
+    init_tracing(app)
+    init_profiler(app)
+    init_slow_query_log(app)
+    init_metrics(app)
+    init_server_timing(app)
     
     # Upload directory
     UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
     os.makedirs(UPLOAD_DIR, exist_ok=True)
     
-    # Test MongoDB connection
-    try:
-        client = MongoClient(Config.MONGODB_URI)
-        db = client.get_default_database()
-        # Test connection
-        db.command('ping')
-        print("✅ MongoDB connection successful")
-        
-        # Create indexes for better performance
-        db.users.create_index([("username", 1)], unique=True)
-        db.users.create_index([("email", 1)], unique=True)
-        db.floorplans.create_index([("name", 1)])
-        db.floorplans.create_index([("user_id", 1)])
-        db.floorplans.create_index([("event_id", 1)])
-        db.floorplans.create_index([("last_modified", -1)])
-        
-    except Exception as e:
-        print(f"❌ MongoDB connection failed: {e}")
-        return None
+    # No database round trips here: the shared client (database.py) connects on first use,
+    # indexes are created by migrate.py (migrations.py) and /health/ready reports connectivity
     
     # Register API blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -83,6 +83,11 @@ def create_app():
             if not os.path.exists(file_path):
                 return jsonify({'message': 'File not found'}), 400
             
+            # The CV stack (OpenCV, PIL, YOLO) is imported on first use, not at startup
+            from PIL import Image
+            from detection import detect_rects_by_color, detect_walls_by_lines, draw_overlay
+            from yolo_detect import detect_booths
+            
             # Get image dimensions
             try:
                 with Image.open(file_path) as img:
@@ -97,18 +102,24 @@ def create_app():
                 backend_choice = (backend_choice or 'yolo').strip().lower()
 
                 # Enhanced detection parameters for better accuracy
-                if backend_choice == 'opencv':
-                    rects = detect_rects_by_color(file_path, min_area=400)  # Lower threshold for better detection
-                else:
-                    # default to YOLO
-                    rects = detect_booths(file_path, conf=0.25, iou=0.4)  # More sensitive detection
+                with StageTimer('opencv' if backend_choice == 'opencv' else 'yolo') as timer:
+                    with stage('booths') as booths:
+                        if backend_choice == 'opencv':
+                            rects = detect_rects_by_color(file_path, min_area=400)  # Lower threshold for better detection
+                        else:
+                            # default to YOLO
+                            rects = detect_booths(file_path, conf=0.25, iou=0.4)  # More sensitive detection
+                        booths.candidates = len(rects)
 
-                walls = detect_walls_by_lines(file_path, min_line_len=40)  # Detect shorter walls too
-                
-                # Generate overlay
-                overlay_filename = f"{uuid.uuid4()}_overlay.png"
-                overlay_path = os.path.join(UPLOAD_DIR, overlay_filename)
-                draw_overlay(file_path, rects, walls, overlay_path)
+                    with stage('walls') as walls_stage:
+                        walls = detect_walls_by_lines(file_path, min_line_len=40)  # Detect shorter walls too
+                        walls_stage.candidates = len(walls)
+                    
+                    # Generate overlay
+                    overlay_filename = f"{uuid.uuid4()}_overlay.png"
+                    overlay_path = os.path.join(UPLOAD_DIR, overlay_filename)
+                    with stage('overlay'):
+                        draw_overlay(file_path, rects, walls, overlay_path)
                 
                 # Enhanced response with detection quality metrics
                 return jsonify({
@@ -123,12 +134,13 @@ def create_app():
                         'total_structures': len(rects),
                         'colored_structures': len([r for r in rects if r.get('color_name', 'unknown') != 'unknown']),
                         'edge_structures': len([r for r in rects if r.get('type') == 'edge']),
-                        'average_confidence': round(sum(r.get('score', 0) for r in rects) / len(rects), 3) if rects else 0
+                        'average_confidence': round(sum(r.get('score', 0) for r in rects) / len(rects), 3) if rects else 0,
+                        'timings': timer.summary()
                     }
                 }), 200
                 
             except Exception as e:
-                print(f"Detection error: {e}")
+                log.exception("Detection error: %s", e)
                 # Return empty results on detection error
                 return jsonify({
                     'rects': [],
@@ -187,33 +199,44 @@ def create_app():
             if not os.path.exists(file_path):
                 return jsonify({'error': 'file not found'}), 400
             
-            # Get image dimensions
-            image = cv2.imread(file_path)
-            if image is None:
-                return jsonify({'error': 'invalid image file'}), 400
-            
-            h, w = image.shape[:2]
-            
-            # Run hierarchy detection
-            rects = detect_rects_with_hierarchy(file_path, min_area=400)
-            groups = build_groups(rects)
+            import cv2
+            from detection_hierarchy import detect_rects_with_hierarchy, build_groups, draw_overlay_with_hierarchy
             
-            if not rects:
-                return jsonify({
-                    'rects': [],
-                    'groups': {},
-                    'imageWidth': w,
-                    'imageHeight': h,
-                    'overlay': None,
-                    'filename': filename,
-                    'message': 'No booth hierarchies detected'
-                }), 200
-            
-            # Generate overlay
-            overlay_name = f"{uuid.uuid4().hex}_hier_overlay.png"
-            overlay_path = os.path.join(UPLOAD_DIR, overlay_name)
-            
-            if draw_overlay_with_hierarchy(file_path, rects, overlay_path):
+            with StageTimer('hierarchy') as timer:
+                # Get image dimensions
+                with stage('dimensions'):
+                    image = cv2.imread(file_path)
+                if image is None:
+                    return jsonify({'error': 'invalid image file'}), 400
+                
+                h, w = image.shape[:2]
+                
+                # Run hierarchy detection
+                with stage('rects') as rects_stage:
+                    rects = detect_rects_with_hierarchy(file_path, min_area=400)
+                    rects_stage.candidates = len(rects)
+                with stage('groups') as groups_stage:
+                    groups = build_groups(rects)
+                    groups_stage.candidates = len(groups)
+                
+                if not rects:
+                    return jsonify({
+                        'rects': [],
+                        'groups': {},
+                        'imageWidth': w,
+                        'imageHeight': h,
+                        'overlay': None,
+                        'filename': filename,
+                        'message': 'No booth hierarchies detected'
+                    }), 200
+                
+                # Generate overlay
+                overlay_name = f"{uuid.uuid4().hex}_hier_overlay.png"
+                overlay_path = os.path.join(UPLOAD_DIR, overlay_name)
+                
+                with stage('overlay'):
+                    overlay_drawn = draw_overlay_with_hierarchy(file_path, rects, overlay_path)
+            if overlay_drawn:
                 overlay_url = f"/uploads/{overlay_name}"
             else:
                 overlay_url = None
@@ -224,7 +247,8 @@ def create_app():
                 'imageWidth': w,
                 'imageHeight': h,
                 'overlay': overlay_url,
-                'filename': filename
+                'filename': filename,
+                'detection_summary': {'timings': timer.summary()}
             }), 200
             
         except Exception as e:
@@ -243,8 +267,13 @@ def create_app():
             if not os.path.exists(file_path):
                 return jsonify({'error': 'file not found'}), 400
             
+            import cv2
+            from detection_subsections import detect_with_subsections
+            
             # Run subsection detection
-            result = detect_with_subsections(file_path)
+            with StageTimer('subsections'), stage('booths') as booths:
+                result = detect_with_subsections(file_path)
+                booths.candidates = len(result['booths'])
             
             # Get image dimensions
             image = cv2.imread(file_path)
@@ -277,7 +306,10 @@ def create_app():
                 return jsonify({'error': 'File not found'}), 400
             
             # Detect subsections
-            subsections = detect_blue_divisions_in_booth(file_path, booth_bounds)
+            from subsection_manager import detect_blue_divisions_in_booth, create_subsection_ids
+            with StageTimer('booth_subsections'), stage('divisions') as divisions:
+                subsections = detect_blue_divisions_in_booth(file_path, booth_bounds)
+                divisions.candidates = len(subsections)
             
             if not subsections:
                 return jsonify({'subsections': [], 'message': 'No divisions detected'}), 200
@@ -327,28 +359,45 @@ def create_app():
         data = request.get_json()
         return jsonify({'message': 'Layout saved successfully'}), 200
     
-    # Health check endpoint
+    # Health checks read the status kept by the background dependency checker (health.py);
+    # none of them touches the database
+    @app.route('/health/live')
+    def liveness():
+        # The process is up and serving requests
+        return jsonify({'status': 'alive'}), 200
+    
+    @app.route('/health/ready')
+    def readiness():
+        status = dependency_checker.status()
+        return jsonify(status), 200 if status['ready'] else 503
+    
     @app.route('/health')
     def health_check():
-        try:
-            # Test database connection
-            client = MongoClient(Config.MONGODB_URI)
-            db = client.get_default_database()
-            db.command('ping')
-            
+        status = dependency_checker.status()
+        if status.get('reason') == 'starting':
+            # No check has finished yet; only /health/ready holds traffic back until one has
             return jsonify({
-                'status': 'healthy',
+                'status': 'starting',
                 'timestamp': datetime.utcnow().isoformat(),
-                'database': 'connected',
+                'database': 'unknown',
                 'version': '1.0.0'
             }), 200
-        except Exception as e:
-            return jsonify({
-                'status': 'unhealthy',
-                'timestamp': datetime.utcnow().isoformat(),
-                'database': 'disconnected',
-                'error': str(e)
-            }), 500
+        mongo = status.get('mongo') or {}
+        response = {
+            'status': 'healthy' if status['ready'] else 'unhealthy',
+            'timestamp': datetime.utcnow().isoformat(),
+            'database': 'connected' if mongo.get('ok') else 'disconnected',
+            'version': '1.0.0'
+        }
+        if not status['ready']:
+            response['error'] = mongo.get('error') or status.get('reason')
+        return jsonify(response), 200 if status['ready'] else 500
+    
+    # Document cache hit/miss counters of this worker
+    @app.route('/api/admin/cache/stats')
+    @admin_required
+    def cache_stats():
+        return jsonify(document_cache.stats()), 200
     
     # Root endpoint
     @app.route('/')
@@ -391,10 +440,10 @@ def create_app():
 if __name__ == '__main__':
     app = create_app()
     if app:
-        print("🚀 Starting IMTMA Flooring Backend...")
-        print(f"📊 Dashboard available at: http://localhost:5000/dashboard")
-        print(f"🔗 API available at: http://localhost:5000/api")
-        print(f"💚 Health check: http://localhost:5000/health")
+        log.info("Starting IMTMA Flooring Backend...")
+        log.info("Dashboard available at: http://localhost:5000/dashboard")
+        log.info("API available at: http://localhost:5000/api")
+        log.info("Health check: http://localhost:5000/health")
         app.run(debug=True, host='0.0.0.0', port=5000)
     else:
-        print("❌ Failed to start application - check MongoDB connection")
\ No newline at end of file
+        log.error("Failed to start application - check MongoDB connection")
\ No newline at end of file
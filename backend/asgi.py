@@ -0,0 +1,302 @@
+"""
+ASGI entry point with an async serving path for the public viewer reads.
+
+The public read endpoints spend almost all their time waiting on MongoDB.
+Here the hottest of them are served by async handlers on Motor, so one
+worker keeps thousands of viewers in flight on a single event loop instead
+of tying up a thread (or process) per request:
+
+    GET /api/public/floorplans/{id}            (incl. ?elements=none)
+    GET /api/public/floorplans/{id}/chunks
+    GET /api/public/halls
+    GET /api/public/halls/{id}/floorplans
+    GET /api/public/events/{event_id}/hierarchy
+
+Payloads, validators (ETag / 304) and cache entries are the same as on the
+Flask routes: the handlers reuse their pipelines and payload builders and
+share the document cache. Every other request (auth, admin and editing,
+detection, the dashboard, other methods) falls through to the unchanged
+Flask app, which runs in a thread pool behind a2wsgi.
+
+    cd backend
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+starlette, motor, a2wsgi and uvicorn are only needed for this entry point;
+the WSGI deployment (run.py) doesn't use them.
+"""
+
+import time
+from functools import wraps
+from contextlib import asynccontextmanager
+from bson import ObjectId
+from a2wsgi import WSGIMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.convertors import Convertor, register_url_convertor
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route, request_response
+from werkzeug.http import quote_etag, unquote_etag
+
+from app import create_app
+from config import Config
+from cache import document_cache
+from compression import COMPRESSIBLE_MIMETYPES, compressed_body, negotiate_encoding
+from metrics import REQUEST_LATENCY, IN_FLIGHT, mongo_command_listener
+from element_store import ELEMENT_CHUNKS_COLLECTION, CHUNK_ELEMENTS_PROJECTION, STORAGE_INLINE, chunk_query, merge_chunk_elements
+from read_models import PUBLISHED_FLOORPLANS_COLLECTION, refresh_published_floorplan
+from http_cache import (
+    document_etag, query_variant, public_cache_control, evaluate_conditional, validator_headers
+)
+from routes.floorplan_routes import get_db, public_floorplan_data
+from routes.hall_routes import (
+    PUBLIC_HALLS_CACHE, PUBLIC_HALL_FLOORPLANS_CACHE, PUBLIC_EVENT_HIERARCHY_CACHE,
+    HIERARCHY_FIELDS, HIERARCHY_VERSION_FIELDS,
+    public_halls_pipeline, public_hall_item, public_hall_floorplans_pipeline, public_hall_floorplan_item,
+    event_hierarchy_pipeline, collect_event_hierarchy, event_hierarchy, hierarchy_version, hierarchy_etag
+)
+
+flask_app = create_app()
+
+_motor_client = None
+
+
+def get_async_db():
+    """Motor database handle; one client (and connection pool) per worker process"""
+    global _motor_client
+    if _motor_client is None:
+        listeners = [mongo_command_listener] if Config.METRICS_ENABLED else []
+        _motor_client = AsyncIOMotorClient(Config.MONGODB_URI, event_listeners=listeners)
+    return _motor_client.get_default_database()
+
+
+class ObjectIdConvertor(Convertor):
+    """Path parameter matching ObjectIds only, so e.g. /public/floorplans/batch still reaches Flask"""
+    regex = '[0-9a-fA-F]{24}'
+
+    def convert(self, value: str) -> ObjectId:
+        return ObjectId(value)
+
+    def to_string(self, value: ObjectId) -> str:
+        return str(value)
+
+
+register_url_convertor('objectid', ObjectIdConvertor())
+
+
+def _json(payload, status_code: int = 200, headers=None) -> Response:
+    return Response(flask_app.json.dumps_bytes(payload) + b'\n', status_code, headers, media_type='application/json')
+
+
+def _validators(request, etag, last_modified):
+    """(304 response or None, validator headers) for a public read"""
+    headers = validator_headers(etag, last_modified, public_cache_control())
+    if evaluate_conditional(request.headers.get('if-none-match'), request.headers.get('if-modified-since'),
+                            etag, last_modified):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
+
+
+def _variant(request) -> str:
+    # Hash the raw query string exactly like the Flask routes, so validators are interchangeable
+    return query_variant(request.scope.get('query_string', b''))
+
+
+async def _published_floorplan(floorplan_id: ObjectId):
+    """Read model entry through the document cache (async twin of floorplan_routes._published_floorplan)"""
+    published = get_async_db()[PUBLISHED_FLOORPLANS_COLLECTION]
+
+    async def load():
+        document = await published.find_one({'_id': floorplan_id})
+        if document is None:
+            # Plans published before the read model existed are built on first access
+            document = await run_in_threadpool(refresh_published_floorplan, get_db(), floorplan_id)
+        return document
+
+    async def load_version():
+        return (await published.find_one({'_id': floorplan_id}, projection={'version': 1}) or {}).get('version')
+
+    return await document_cache.get_async(PUBLISHED_FLOORPLANS_COLLECTION, floorplan_id, load,
+                                          version_loader=load_version)
+
+
+async def _chunk_elements(floorplan):
+    cursor = get_async_db()[ELEMENT_CHUNKS_COLLECTION].find(chunk_query(floorplan), projection=CHUNK_ELEMENTS_PROJECTION)
+    return merge_chunk_elements(await cursor.to_list(None))
+
+
+async def public_floorplan(request):
+    try:
+        include_elements = request.query_params.get('elements', 'all') != 'none'
+        floorplan = await _published_floorplan(request.path_params['floorplan_id'])
+        if not floorplan:
+            return _json({'message': 'Floor plan not found or not published'}, 404)
+
+        etag = document_etag(floorplan['_id'], floorplan['version'], _variant(request))
+        not_modified, headers = _validators(request, etag, floorplan.get('last_modified'))
+        if not_modified:
+            return not_modified
+
+        # Cached documents are shared between requests, so work on copies from here on
+        floorplan = dict(floorplan, state=dict(floorplan['state']))
+        if include_elements and 'booth_details' not in floorplan:
+            # Chunked plans keep element payloads out of the read model
+            floorplan['state']['elements'] = await _chunk_elements(floorplan)
+
+        return _json({'floorplan': public_floorplan_data(floorplan, include_elements)}, headers=headers)
+    except Exception as e:
+        return _json({'message': 'Failed to get public floor plan', 'error': str(e)}, 500)
+
+
+async def public_floorplan_chunks(request):
+    try:
+        floorplan = await _published_floorplan(request.path_params['floorplan_id'])
+        if not floorplan:
+            return _json({'message': 'Floor plan not found or not published'}, 404)
+
+        return _json({
+            'floorplan_id': str(floorplan['_id']),
+            'version': floorplan['version'],
+            'storage': floorplan.get('storage', STORAGE_INLINE),
+            'chunks': floorplan.get('chunks', [])
+        })
+    except Exception as e:
+        return _json({'message': 'Failed to get element chunks', 'error': str(e)}, 500)
+
+
+async def public_halls(request):
+    try:
+        event_id = request.query_params.get('event_id')
+
+        async def load():
+            cursor = get_async_db().halls.aggregate(public_halls_pipeline(event_id))
+            return [public_hall_item(h) async for h in cursor]
+
+        halls = await document_cache.get_async(PUBLIC_HALLS_CACHE, event_id or '*', load,
+                                               ttl=Config.PUBLIC_HALLS_CACHE_TTL)
+        return _json({'success': True, 'halls': halls})
+    except Exception as e:
+        return _json({'message': 'Failed to list public halls', 'error': str(e)}, 500)
+
+
+async def public_hall_floorplans(request):
+    try:
+        hall_id = str(request.path_params['hall_id'])
+
+        async def load():
+            halls = await get_async_db().halls.aggregate(public_hall_floorplans_pipeline(hall_id)).to_list(1)
+            if not halls:
+                return None
+            return [public_hall_floorplan_item(fp) for fp in halls[0].get('floorplans', [])]
+
+        floorplans = await document_cache.get_async(PUBLIC_HALL_FLOORPLANS_CACHE, hall_id, load,
+                                                    ttl=Config.PUBLIC_HALLS_CACHE_TTL)
+        if floorplans is None:
+            return _json({'message': 'Hall not found'}, 404)
+        return _json({'success': True, 'floorplans': floorplans})
+    except Exception as e:
+        return _json({'message': 'Failed to list hall floorplans', 'error': str(e)}, 500)
+
+
+async def public_event_hierarchy(request):
+    try:
+        event_id = request.path_params['event_id']
+        halls = get_async_db().halls
+
+        async def load():
+            docs = await halls.aggregate(event_hierarchy_pipeline(event_id, HIERARCHY_FIELDS)).to_list(None)
+            return event_hierarchy(event_id, docs)
+
+        async def load_version():
+            docs = await halls.aggregate(event_hierarchy_pipeline(event_id, HIERARCHY_VERSION_FIELDS)).to_list(None)
+            return hierarchy_version(*collect_event_hierarchy(docs))
+
+        cached = await document_cache.get_async(PUBLIC_EVENT_HIERARCHY_CACHE, event_id, load,
+                                                version_loader=load_version)
+
+        etag, last_modified = hierarchy_etag(event_id, cached['version'], _variant(request))
+        not_modified, headers = _validators(request, etag, last_modified)
+        if not_modified:
+            return not_modified
+        return _json({'success': True, 'hierarchy': cached['hierarchy']}, headers=headers)
+    except Exception as e:
+        return _json({'message': 'Failed to get event hierarchy', 'error': str(e)}, 500)
+
+
+def _timed(handler):
+    """Request metrics like metrics.init_metrics records for Flask routes (blueprint 'asgi')"""
+    async def timed(request):
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        finally:
+            IN_FLIGHT.dec()
+            REQUEST_LATENCY.labels('asgi', handler.__name__, request.method, str(status)).observe(
+                time.perf_counter() - started)
+    return timed
+
+
+def _compressed(handler):
+    """Negotiated compression like compression.compress_response does for Flask routes"""
+    @wraps(handler)
+    async def compressed(request):
+        response = await handler(request)
+        if (response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+                or 'content-encoding' in response.headers or response.media_type not in COMPRESSIBLE_MIMETYPES
+                or len(response.body) < Config.COMPRESSION_MIN_SIZE):
+            return response
+
+        encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+        if 'accept-encoding' not in response.headers.get('vary', '').lower():
+            response.headers.add_vary_header('Accept-Encoding')
+        if encoding is None:
+            return response
+
+        etag, weak = unquote_etag(response.headers.get('etag'))
+        response.body = compressed_body(request.url.path, response.body, encoding, etag, weak)
+        response.headers['content-length'] = str(len(response.body))
+        response.headers['content-encoding'] = encoding
+        if etag:
+            # The compressed representation is not byte-identical to the identity one
+            response.headers['etag'] = quote_etag(etag, weak=True)
+        return response
+    return compressed
+
+
+def _route(path: str, handler, origins) -> Route:
+    """GET route with the CORS and compression behaviour of the matching Flask route"""
+    if Config.COMPRESSION_ENABLED:
+        handler = _compressed(handler)
+    endpoint = request_response(_timed(handler) if Config.METRICS_ENABLED else handler)
+    # Preflight requests don't match (GET only) and are answered by Flask-CORS
+    return Route(path, CORSMiddleware(endpoint, allow_origins=origins), methods=['GET'])
+
+
+# The hall map routes use @cross_origin() (any origin); floor plans follow CORS_ORIGINS
+ASYNC_ROUTES = [
+    _route('/api/public/floorplans/{floorplan_id:objectid}', public_floorplan, Config.CORS_ORIGINS),
+    _route('/api/public/floorplans/{floorplan_id:objectid}/chunks', public_floorplan_chunks, Config.CORS_ORIGINS),
+    _route('/api/public/halls', public_halls, ['*']),
+    _route('/api/public/halls/{hall_id:objectid}/floorplans', public_hall_floorplans, ['*']),
+    _route('/api/public/events/{event_id}/hierarchy', public_event_hierarchy, ['*']),
+]
+
+
+def create_asgi_app(wsgi_app) -> Starlette:
+    """Async routes first; everything else (and non-GET methods on those paths) goes to the WSGI app"""
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        if _motor_client is not None:
+            _motor_client.close()
+
+    return Starlette(routes=ASYNC_ROUTES + [Mount('/', app=WSGIMiddleware(wsgi_app))], lifespan=lifespan)
+
+
+app = create_asgi_app(flask_app)
@@ -1,9 +1,8 @@
 from functools import wraps
 from flask import jsonify, request
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
-from pymongo import MongoClient
 from bson import ObjectId
-import os
+from database import get_database
 
 def admin_required(f):
     @wraps(f)
@@ -12,9 +11,7 @@ def admin_required(f):
             verify_jwt_in_request()
             current_user_id = get_jwt_identity()
             
-            # Get MongoDB connection
-            client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-            db = client.get_default_database()
+            db = get_database()
             
             user = db.users.find_one({'_id': ObjectId(current_user_id)})
             if not user or user.get('role') != 'admin':
@@ -37,15 +34,25 @@ def login_required(f):
     
     return decorated_function
 
+def is_admin() -> bool:
+    """Whether the request carries a valid token of an admin user; never raises"""
+    try:
+        verify_jwt_in_request(optional=True)
+        current_user_id = get_jwt_identity()
+        if not current_user_id:
+            return False
+        user = get_database().users.find_one({'_id': ObjectId(current_user_id)}, {'role': 1})
+        return bool(user) and user.get('role') == 'admin'
+    except Exception:
+        return False
+
 def get_current_user():
     """Get current user data from JWT token"""
     try:
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
         
-        # Get MongoDB connection
-        client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-        db = client.get_default_database()
+        db = get_database()
         
         user = db.users.find_one({'_id': ObjectId(current_user_id)})
         if user:
@@ -0,0 +1,74 @@
+"""
+Batch reads: several documents of one collection in a single request.
+
+Ids come from ?ids=a,b,c, or from a JSON body {"ids": [...]} on POST for
+lists that don't fit a URL. The documents are read with one `$in` query and
+returned in request order, each with its own status:
+
+    {"id": ..., "status": 200, "etag": ..., "<key>": {...}}
+    {"id": ..., "status": 304, "etag": ...}     listed in If-None-Match
+    {"id": ..., "status": 404, "error": ...}    missing or not published
+    {"id": ..., "status": 400, "error": ...}    not an ObjectId
+
+so one bad id doesn't fail the whole batch. Invalid input for the batch as a
+whole (no ids, too many) raises ValueError; routes answer it with 400.
+"""
+
+from typing import Callable, Dict, List, Optional
+from bson import ObjectId
+from flask import request
+from config import Config
+from http_cache import etag_matches
+
+
+def parse_batch_ids() -> List[str]:
+    """Requested ids, deduplicated in request order"""
+    data = request.get_json(silent=True) if request.method == 'POST' else None
+    if data is not None:
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list):
+            raise ValueError('ids must be a list')
+    else:
+        ids = (request.args.get('ids') or '').split(',')
+
+    batch_ids = []
+    for item_id in ids:
+        item_id = str(item_id).strip()
+        if item_id and item_id not in batch_ids:
+            batch_ids.append(item_id)
+    if not batch_ids:
+        raise ValueError('ids is required')
+    if len(batch_ids) > Config.BATCH_MAX_IDS:
+        raise ValueError(f'At most {Config.BATCH_MAX_IDS} ids per batch')
+    return batch_ids
+
+
+def fetch_batch(collection, ids: List[str], query: Optional[Dict] = None,
+                projection: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Documents among ids that match query, keyed by string id, in one $in query"""
+    object_ids = [ObjectId(item_id) for item_id in ids if ObjectId.is_valid(item_id)]
+    if not object_ids:
+        return {}
+    cursor = collection.find(dict(query or {}, _id={'$in': object_ids}), projection=projection)
+    return {str(doc['_id']): doc for doc in cursor}
+
+
+def batch_items(ids: List[str], documents: Dict[str, Dict], key: str,
+                render: Callable[[Dict], Dict], etag: Callable[[Dict], str],
+                not_found_message: str) -> List[Dict]:
+    """Per-item results in request order; items the client already has come back as 304"""
+    items = []
+    for item_id in ids:
+        if not ObjectId.is_valid(item_id):
+            items.append({'id': item_id, 'status': 400, 'error': 'Invalid id'})
+            continue
+        document = documents.get(item_id)
+        if document is None:
+            items.append({'id': item_id, 'status': 404, 'error': not_found_message})
+            continue
+        item_etag = etag(document)
+        if etag_matches(item_etag):
+            items.append({'id': item_id, 'status': 304, 'etag': item_etag})
+            continue
+        items.append({'id': item_id, 'status': 200, 'etag': item_etag, key: render(document)})
+    return items
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sync (WSGI) and async (ASGI) serving paths under concurrency.
+
+Run both servers with the same memory budget, e.g. one worker process each,
+against the same database:
+
+    cd backend
+    gunicorn -w 1 --threads 16 -b :5001 'app:create_app()'
+    uvicorn asgi:app --workers 1 --port 5002
+
+then load the same public path on both at increasing concurrency:
+
+    python benchmarks/async_concurrency.py \\
+        --path '/api/public/floorplans/65f0c0ffee...?elements=none' \\
+        --target wsgi=http://localhost:5001 --pid wsgi=<gunicorn worker pid> \\
+        --target asgi=http://localhost:5002 --pid asgi=<uvicorn pid>
+
+Each level runs `concurrency` clients in a closed loop for --duration seconds
+and reports throughput, latency percentiles, errors and (with --pid, Linux
+only) the server's resident memory afterwards. The client is plain asyncio,
+so it needs nothing beyond the standard library.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+async def fetch(host: str, port: int, path: str, timeout: float) -> int:
+    """One GET on a fresh connection; returns the status code"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+                     f'Accept-Encoding: gzip\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        # Read the whole response so the server's send time is included
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run_level(base_url: str, path: str, concurrency: int, duration: float, timeout: float) -> Dict:
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(host, port, path, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            if status is not None and status < 400:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) if latencies else 0.0,
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99)
+    }
+
+
+def rss_mib(pid: Optional[int]) -> Optional[float]:
+    """Resident memory of a process from /proc (None when unavailable)"""
+    if pid is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def parse_pairs(values: List[str], convert=str) -> Dict:
+    pairs = {}
+    for value in values or []:
+        name, _, item = value.partition('=')
+        if not item:
+            raise SystemExit(f'expected name=value, got {value!r}')
+        pairs[name] = convert(item)
+    return pairs
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, help='name=base URL, repeatable')
+    parser.add_argument('--pid', action='append', help='name=server pid, to report its RSS')
+    parser.add_argument('--path', default='/api/public/halls')
+    parser.add_argument('--concurrency', default='1,16,64,256,1024', help='comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    args = parser.parse_args()
+
+    targets = parse_pairs(args.target)
+    pids = parse_pairs(args.pid, int)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    print(f'📊 GET {args.path}, {args.duration:.0f}s per level')
+    print(f"{'target':<8} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS MiB':>8}")
+    for concurrency in levels:
+        for name, base_url in targets.items():
+            result = await run_level(base_url, args.path, concurrency, args.duration, args.timeout)
+            rss = rss_mib(pids.get(name))
+            print(f"{name:<8} {concurrency:>7} {result['rps']:>9.1f} {result['p50_ms']:>9.1f} "
+                  f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>7} "
+                  f"{(f'{rss:.0f}' if rss is not None else '-'):>8}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
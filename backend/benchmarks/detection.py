@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Benchmark the detectors over a corpus of real floor plans.
+
+Samples --sample original plans from --corpus (uploads/ by default; the
+overlays the detection routes write next to them are skipped) and runs each
+detector over the same sample: --warmup untimed runs, then --repeat timed
+runs per image. Every detector runs in a fresh process, so its peak resident
+memory is its own and not what an earlier detector left behind.
+
+    cd backend
+    python benchmarks/detection.py --sample 20 --output report.json
+    python benchmarks/detection.py --save-baseline benchmarks/baselines/detection.json
+    python benchmarks/detection.py --baseline benchmarks/baselines/detection.json
+
+Per detector the report has the wall and CPU time per image (median and p95
+of the per-image medians), ms per megapixel and megapixels per second,
+candidates per megapixel, peak RSS and its growth over the process before
+the first image, and the errors. CPU time above wall time means OpenCV ran
+on several threads.
+
+With --baseline, the run is compared with a stored report of the same
+sample (same --corpus, --sample and --seed). The script exits with status 1
+when a detector got slower, used more memory, or found a different number
+of candidates by more than --threshold (15%), so a regression fails the
+build before deploy. Only compare runs from the same machine.
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+OVERLAY_SUFFIXES = ('_overlay', '_hier_overlay')
+MB = 1024 * 1024
+
+# name: (module, function, candidates in the result)
+DETECTORS = {
+    'rects_by_color': ('detection', 'detect_rects_by_color', len),
+    'walls_by_lines': ('detection', 'detect_walls_by_lines', len),
+    'rects_with_hierarchy': ('detection_hierarchy', 'detect_rects_with_hierarchy', len),
+    'halls_in_area': ('hall_detection', 'detect_halls_in_area', len),
+    'booths_in_hall': ('hall_detection', 'detect_booths_in_hall', lambda result: len(result.get('booths', []))),
+    'yolo': ('yolo_detect', 'detect_booths', len),
+}
+
+# Report fields compared with the baseline: (field, what an increase means)
+COMPARED = (
+    ('ms_per_megapixel', 'slower'),
+    ('cpu_ms_per_megapixel', 'more CPU'),
+    ('peak_rss_growth_mb', 'more memory'),
+    ('candidates_per_megapixel', 'different results'),
+)
+
+
+def corpus_images(corpus: str) -> List[str]:
+    """Original plans in the corpus, by name"""
+    names = []
+    for name in sorted(os.listdir(corpus)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in IMAGE_EXTENSIONS and not stem.endswith(OVERLAY_SUFFIXES):
+            names.append(name)
+    return names
+
+
+def sample_images(corpus: str, sample: int, seed: int) -> List[str]:
+    names = corpus_images(corpus)
+    if sample and sample < len(names):
+        names = sorted(random.Random(seed).sample(names, sample))
+    return names
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux only; None elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return None if n is None else round(n / MB, 1)
+
+
+def run_detector(name: str, paths: List[str], warmup: int, repeat: int, verbose: bool = False) -> Dict:
+    """Benchmark one detector over the images; runs in its own process"""
+    if not verbose:
+        logging.disable(logging.CRITICAL)
+    import cv2
+    module_name, function_name, count = DETECTORS[name]
+    module = importlib.import_module(module_name)
+    detect = getattr(module, function_name)
+
+    sizes = {}
+    for path in paths:
+        image = cv2.imread(path)
+        if image is not None:
+            sizes[path] = image.shape[1] * image.shape[0] / 1e6
+        del image
+
+    rss_start = _rss_bytes()
+    images, errors = [], []
+    for path in paths:
+        if path not in sizes:
+            errors.append(f'{os.path.basename(path)}: unreadable image')
+            continue
+        try:
+            for _ in range(warmup):
+                detect(path)
+            wall, cpu = [], []
+            for _ in range(repeat):
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                result = detect(path)
+                wall.append((time.perf_counter() - wall_start) * 1000)
+                cpu.append((time.process_time() - cpu_start) * 1000)
+        except Exception as e:
+            errors.append(f'{os.path.basename(path)}: {type(e).__name__}: {e}')
+            continue
+        images.append({
+            'image': os.path.basename(path),
+            'megapixels': round(sizes[path], 3),
+            'wall_ms': round(statistics.median(wall), 2),
+            'cpu_ms': round(statistics.median(cpu), 2),
+            'candidates': count(result)
+        })
+        if name == 'yolo' and not images[-1]['candidates']:
+            from yolo_detect import model_status
+            status = model_status()
+            if not status['loaded']:
+                return {'skipped': status['error'] or 'YOLO model not loaded'}
+
+    return summarize(images, errors, rss_start, _peak_rss_bytes())
+
+
+def summarize(images: List[Dict], errors: List[str], rss_start: Optional[int], peak_rss: Optional[int]) -> Dict:
+    summary = {'images': len(images), 'errors': len(errors)}
+    if errors:
+        summary['error_samples'] = errors[:5]
+    if images:
+        megapixels = sum(i['megapixels'] for i in images)
+        wall = [i['wall_ms'] for i in images]
+        cpu = [i['cpu_ms'] for i in images]
+        summary.update({
+            'megapixels': round(megapixels, 2),
+            'wall_ms': {'median': round(statistics.median(wall), 2), 'p95': round(_percentile(wall, 95), 2),
+                        'total': round(sum(wall), 1)},
+            'cpu_ms': {'median': round(statistics.median(cpu), 2), 'p95': round(_percentile(cpu, 95), 2),
+                       'total': round(sum(cpu), 1)},
+            'ms_per_megapixel': round(sum(wall) / megapixels, 2),
+            'cpu_ms_per_megapixel': round(sum(cpu) / megapixels, 2),
+            'megapixels_per_second': round(megapixels / (sum(wall) / 1000), 2),
+            'images_per_second': round(len(images) / (sum(wall) / 1000), 2),
+            'candidates': sum(i['candidates'] for i in images),
+            'candidates_per_megapixel': round(sum(i['candidates'] for i in images) / megapixels, 2),
+        })
+    if peak_rss is not None:
+        summary['peak_rss_mb'] = _mb(peak_rss)
+        if rss_start is not None:
+            summary['peak_rss_growth_mb'] = _mb(peak_rss - rss_start)
+    summary['per_image'] = images
+    return summary
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Changes against the baseline; `regression` is set where an increase passes the threshold"""
+    changes = []
+    for name, current in report['detectors'].items():
+        previous = baseline.get('detectors', {}).get(name)
+        if not previous or 'skipped' in current or 'skipped' in previous:
+            continue
+        for field, meaning in COMPARED:
+            before, after = previous.get(field), current.get(field)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else (0.0 if after == before else float('inf'))
+            # Candidate counts regress in either direction
+            regressed = (abs(change) if field == 'candidates_per_megapixel' else change) > threshold
+            changes.append({'detector': name, 'field': field, 'baseline': before, 'current': after,
+                            'change_pct': round(change * 100, 1), 'regression': meaning if regressed else None})
+        if current.get('errors', 0) > previous.get('errors', 0):
+            changes.append({'detector': name, 'field': 'errors', 'baseline': previous.get('errors', 0),
+                            'current': current['errors'], 'change_pct': None, 'regression': 'new errors'})
+    return changes
+
+
+def print_report(report: Dict):
+    print(f"📊 {len(report['images'])} images from {report['corpus']}, "
+          f"{report['warmup']} warm-up + {report['repeat']} timed runs each")
+    print(f"   {'detector':<22}{'ms/img':>9}{'p95':>9}{'ms/MP':>9}{'MP/s':>8}{'cpu/wall':>10}"
+          f"{'cand/MP':>9}{'peak MB':>9}{'errors':>8}")
+    for name, result in report['detectors'].items():
+        if 'skipped' in result:
+            print(f"   {name:<22}skipped: {result['skipped']}")
+            continue
+        if not result['images']:
+            print(f"   {name:<22}no images detected, {result['errors']} errors: {result.get('error_samples', [''])[0]}")
+            continue
+        cpu_ratio = result['cpu_ms']['total'] / max(result['wall_ms']['total'], 1e-6)
+        print(f"   {name:<22}{result['wall_ms']['median']:>9.1f}{result['wall_ms']['p95']:>9.1f}"
+              f"{result['ms_per_megapixel']:>9.1f}{result['megapixels_per_second']:>8.2f}{cpu_ratio:>10.2f}"
+              f"{result['candidates_per_megapixel']:>9.1f}{result.get('peak_rss_mb') or 0:>9.0f}{result['errors']:>8}")
+
+
+def print_comparison(changes: List[Dict], threshold: float):
+    print(f"🔍 Against the baseline (threshold {threshold * 100:.0f}%):")
+    for change in changes:
+        if change['change_pct'] is None:
+            line = f"{change['baseline']} -> {change['current']}"
+        else:
+            line = f"{change['baseline']} -> {change['current']} ({change['change_pct']:+.1f}%)"
+        flag = f"❌ {change['regression']}" if change['regression'] else '✅'
+        print(f"   {flag:<22}{change['detector']:<22}{change['field']:<26}{line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=os.path.join(BACKEND_DIR, 'uploads'), help='directory of floor plans')
+    parser.add_argument('--sample', type=int, default=20, help='plans to sample (0 = all)')
+    parser.add_argument('--seed', type=int, default=7, help='sampling seed; keep it to compare runs')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per image')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per image')
+    parser.add_argument('--detectors', default=','.join(DETECTORS), help='comma-separated subset of: '
+                        + ', '.join(DETECTORS))
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='compare with this report and fail on regressions')
+    parser.add_argument('--save-baseline', help='write the report here as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative change that counts as a regression')
+    parser.add_argument('--verbose', action='store_true', help="show the detectors' logs")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.detectors.split(',') if n.strip()]
+    unknown = [n for n in names if n not in DETECTORS]
+    if unknown:
+        sys.exit(f"Unknown detectors: {', '.join(unknown)}")
+    images = sample_images(args.corpus, args.sample, args.seed)
+    if not images:
+        sys.exit(f'No floor plans in {args.corpus}')
+    paths = [os.path.join(args.corpus, name) for name in images]
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'corpus': os.path.relpath(os.path.abspath(args.corpus), BACKEND_DIR),
+        'sample': args.sample,
+        'seed': args.seed,
+        'warmup': args.warmup,
+        'repeat': args.repeat,
+        'images': images,
+        'detectors': {}
+    }
+    for name in names:
+        if name == 'yolo' and importlib.util.find_spec('ultralytics') is None:
+            report['detectors'][name] = {'skipped': 'ultralytics is not installed'}
+            continue
+        print(f'⏳ {name}', file=sys.stderr)
+        # A fresh process per detector: its own peak RSS, nothing loaded by the ones before
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            report['detectors'][name] = pool.submit(run_detector, name, paths, args.warmup, args.repeat,
+                                                    args.verbose).result()
+
+    print_report(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f'💾 {path}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('images') != report['images']:
+            print('⚠️  The baseline was measured on other images; use the same --corpus, --sample and --seed')
+        changes = compare(report, baseline, args.threshold)
+        report['comparison'] = changes
+        print_comparison(changes, args.threshold)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        regressions = [c for c in changes if c['regression']]
+        if regressions:
+            print(f'❌ {len(regressions)} regression(s)')
+            sys.exit(1)
+        print('✅ No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization: Flask's stdlib provider vs FastJSONProvider.
+
+By default a synthetic floor plan shaped like the editor's state (booths with
+exhibitor info, ObjectIds, datetimes) and an area plan with detected halls are
+used. Pass --floorplan-id / --area-plan-id to benchmark real documents from
+MONGODB_URI instead.
+
+    cd backend
+    python benchmarks/json_serialization.py --elements 20000
+    python benchmarks/json_serialization.py --floorplan-id 65f0c0ffee...
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import FastJSONProvider, orjson
+
+STATUSES = ['available', 'reserved', 'sold', 'on-hold']
+
+
+def synthetic_floorplan(element_count: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    elements = []
+    for i in range(element_count):
+        elements.append({
+            'id': f'booth-{i}',
+            'type': 'booth',
+            'x': rng.uniform(0, 20000),
+            'y': rng.uniform(0, 20000),
+            'width': rng.choice([60, 90, 120]),
+            'height': rng.choice([60, 90]),
+            'rotation': 0,
+            'fill': '#ffffff',
+            'stroke': '#333333',
+            'strokeWidth': 1,
+            'draggable': True,
+            'selected': False,
+            'layer': rng.randint(0, 3),
+            'number': f'A{i:05d}',
+            'status': rng.choice(STATUSES),
+            'price': rng.randint(500, 5000),
+            'dimensions': {'imperial': "10' x 10'", 'metric': '3m x 3m'},
+            'exhibitor': {
+                'companyName': f'Exhibitor {i}',
+                'contactName': 'Jane Doe',
+                'email': f'contact{i}@example.com',
+                'phone': '+1 555 0100',
+                'description': 'Industrial automation and machine tools ' * 3
+            },
+            'customProperties': {'updated': now - timedelta(minutes=i)}
+        })
+    return {
+        '_id': ObjectId(),
+        'name': 'Benchmark Hall',
+        'description': 'Synthetic floor plan',
+        'created': now - timedelta(days=30),
+        'last_modified': now,
+        'version': 42,
+        'event_id': 'bench',
+        'floor': 1,
+        'layer': 0,
+        'user_id': str(ObjectId()),
+        'status': 'published',
+        'state': {
+            'elements': elements,
+            'selectedIds': [],
+            'activeTool': 'select',
+            'grid': {'enabled': True, 'size': 20, 'snap': True, 'opacity': 0.3},
+            'zoom': 1,
+            'offset': {'x': 0, 'y': 0},
+            'canvasSize': {'width': 20000, 'height': 20000},
+            'viewerMode': 'viewer'
+        }
+    }
+
+
+def synthetic_area_plan(hall_count: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    return {
+        '_id': ObjectId(),
+        'name': 'Benchmark Area',
+        'type': 'area',
+        'image_url': '/uploads/area.png',
+        'created_at': datetime.utcnow(),
+        'status': 'published',
+        'detected_halls': [{
+            'id': f'hall_{i + 1}',
+            'name': f'Hall {i + 1}',
+            'x': rng.randint(0, 4000),
+            'y': rng.randint(0, 4000),
+            'width': rng.randint(100, 600),
+            'height': rng.randint(100, 600),
+            'area': rng.randint(10000, 360000),
+            'confidence': rng.random(),
+            'contour': [[rng.randint(0, 4000), rng.randint(0, 4000)] for _ in range(24)]
+        } for i in range(hall_count)]
+    }
+
+
+def load_document(collection: str, document_id: str) -> dict:
+    from pymongo import MongoClient
+    from config import Config
+    from element_store import attach_elements
+
+    db = MongoClient(Config.MONGODB_URI).get_default_database()
+    document = db[collection].find_one({'_id': ObjectId(document_id)})
+    if document is None:
+        sys.exit(f'{collection} document {document_id} not found')
+    if collection == 'floorplans':
+        attach_elements(db, document)
+    return document
+
+
+def time_provider(provider, document: dict, repeat: int) -> dict:
+    timings = []
+    size = 0
+    with provider._app.app_context():
+        provider.response(document)  # warm up
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = provider.response(document)
+            timings.append((time.perf_counter() - start) * 1000)
+            size = len(response.get_data())
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'bytes': size
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--elements', type=int, default=20000, help='elements in the synthetic floor plan')
+    parser.add_argument('--halls', type=int, default=300, help='detected halls in the synthetic area plan')
+    parser.add_argument('--floorplan-id', help='benchmark a floor plan from the database instead')
+    parser.add_argument('--area-plan-id', help='benchmark an area plan from the database instead')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    floorplan = (load_document('floorplans', args.floorplan_id) if args.floorplan_id
+                 else synthetic_floorplan(args.elements))
+    area_plan = (load_document('area_floorplans', args.area_plan_id) if args.area_plan_id
+                 else synthetic_area_plan(args.halls))
+
+    app = Flask(__name__)
+    baseline = DefaultJSONProvider(app)
+    # The stdlib provider can't encode ObjectId; give it the same fallback so both produce output
+    baseline.default = FastJSONProvider.default
+    fast = FastJSONProvider(app)
+
+    if orjson is None:
+        print('⚠️  orjson is not installed, FastJSONProvider is using the stdlib encoder')
+
+    for label, document in (('floor plan', floorplan), ('area plan', area_plan)):
+        base = time_provider(baseline, document, args.repeat)
+        new = time_provider(fast, document, args.repeat)
+        print(f"📊 {label}: {base['bytes'] / 1024:.0f} KiB")
+        print(f"   stdlib json  : {base['median_ms']:8.2f} ms (min {base['min_ms']:.2f})")
+        print(f"   fast provider: {new['median_ms']:8.2f} ms (min {new['min_ms']:.2f})")
+        print(f"   speedup      : {base['median_ms'] / max(new['median_ms'], 1e-6):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+"""
+Caching helpers.
+
+TTLCache is a small per-worker LRU. DocumentCache layers it with an optional
+shared tier (see CacheBackend) for hot documents such as published floor
+plans and halls; `document_cache` is the app-wide instance configured from
+DOCUMENT_CACHE_* settings.
+"""
+
+import hashlib
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import bson
+from bson.errors import InvalidBSON, InvalidDocument
+from config import Config
+from metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, ttl: float, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if (ttl if ttl is not None else self.ttl) <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def delete_matching(self, predicate) -> None:
+        """Drop every entry whose key satisfies predicate(key)"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+def encode_value(value: Any, expires_at: Optional[float] = None) -> bytes:
+    """BSON payload of a shared-tier value (never pickle: other processes can write the store)"""
+    return bson.encode({'expires_at': expires_at, 'value': value})
+
+
+def decode_value(payload: bytes) -> Tuple[Optional[float], Any]:
+    """(expires_at, value) of a payload written by encode_value()"""
+    document = bson.decode(payload)
+    return document['expires_at'], document['value']
+
+
+def _frozen(value: Any) -> Any:
+    """BSON has no tuples: turn decoded lists back into tuples, e.g. for composite versions"""
+    if isinstance(value, list):
+        return tuple(_frozen(item) for item in value)
+    return value
+
+
+class CacheBackend:
+    """
+    Shared cache tier interface.
+
+    Implementations store BSON-encodable values (see encode_value) under
+    string keys with a TTL and are shared between workers (and, for network
+    stores, between hosts). Tuples come back as lists.
+    """
+
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Atomically increment a counter and return its new value"""
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        return self.get(key) or 0
+
+
+class MemoryBackend(CacheBackend):
+    """In-process stand-in for a shared store, for tests and single-worker setups"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            payload = self._data.get(key)
+            if payload is None:
+                return None
+            expires_at, value = decode_value(payload)
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = encode_value(value, expires_at)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            payload = self._data.get(key)
+            value = (decode_value(payload)[1] if payload else 0) + 1
+            self._data[key] = encode_value(value)
+            return value
+
+
+def private_directory(directory: str) -> str:
+    """
+    Create `directory` readable by this user only, or check that an existing one is.
+
+    Refuses (PermissionError) a directory owned by another user or a symlink,
+    since anyone who can write cache entries controls what workers serve.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if stat.S_ISLNK(info.st_mode) or not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f'Cache directory {directory} is not a plain directory')
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f'Cache directory {directory} is owned by another user (uid {info.st_uid})')
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            os.chmod(directory, 0o700)
+    return directory
+
+
+class FileBackend(CacheBackend):
+    """Shared tier on a private local directory, visible to every worker of this user on the host"""
+
+    def __init__(self, directory: str):
+        self.directory = private_directory(directory)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key: str) -> Any:
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = decode_value(f.read())
+        except (OSError, InvalidBSON, KeyError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        path = self._path(key)
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encode_value(value, expires_at))
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = (self.get(key) or 0) + 1
+            self.set(key, value, 0)
+            return value
+
+
+class RedisBackend(CacheBackend):
+    """Shared tier on Redis (requires the optional `redis` package)"""
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any:
+        payload = self._client.get(key)
+        if payload is None:
+            return None
+        try:
+            return decode_value(payload)[1]
+        except (InvalidBSON, KeyError):
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        # Redis expires the key itself
+        payload = encode_value(value)
+        if ttl:
+            self._client.set(key, payload, px=int(ttl * 1000))
+        else:
+            self._client.set(key, payload)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(key))
+
+    def counter(self, key: str) -> int:
+        # Counters are plain Redis integers, not encoded values
+        return int(self._client.get(key) or 0)
+
+
+def create_backend(name: str, url: str = '') -> Optional[CacheBackend]:
+    """Build the shared tier named in config: '' / 'none', 'memory', 'file' or 'redis'"""
+    name = (name or 'none').strip().lower()
+    if name == 'none':
+        return None
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'file':
+        return FileBackend(url or os.path.join(tempfile.gettempdir(), 'imtma_document_cache'))
+    if name == 'redis':
+        return RedisBackend(url or 'redis://localhost:6379/0')
+    raise ValueError(f'Unknown cache backend: {name}')
+
+
+class CacheMetrics:
+    """Hit/miss counters per collection and tier"""
+
+    OUTCOMES = ('local', 'revalidated', 'shared', 'miss')
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, collection: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(collection, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+        # Same counts for /metrics, aggregated across workers
+        CACHE_REQUESTS.labels(collection, outcome).inc()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            stats = {}
+            for collection, counts in self._counts.items():
+                total = sum(counts.values())
+                hits = total - counts['miss']
+                stats[collection] = dict(counts, total=total, hit_ratio=round(hits / total, 4) if total else 0.0)
+            return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+class DocumentCache:
+    """
+    Two-tier cache for hot documents.
+
+    The local tier is a per-worker LRU of immutable entries keyed by
+    (collection, id, version), plus short-lived pointers (collection, id) ->
+    current version. When a pointer expires, `version_loader` (a cheap
+    projected lookup) revalidates the local entry without refetching the
+    document. The optional shared tier keeps the latest version of every
+    document for all workers and is invalidated on writes, so other workers
+    see changes after at most `pointer_ttl` seconds.
+
+    Values returned by get() are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, ttl: float, pointer_ttl: float, maxsize: int = 256,
+                 shared: Optional[CacheBackend] = None, prefix: str = 'doccache'):
+        self.ttl = ttl
+        self.pointer_ttl = pointer_ttl
+        self.local = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.pointers = TTLCache(ttl=pointer_ttl, maxsize=maxsize * 4)
+        self.shared = shared
+        self.prefix = prefix
+        self.metrics = CacheMetrics()
+
+    @staticmethod
+    def document_version(document: Any) -> Any:
+        if not isinstance(document, dict):
+            return None
+        if document.get('version') is not None:
+            return document['version']
+        last_modified = document.get('last_modified')
+        return last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified
+
+    def _generation(self, collection: str) -> int:
+        return self.shared.counter(f'{self.prefix}:gen:{collection}')
+
+    def _shared_key(self, collection: str, key: str) -> str:
+        return f'{self.prefix}:{collection}:{self._generation(collection)}:{key}'
+
+    def get(self, collection: str, key: Hashable, loader: Callable[[], Any],
+            version_loader: Callable[[], Any] = None, ttl: float = None) -> Any:
+        """
+        Cached document for (collection, key), loading it with loader() on a miss.
+
+        `ttl` overrides the pointer TTL, i.e. how stale this entry may get in
+        workers that did not perform the write. None results are not cached.
+        """
+        if ttl is not None and ttl <= 0:
+            return loader()
+        key = str(key)
+
+        document = self._local_hit(collection, key)
+        if document is not _MISSING:
+            return document
+
+        expected_version = _MISSING
+        if version_loader is not None:
+            expected_version = version_loader()
+            document = self._revalidated(collection, key, expected_version, ttl)
+            if document is not _MISSING:
+                return document
+
+        document = self._shared_hit(collection, key, expected_version, ttl)
+        if document is not _MISSING:
+            return document
+
+        self.metrics.record(collection, 'miss')
+        return self._store(collection, key, loader(), ttl)
+
+    async def get_async(self, collection: str, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                        version_loader: Callable[[], Awaitable[Any]] = None, ttl: float = None) -> Any:
+        """get() for coroutine loaders (async serving path); same tiers and entries"""
+        if ttl is not None and ttl <= 0:
+            return await loader()
+        key = str(key)
+
+        document = self._local_hit(collection, key)
+        if document is not _MISSING:
+            return document
+
+        expected_version = _MISSING
+        if version_loader is not None:
+            expected_version = await version_loader()
+            document = self._revalidated(collection, key, expected_version, ttl)
+            if document is not _MISSING:
+                return document
+
+        document = self._shared_hit(collection, key, expected_version, ttl)
+        if document is not _MISSING:
+            return document
+
+        self.metrics.record(collection, 'miss')
+        return self._store(collection, key, await loader(), ttl)
+
+    def _local_hit(self, collection: str, key: str) -> Any:
+        version = self.pointers.get((collection, key), _MISSING)
+        if version is _MISSING:
+            return _MISSING
+        document = self.local.get((collection, key, version), _MISSING)
+        if document is not _MISSING:
+            self.metrics.record(collection, 'local')
+        return document
+
+    def _revalidated(self, collection: str, key: str, version: Any, ttl: float = None) -> Any:
+        document = self.local.get((collection, key, version), _MISSING)
+        if version is None or document is _MISSING:
+            return _MISSING
+        self.pointers.set((collection, key), version, ttl)
+        self.metrics.record(collection, 'revalidated')
+        return document
+
+    def _shared_hit(self, collection: str, key: str, expected_version: Any, ttl: float = None) -> Any:
+        if self.shared is None:
+            return _MISSING
+        entry = self.shared.get(self._shared_key(collection, key))
+        if entry is None:
+            return _MISSING
+        version = _frozen(entry['version'])
+        if expected_version not in (_MISSING, version):
+            return _MISSING
+        self._store_local(collection, key, version, entry['document'], ttl)
+        self.metrics.record(collection, 'shared')
+        return entry['document']
+
+    def _store(self, collection: str, key: str, document: Any, ttl: float = None) -> Any:
+        if document is None:
+            return None
+        version = self.document_version(document)
+        self._store_local(collection, key, version, document, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(self._shared_key(collection, key),
+                                {'version': version, 'document': document}, ttl or self.ttl)
+            except InvalidDocument:
+                # Not representable in BSON (e.g. non-string keys): this worker's tier only
+                pass
+        return document
+
+    def _store_local(self, collection: str, key: str, version: Any, document: Any, ttl: float = None) -> None:
+        self.local.set((collection, key, version), document)
+        self.pointers.set((collection, key), version, ttl)
+
+    def invalidate(self, collection: str, key: Hashable) -> None:
+        """Forget the current version of one document (call after every write)"""
+        key = str(key)
+        self.pointers.delete((collection, key))
+        self.local.delete_matching(lambda k: k[:2] == (collection, key))
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(collection, key))
+
+    def invalidate_collection(self, collection: str) -> None:
+        """Forget every document of a collection (e.g. listings keyed by filter)"""
+        self.pointers.delete_matching(lambda k: k[0] == collection)
+        self.local.delete_matching(lambda k: k[0] == collection)
+        if self.shared is not None:
+            self.shared.incr(f'{self.prefix}:gen:{collection}')
+
+    def clear(self) -> None:
+        self.pointers.clear()
+        self.local.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'shared_backend': type(self.shared).__name__ if self.shared is not None else None,
+            'local_entries': len(self.local),
+            'collections': self.metrics.snapshot()
+        }
+
+
+document_cache = DocumentCache(
+    ttl=Config.DOCUMENT_CACHE_TTL,
+    pointer_ttl=Config.DOCUMENT_CACHE_POINTER_TTL,
+    maxsize=Config.DOCUMENT_CACHE_SIZE,
+    shared=create_backend(Config.DOCUMENT_CACHE_BACKEND, Config.DOCUMENT_CACHE_URL)
+)
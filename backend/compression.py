@@ -0,0 +1,149 @@
+"""
+Negotiated response compression.
+
+An after_request hook compresses JSON/text responses with the best encoding
+the client accepts (brotli, zstd or gzip, in COMPRESSION_ALGORITHMS order).
+Responses below COMPRESSION_MIN_SIZE are left alone. brotli and zstandard are
+optional dependencies; without them only gzip is offered.
+
+Responses with a strong ETag are version-keyed (see http_cache.document_etag),
+so their compressed bodies are cached per (path, ETag, encoding) and reused
+instead of recompressing the same published floor plan on every hit.
+"""
+
+import gzip
+from typing import Callable, Dict, List, Optional
+from flask import request
+from cache import TTLCache
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'image/svg+xml'
+)
+
+compressed_body_cache = TTLCache(ttl=Config.COMPRESSION_CACHE_TTL, maxsize=Config.COMPRESSION_CACHE_SIZE)
+
+
+def _compress_gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=Config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=Config.COMPRESSION_BROTLI_LEVEL)
+
+
+def _compress_zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=Config.COMPRESSION_ZSTD_LEVEL).compress(data)
+
+
+def available_encodings() -> Dict[str, Callable[[bytes], bytes]]:
+    """Encodings that can be produced in this process, keyed by Content-Encoding token"""
+    encoders = {'gzip': _compress_gzip}
+    if brotli is not None:
+        encoders['br'] = _compress_brotli
+    if zstandard is not None:
+        encoders['zstd'] = _compress_zstd
+    return encoders
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted = {}
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[token] = quality
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str], preference: List[str] = None) -> Optional[str]:
+    """Pick the preferred available encoding the client accepts with q > 0"""
+    if not header:
+        return None
+    accepted = _parse_accept_encoding(header)
+    encoders = available_encodings()
+    preference = preference or Config.COMPRESSION_ALGORITHMS
+
+    best, best_quality = None, 0.0
+    for encoding in preference:
+        if encoding not in encoders:
+            continue
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        # Ties go to the server's preference order
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _should_compress(response) -> bool:
+    if response.status_code < 200 or response.status_code >= 300 or response.status_code == 204:
+        return False
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    return (response.content_length or 0) >= Config.COMPRESSION_MIN_SIZE
+
+
+def compressed_body(path: str, data: bytes, encoding: str, etag: Optional[str] = None, weak: bool = False) -> bytes:
+    """`data` in `encoding`, reused from the cache for bodies with a strong ETag"""
+    cache_key = (path, etag, encoding) if etag and not weak else None
+
+    body = compressed_body_cache.get(cache_key) if cache_key else None
+    if body is None:
+        body = available_encodings()[encoding](data)
+        if cache_key:
+            compressed_body_cache.set(cache_key, body)
+    return body
+
+
+def compress_response(response):
+    """after_request hook: compress the body if the client and response allow it"""
+    if not _should_compress(response):
+        return response
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    response.set_data(compressed_body(request.path, response.get_data(), encoding, etag, weak))
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # The compressed representation is not byte-identical to the identity one
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """Register the compression hook on the app"""
+    if Config.COMPRESSION_ENABLED:
+        app.after_request(compress_response)
@@ -14,4 +14,130 @@ class Config:
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() in ('true', '1', 'yes')
 
     # Detection backend toggle: 'yolo' or 'opencv'
-    DETECTION_BACKEND = os.getenv('DETECTION_BACKEND', 'yolo').strip().lower()
\ No newline at end of file
+    DETECTION_BACKEND = os.getenv('DETECTION_BACKEND', 'yolo').strip().lower()
+
+    # Floor plan revisions: write a full snapshot every N revisions, deltas in between
+    REVISION_SNAPSHOT_INTERVAL = int(os.getenv('REVISION_SNAPSHOT_INTERVAL', '20'))
+
+    # Chunked element storage: plans with more than ELEMENT_CHUNK_THRESHOLD elements
+    # are sharded into floorplan_element_chunks (0 disables the automatic switch)
+    ELEMENT_CHUNK_THRESHOLD = int(os.getenv('ELEMENT_CHUNK_THRESHOLD', '5000'))
+    ELEMENT_CHUNK_SIZE = int(os.getenv('ELEMENT_CHUNK_SIZE', '500'))
+    ELEMENT_TILE_SIZE = int(os.getenv('ELEMENT_TILE_SIZE', '1000'))
+
+    # Viewport queries: grid cell size of the in-process spatial index, number of
+    # cached indexes per worker, and zoom below which labels/styling are dropped
+    SPATIAL_INDEX_CELL_SIZE = int(os.getenv('SPATIAL_INDEX_CELL_SIZE', '250'))
+    SPATIAL_INDEX_CACHE_SIZE = int(os.getenv('SPATIAL_INDEX_CACHE_SIZE', '32'))
+    LOD_MIN_ZOOM = float(os.getenv('LOD_MIN_ZOOM', '0.5'))
+
+    # Seconds to cache the public hall map responses (0 disables caching)
+    PUBLIC_HALLS_CACHE_TTL = float(os.getenv('PUBLIC_HALLS_CACHE_TTL', '15'))
+
+    # HTTP caching of public reads (seconds), so a reverse proxy can absorb viewer polling
+    PUBLIC_CACHE_MAX_AGE = int(os.getenv('PUBLIC_CACHE_MAX_AGE', '30'))
+    PUBLIC_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv('PUBLIC_CACHE_STALE_WHILE_REVALIDATE', '60'))
+
+    # Response compression: encodings in order of preference (br and zstd need the
+    # brotli / zstandard packages), per-encoding levels, and the smallest body worth compressing
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() in ('true', '1', 'yes')
+    COMPRESSION_ALGORITHMS = [a.strip() for a in os.getenv('COMPRESSION_ALGORITHMS', 'br,zstd,gzip').split(',') if a.strip()]
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_LEVEL = int(os.getenv('COMPRESSION_BROTLI_LEVEL', '5'))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', '3'))
+    # Compressed bodies of version-keyed (strong ETag) responses kept per worker
+    COMPRESSION_CACHE_SIZE = int(os.getenv('COMPRESSION_CACHE_SIZE', '64'))
+    COMPRESSION_CACHE_TTL = float(os.getenv('COMPRESSION_CACHE_TTL', '600'))
+
+    # Document cache: per-worker LRU of versioned documents (DOCUMENT_CACHE_TTL), how long a
+    # worker trusts its idea of the current version (DOCUMENT_CACHE_POINTER_TTL), and an
+    # optional shared tier: none, memory, file (DOCUMENT_CACHE_URL = directory) or redis (URL)
+    DOCUMENT_CACHE_TTL = float(os.getenv('DOCUMENT_CACHE_TTL', '300'))
+    DOCUMENT_CACHE_POINTER_TTL = float(os.getenv('DOCUMENT_CACHE_POINTER_TTL', '5'))
+    DOCUMENT_CACHE_SIZE = int(os.getenv('DOCUMENT_CACHE_SIZE', '256'))
+    DOCUMENT_CACHE_BACKEND = os.getenv('DOCUMENT_CACHE_BACKEND', 'none')
+    DOCUMENT_CACHE_URL = os.getenv('DOCUMENT_CACHE_URL', '')
+
+    # Most ids accepted by one batch fetch (/public/floorplans/batch, /public/hall-plans/batch)
+    BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', '50'))
+
+    # Production server (serve.py): role of this process pool (all, read or detection),
+    # workers/threads per worker (0 = derived from the CPU count) and preloading the app before fork
+    SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_ROLE = os.getenv('SERVER_ROLE', 'all').strip().lower()
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '0'))
+    SERVER_PRELOAD = os.getenv('SERVER_PRELOAD', 'false').lower() in ('true', '1', 'yes')
+    # Keep-alive and timeouts in seconds; workers are recycled after MAX_REQUESTS (+ random jitter)
+    SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', '5'))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', '30'))
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '2000'))
+    SERVER_MAX_REQUESTS_JITTER = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', '200'))
+    SERVER_PIDFILE = os.getenv('SERVER_PIDFILE', '')
+    # Read pool worker class: 'asgi' (uvicorn workers running asgi.py) or 'gthread' (Flask only)
+    SERVER_READ_WORKER_CLASS = os.getenv('SERVER_READ_WORKER_CLASS', 'asgi').strip().lower()
+    # Detection pool: inference is CPU/GPU bound and loads a model per process
+    DETECTION_WORKERS = int(os.getenv('DETECTION_WORKERS', '0'))
+    DETECTION_TIMEOUT = int(os.getenv('DETECTION_TIMEOUT', '300'))
+    DETECTION_MAX_REQUESTS = int(os.getenv('DETECTION_MAX_REQUESTS', '200'))
+
+    # Startup budget in seconds for importing the app and running create_app() (test_startup.py)
+    STARTUP_TIME_BUDGET = float(os.getenv('STARTUP_TIME_BUDGET', '2.0'))
+
+    # Readiness (/health/ready): seconds between background dependency checks, the longest
+    # acceptable MongoDB ping and the least free disk space for uploads, in MB
+    HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '10'))
+    HEALTH_MONGO_TIMEOUT_MS = int(os.getenv('HEALTH_MONGO_TIMEOUT_MS', '2000'))
+    HEALTH_MIN_FREE_DISK_MB = int(os.getenv('HEALTH_MIN_FREE_DISK_MB', '512'))
+
+    # Prometheus metrics at /metrics (metrics.py); serve.py sets PROMETHEUS_MULTIPROC_DIR for its workers
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('true', '1', 'yes')
+
+    # Detection stage timings (stage_timer.py): Server-Timing header on detection responses, and
+    # tracemalloc peaks per stage (slow and process wide; for investigations only)
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    DETECTION_TRACE_MEMORY = os.getenv('DETECTION_TRACE_MEMORY', 'false').lower() in ('true', '1', 'yes')
+
+    # Logging (logs.py): root level, per-logger levels ("detection_hierarchy=DEBUG,pymongo=WARNING"),
+    # json or text lines, and how many records may wait for the writer thread before new ones are dropped
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').strip().lower()
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+    # Request profiler (profiler.py): admins profile a request with X-Profile: 1 or ?profile=1.
+    # PROFILER_SAMPLE_RATE also profiles that fraction of all requests (0.001 = 0.1%), keeping the
+    # slowest PROFILER_KEEP_SLOWEST per route; reports are files in PROFILER_DIR shared by all workers
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', '0'))
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', '5'))
+    PROFILER_KEEP = int(os.getenv('PROFILER_KEEP', '50'))
+    PROFILER_KEEP_SLOWEST = int(os.getenv('PROFILER_KEEP_SLOWEST', '10'))
+    PROFILER_DIR = os.getenv('PROFILER_DIR', '')
+
+    # Request tracing (tracing.py): TRACE_EXPORT is '' (off), 'stdout' or a file to append OTLP/JSON
+    # lines to; TRACE_SAMPLE_RATE is the fraction of new traces recorded (continued traces keep theirs)
+    TRACE_EXPORT = os.getenv('TRACE_EXPORT', '').strip()
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+    TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'imtma-flooring-backend')
+    TRACE_QUEUE_SIZE = int(os.getenv('TRACE_QUEUE_SIZE', '10000'))
+
+    # Query audit (query_audit.py, development and staging): database commands per request in
+    # X-DB-Queries, a warning for query shapes repeated QUERY_REPEAT_THRESHOLD times (N+1), and a
+    # command budget for every request (QUERY_BUDGET, 0 = none) or per endpoint ("hall.list_public_halls=1");
+    # QUERY_BUDGET_STRICT turns requests over budget into 500s, for tests
+    QUERY_AUDIT_ENABLED = os.getenv('QUERY_AUDIT_ENABLED', 'false').lower() in ('true', '1', 'yes')
+    QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', '2'))
+    QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', '0'))
+    QUERY_BUDGETS = os.getenv('QUERY_BUDGETS', '')
+    QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'false').lower() in ('true', '1', 'yes')
+
+    # Slow-query log (slow_queries.py): commands of SLOW_QUERY_MS or more go to the capped slow_queries
+    # collection (SLOW_QUERY_LOG_MB), and that fraction of the slow reads is explained
+    SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED', 'true').lower() in ('true', '1', 'yes')
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', '0.1'))
+    SLOW_QUERY_LOG_MB = int(os.getenv('SLOW_QUERY_LOG_MB', '16'))
+    SLOW_QUERY_QUEUE_SIZE = int(os.getenv('SLOW_QUERY_QUEUE_SIZE', '1000'))
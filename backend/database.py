@@ -0,0 +1,54 @@
+"""
+Shared MongoDB client.
+
+MongoClient is thread-safe and keeps its own connection pool, so one client
+per process serves every request; creating one per request opens (and
+leaks) a pool each time. Workers forked from a master that already created
+the client (gunicorn with SERVER_PRELOAD) must not reuse the parent's
+sockets, so the client is recreated when the process id changes.
+"""
+
+import os
+import threading
+from pymongo import MongoClient
+from config import Config
+from metrics import mongo_command_listener
+from tracing import mongo_tracing_listener, tracing_enabled
+from query_audit import query_audit_listener
+from slow_queries import slow_query_listener
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """The process-wide client, created on first use"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                listeners = [mongo_command_listener] if Config.METRICS_ENABLED else []
+                if tracing_enabled():
+                    listeners.append(mongo_tracing_listener)
+                if Config.QUERY_AUDIT_ENABLED:
+                    listeners.append(query_audit_listener)
+                if Config.SLOW_QUERY_LOG_ENABLED:
+                    listeners.append(slow_query_listener)
+                _client = MongoClient(Config.MONGODB_URI, event_listeners=listeners)
+                _client_pid = os.getpid()
+    return _client
+
+
+def close_client() -> None:
+    """Close the shared client; the next get_client() connects with the current Config"""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = _client_pid = None
+
+
+def get_database():
+    """Default database of MONGODB_URI on the shared client"""
+    return get_client().get_default_database()
@@ -3,9 +3,10 @@
 Database schema setup for hierarchical floor plan system
 """
 
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient
 import os
 from datetime import datetime
+from migrations import apply_migrations
 
 def setup_hierarchical_schema():
     """Set up database collections and indexes for hierarchical floor plan system"""
@@ -16,40 +17,8 @@ def setup_hierarchical_schema():
     
     print("Setting up hierarchical floor plan database schema...")
     
-    # Create area_floorplans collection
-    print("Creating area_floorplans collection...")
-    area_floorplans = db.area_floorplans
-    
-    # Create indexes for area_floorplans
-    area_floorplans.create_index([("created_by", ASCENDING)])
-    area_floorplans.create_index([("status", ASCENDING)])
-    area_floorplans.create_index([("created_at", DESCENDING)])
-    area_floorplans.create_index([("name", "text"), ("description", "text")])
-    
-    # Create hall_floorplans collection
-    print("Creating hall_floorplans collection...")
-    hall_floorplans = db.hall_floorplans
-    
-    # Create indexes for hall_floorplans
-    hall_floorplans.create_index([("hall_id", ASCENDING)])
-    hall_floorplans.create_index([("area_plan_id", ASCENDING)])
-    hall_floorplans.create_index([("created_by", ASCENDING)])
-    hall_floorplans.create_index([("status", ASCENDING)])
-    hall_floorplans.create_index([("created_at", DESCENDING)])
-    hall_floorplans.create_index([("hall_id", ASCENDING), ("status", ASCENDING)])
-    
-    # Update existing halls collection with new fields
-    print("Updating halls collection...")
-    halls = db.halls
-    
-    # Add indexes for halls
-    halls.create_index([("assigned_plan_id", ASCENDING)])
-    halls.create_index([("public", ASCENDING)])
-    halls.create_index([("event_id", ASCENDING)])
-    
-    # Create compound indexes for performance
-    halls.create_index([("public", ASCENDING), ("event_id", ASCENDING)])
-    hall_floorplans.create_index([("hall_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)])
+    # Collections are created on first insert; indexes come from the migrations
+    apply_migrations(db)
     
     print("✅ Database schema setup completed!")
     
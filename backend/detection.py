@@ -1,7 +1,11 @@
 import cv2
+import logging
 import numpy as np
 import math
 from typing import List, Dict, Tuple, Any
+from stage_timer import stage
+
+log = logging.getLogger(__name__)
 
 def detect_rects_by_color(image_path: str, min_area: int = 400, 
                          hsv_lower: List[int] = [0, 30, 30], 
@@ -29,211 +33,217 @@ def detect_rects_by_color(image_path: str, min_area: int = 400,
     """
     try:
         # Load image
-        image = cv2.imread(image_path)
+        with stage('decode'):
+            image = cv2.imread(image_path)
         if image is None:
             return []
         
         rects = []
         
         # Method 1: Multi-Color Detection for ALL colored booths
-        image_blur = cv2.GaussianBlur(image, (3, 3), 0)
-        hsv = cv2.cvtColor(image_blur, cv2.COLOR_BGR2HSV)
-        lab = cv2.cvtColor(image_blur, cv2.COLOR_BGR2LAB)
+        with stage('color_masks'):
+            image_blur = cv2.GaussianBlur(image, (3, 3), 0)
+            hsv = cv2.cvtColor(image_blur, cv2.COLOR_BGR2HSV)
+            lab = cv2.cvtColor(image_blur, cv2.COLOR_BGR2LAB)
 
-        # Define comprehensive color ranges for BIEC floor plan
-        color_ranges = [
-            # Orange/Yellow (Hall 5)
-            ([10, 100, 100], [25, 255, 255], 'orange'),
-            ([25, 100, 100], [35, 255, 255], 'yellow'),
+            # Define comprehensive color ranges for BIEC floor plan
+            color_ranges = [
+                # Orange/Yellow (Hall 5)
+                ([10, 100, 100], [25, 255, 255], 'orange'),
+                ([25, 100, 100], [35, 255, 255], 'yellow'),
             
-            # Green (Hall 4)
-            ([35, 100, 100], [85, 255, 255], 'green'),
+                # Green (Hall 4)
+                ([35, 100, 100], [85, 255, 255], 'green'),
             
-            # Blue (Hall 1)
-            ([85, 100, 100], [125, 255, 255], 'blue'),
+                # Blue (Hall 1)
+                ([85, 100, 100], [125, 255, 255], 'blue'),
             
-            # Purple/Magenta (Hall 2)
-            ([125, 100, 100], [155, 255, 255], 'purple'),
+                # Purple/Magenta (Hall 2)
+                ([125, 100, 100], [155, 255, 255], 'purple'),
             
-            # Red (Hall 3)
-            ([155, 100, 100], [179, 255, 255], 'red'),
-            ([0, 100, 100], [10, 255, 255], 'red'),  # Red wraps around
+                # Red (Hall 3)
+                ([155, 100, 100], [179, 255, 255], 'red'),
+                ([0, 100, 100], [10, 255, 255], 'red'),  # Red wraps around
             
-            # Additional ranges for lighter/darker variations
-            ([10, 50, 50], [25, 255, 255], 'light_orange'),
-            ([35, 50, 50], [85, 255, 255], 'light_green'),
-            ([85, 50, 50], [125, 255, 255], 'light_blue'),
-            ([125, 50, 50], [155, 255, 255], 'light_purple'),
-            ([155, 50, 50], [179, 255, 255], 'light_red'),
-        ]
+                # Additional ranges for lighter/darker variations
+                ([10, 50, 50], [25, 255, 255], 'light_orange'),
+                ([35, 50, 50], [85, 255, 255], 'light_green'),
+                ([85, 50, 50], [125, 255, 255], 'light_blue'),
+                ([125, 50, 50], [155, 255, 255], 'light_purple'),
+                ([155, 50, 50], [179, 255, 255], 'light_red'),
+            ]
 
-        combined_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
-        color_masks = {}
-        
-        for lower, upper, color_name in color_ranges:
-            lower_blue = np.array(lower, dtype=np.uint8)
-            upper_blue = np.array(upper, dtype=np.uint8)
-            mask = cv2.inRange(hsv, lower_blue, upper_blue)
-            combined_mask = cv2.bitwise_or(combined_mask, mask)
-            color_masks[color_name] = mask
+            combined_mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+            color_masks = {}
+        
+            for lower, upper, color_name in color_ranges:
+                lower_blue = np.array(lower, dtype=np.uint8)
+                upper_blue = np.array(upper, dtype=np.uint8)
+                mask = cv2.inRange(hsv, lower_blue, upper_blue)
+                combined_mask = cv2.bitwise_or(combined_mask, mask)
+                color_masks[color_name] = mask
 
         # Clean up the mask
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
-        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
-        combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel)
+        with stage('morphology'):
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+            combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel)
+            combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_OPEN, kernel)
 
         # Find colored contours
-        contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        with stage('contours') as contour_stage:
+            contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        for i, contour in enumerate(contours):
-            area = cv2.contourArea(contour)
-            if area >= min_area:
-                x, y, w, h = cv2.boundingRect(contour)
-                rect_area = w * h
-                rectangularity = area / rect_area if rect_area > 0 else 0
+            for i, contour in enumerate(contours):
+                area = cv2.contourArea(contour)
+                if area >= min_area:
+                    x, y, w, h = cv2.boundingRect(contour)
+                    rect_area = w * h
+                    rectangularity = area / rect_area if rect_area > 0 else 0
 
-                # Determine dominant color for this contour
-                dominant_color = get_dominant_color(contour, color_masks)
+                    # Determine dominant color for this contour
+                    dominant_color = get_dominant_color(contour, color_masks)
                 
-                # Higher score for well-formed rectangles
-                score = min(1.0, rectangularity * (area / min_area) * 1.5)
+                    # Higher score for well-formed rectangles
+                    score = min(1.0, rectangularity * (area / min_area) * 1.5)
 
-                rects.append({
-                    "id": len(rects) + 1,
-                    "x": int(x),
-                    "y": int(y),
-                    "w": int(w),
-                    "h": int(h),
-                    "score": round(score, 3),
-                    "type": "colored",
-                    "color_name": dominant_color,
-                    "area": int(area),
-                    "rectangularity": round(rectangularity, 3)
-                })
+                    rects.append({
+                        "id": len(rects) + 1,
+                        "x": int(x),
+                        "y": int(y),
+                        "w": int(w),
+                        "h": int(h),
+                        "score": round(score, 3),
+                        "type": "colored",
+                        "color_name": dominant_color,
+                        "area": int(area),
+                        "rectangularity": round(rectangularity, 3)
+                    })
+            contour_stage.candidates = len(rects)
         
         # Method 2: Enhanced Edge-based Detection for precise booth boundaries
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        with stage('edges') as edge_stage:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
-        # Multiple edge detection approaches for comprehensive coverage
-        # Approach 1: Adaptive threshold
-        thresh1 = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+            # Multiple edge detection approaches for comprehensive coverage
+            # Approach 1: Adaptive threshold
+            thresh1 = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
         
-        # Approach 2: Otsu's threshold
-        _, thresh2 = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            # Approach 2: Otsu's threshold
+            _, thresh2 = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
-        # Approach 3: Canny edge detection
-        edges = cv2.Canny(gray, 50, 150)
+            # Approach 3: Canny edge detection
+            edges = cv2.Canny(gray, 50, 150)
         
-        # Combine all edge detection methods
-        combined_edges = cv2.bitwise_or(cv2.bitwise_or(thresh1, thresh2), edges)
+            # Combine all edge detection methods
+            combined_edges = cv2.bitwise_or(cv2.bitwise_or(thresh1, thresh2), edges)
         
-        # Find contours in thresholded image
-        contours, _ = cv2.findContours(combined_edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # Find contours in thresholded image
+            contours, _ = cv2.findContours(combined_edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area >= min_area:
-                # Approximate contour to polygon
-                epsilon = 0.015 * cv2.arcLength(contour, True)  # More precise approximation
-                approx = cv2.approxPolyDP(contour, epsilon, True)
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area >= min_area:
+                    # Approximate contour to polygon
+                    epsilon = 0.015 * cv2.arcLength(contour, True)  # More precise approximation
+                    approx = cv2.approxPolyDP(contour, epsilon, True)
                 
-                # Check if it's roughly rectangular (4 corners)
-                if len(approx) >= 4:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    rect_area = w * h
-                    rectangularity = area / rect_area if rect_area > 0 else 0
+                    # Check if it's roughly rectangular (4 corners)
+                    if len(approx) >= 4:
+                        x, y, w, h = cv2.boundingRect(contour)
+                        rect_area = w * h
+                        rectangularity = area / rect_area if rect_area > 0 else 0
                     
-                    # Check if this rectangle overlaps with existing blue rectangles
-                    overlaps = False
-                    for existing_rect in rects:
-                        if (abs(x - existing_rect['x']) < 15 and 
-                            abs(y - existing_rect['y']) < 15 and
-                            abs(w - existing_rect['w']) < 30 and
-                            abs(h - existing_rect['h']) < 30):
-                            overlaps = True
-                            break
+                        # Check if this rectangle overlaps with existing blue rectangles
+                        overlaps = False
+                        for existing_rect in rects:
+                            if (abs(x - existing_rect['x']) < 15 and 
+                                abs(y - existing_rect['y']) < 15 and
+                                abs(w - existing_rect['w']) < 30 and
+                                abs(h - existing_rect['h']) < 30):
+                                overlaps = True
+                                break
                     
-                    if not overlaps and rectangularity > 0.75:  # Higher threshold for precision
-                        score = min(1.0, rectangularity * (area / min_area))
+                        if not overlaps and rectangularity > 0.75:  # Higher threshold for precision
+                            score = min(1.0, rectangularity * (area / min_area))
                         
-                        rects.append({
-                            "id": len(rects) + 1,
-                            "x": int(x),
-                            "y": int(y),
-                            "w": int(w),
-                            "h": int(h),
-                            "score": round(score, 3),
-                            "type": "edge",
-                            "color_name": "uncolored",
-                            "area": int(area),
-                            "rectangularity": round(rectangularity, 3)
-                        })
+                            rects.append({
+                                "id": len(rects) + 1,
+                                "x": int(x),
+                                "y": int(y),
+                                "w": int(w),
+                                "h": int(h),
+                                "score": round(score, 3),
+                                "type": "edge",
+                                "color_name": "uncolored",
+                                "area": int(area),
+                                "rectangularity": round(rectangularity, 3)
+                            })
+            edge_stage.candidates = sum(1 for r in rects if r['type'] == 'edge')
         
         # Method 3: Contour-based Hall Detection for large structures
         # Detect large rectangular regions that could be halls
-        large_contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for contour in large_contours:
-            area = cv2.contourArea(contour)
-            # Look for very large areas that could be halls
-            if area >= min_area * 10:  # Much larger than individual booths
-                epsilon = 0.01 * cv2.arcLength(contour, True)
-                approx = cv2.approxPolyDP(contour, epsilon, True)
+        with stage('halls') as hall_stage:
+            large_contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        
+            for contour in large_contours:
+                area = cv2.contourArea(contour)
+                # Look for very large areas that could be halls
+                if area >= min_area * 10:  # Much larger than individual booths
+                    epsilon = 0.01 * cv2.arcLength(contour, True)
+                    approx = cv2.approxPolyDP(contour, epsilon, True)
                 
-                if len(approx) >= 4:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    rect_area = w * h
-                    rectangularity = area / rect_area if rect_area > 0 else 0
+                    if len(approx) >= 4:
+                        x, y, w, h = cv2.boundingRect(contour)
+                        rect_area = w * h
+                        rectangularity = area / rect_area if rect_area > 0 else 0
                     
-                    # Check for overlaps with existing detections
-                    overlaps = False
-                    for existing_rect in rects:
-                        if (abs(x - existing_rect['x']) < 50 and 
-                            abs(y - existing_rect['y']) < 50 and
-                            abs(w - existing_rect['w']) < 100 and
-                            abs(h - existing_rect['h']) < 100):
-                            overlaps = True
-                            break
+                        # Check for overlaps with existing detections
+                        overlaps = False
+                        for existing_rect in rects:
+                            if (abs(x - existing_rect['x']) < 50 and 
+                                abs(y - existing_rect['y']) < 50 and
+                                abs(w - existing_rect['w']) < 100 and
+                                abs(h - existing_rect['h']) < 100):
+                                overlaps = True
+                                break
                     
-                    if not overlaps and rectangularity > 0.8:
-                        # Determine color for large structures
-                        dominant_color = get_dominant_color(contour, color_masks)
-                        score = min(1.0, rectangularity * (area / min_area) * 0.9)
+                        if not overlaps and rectangularity > 0.8:
+                            # Determine color for large structures
+                            dominant_color = get_dominant_color(contour, color_masks)
+                            score = min(1.0, rectangularity * (area / min_area) * 0.9)
                         
-                        rects.append({
-                            "id": len(rects) + 1,
-                            "x": int(x),
-                            "y": int(y),
-                            "w": int(w),
-                            "h": int(h),
-                            "score": round(score, 3),
-                            "type": "hall",
-                            "color_name": dominant_color,
-                            "area": int(area),
-                            "rectangularity": round(rectangularity, 3)
-                        })
+                            rects.append({
+                                "id": len(rects) + 1,
+                                "x": int(x),
+                                "y": int(y),
+                                "w": int(w),
+                                "h": int(h),
+                                "score": round(score, 3),
+                                "type": "hall",
+                                "color_name": dominant_color,
+                                "area": int(area),
+                                "rectangularity": round(rectangularity, 3)
+                            })
+            hall_stage.candidates = sum(1 for r in rects if r['type'] == 'hall')
         
         # Sort by score and re-assign IDs
         rects.sort(key=lambda r: r['score'], reverse=True)
         for i, rect in enumerate(rects):
             rect['id'] = i + 1
         
-        print(f"Detected {len(rects)} colored booths and structures using comprehensive detection")
-        
-        # Print detection summary by color
+        # Detection summary by color
         color_summary = {}
         for rect in rects:
             color = rect.get('color_name', 'unknown')
             color_summary[color] = color_summary.get(color, 0) + 1
         
-        print("Detection summary by color:")
-        for color, count in color_summary.items():
-            print(f"  {color}: {count} structures")
+        log.info("Detected %d colored booths and structures using comprehensive detection", len(rects),
+                 extra={'by_color': color_summary})
         
         return rects
     
     except Exception as e:
-        print(f"Error in detect_rects_by_color: {e}")
+        log.exception("Error in detect_rects_by_color: %s", e)
         return []
 
 def get_dominant_color(contour, color_masks):
@@ -257,7 +267,7 @@ def get_dominant_color(contour, color_masks):
         
         return dominant_color
     except Exception as e:
-        print(f"Error determining dominant color: {e}")
+        log.warning("Error determining dominant color: %s", e)
         return 'unknown'
 
 def detect_walls_by_lines(image_path: str, canny1: int = 50, canny2: int = 150,
@@ -288,38 +298,44 @@ def detect_walls_by_lines(image_path: str, canny1: int = 50, canny2: int = 150,
     """
     try:
         # Load image
-        image = cv2.imread(image_path)
+        with stage('decode'):
+            image = cv2.imread(image_path)
         if image is None:
             return []
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        with stage('edges'):
+            # Convert to grayscale
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+            # Apply Gaussian blur to reduce noise
+            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
         
-        # Canny edge detection
-        edges = cv2.Canny(blurred, canny1, canny2)
+            # Canny edge detection
+            edges = cv2.Canny(blurred, canny1, canny2)
         
-        # Dilate edges to connect nearby segments
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        edges = cv2.dilate(edges, kernel, iterations=1)
+            # Dilate edges to connect nearby segments
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+            edges = cv2.dilate(edges, kernel, iterations=1)
         
         # HoughLinesP to detect line segments
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, hough_thresh, 
-                               minLineLength=min_line_len, maxLineGap=max_line_gap)
+        with stage('hough') as hough:
+            lines = cv2.HoughLinesP(edges, 1, np.pi/180, hough_thresh, 
+                                   minLineLength=min_line_len, maxLineGap=max_line_gap)
+            hough.candidates = 0 if lines is None else len(lines)
         
         if lines is None:
             return []
         
-        # Convert to list of line segments
-        segments = []
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
-            segments.append([x1, y1, x2, y2])
+        with stage('merge') as merge:
+            # Convert to list of line segments
+            segments = []
+            for line in lines:
+                x1, y1, x2, y2 = line[0]
+                segments.append([x1, y1, x2, y2])
         
-        # Merge near-collinear segments
-        merged_walls = _merge_collinear_segments(segments, merge_angle_deg, merge_dist_px)
+            # Merge near-collinear segments
+            merged_walls = _merge_collinear_segments(segments, merge_angle_deg, merge_dist_px)
+            merge.candidates = len(merged_walls)
         
         # Format output
         walls = []
@@ -340,7 +356,7 @@ def detect_walls_by_lines(image_path: str, canny1: int = 50, canny2: int = 150,
         return walls
     
     except Exception as e:
-        print(f"Error in detect_walls_by_lines: {e}")
+        log.exception("Error in detect_walls_by_lines: %s", e)
         return []
 
 def _merge_collinear_segments(segments: List[List[int]], angle_threshold: float, 
@@ -447,86 +463,89 @@ def draw_overlay(image_path: str, rects: List[Dict], walls: List[Dict], out_path
     """
     try:
         # Load image
-        image = cv2.imread(image_path)
+        with stage('decode'):
+            image = cv2.imread(image_path)
         if image is None:
             return
         
         # Create overlay
-        overlay = image.copy()
+        with stage('draw'):
+            overlay = image.copy()
         
-        # Draw rectangles with color coding based on detected color
-        for rect in rects:
-            x, y, w, h = rect['x'], rect['y'], rect['w'], rect['h']
-            color_name = rect.get('color_name', 'unknown')
+            # Draw rectangles with color coding based on detected color
+            for rect in rects:
+                x, y, w, h = rect['x'], rect['y'], rect['w'], rect['h']
+                color_name = rect.get('color_name', 'unknown')
             
-            # Get appropriate color for visualization
-            if 'blue' in color_name:
-                fill_color = (255, 100, 0)  # Blue in BGR
-                border_color = (255, 150, 0)
-            elif 'green' in color_name:
-                fill_color = (0, 255, 0)  # Green in BGR
-                border_color = (0, 200, 0)
-            elif 'red' in color_name:
-                fill_color = (0, 0, 255)  # Red in BGR
-                border_color = (0, 0, 200)
-            elif 'orange' in color_name or 'yellow' in color_name:
-                fill_color = (0, 165, 255)  # Orange in BGR
-                border_color = (0, 140, 255)
-            elif 'purple' in color_name:
-                fill_color = (255, 0, 255)  # Purple in BGR
-                border_color = (200, 0, 200)
-            else:
-                fill_color = (0, 255, 0)  # Default green
-                border_color = (0, 200, 0)
+                # Get appropriate color for visualization
+                if 'blue' in color_name:
+                    fill_color = (255, 100, 0)  # Blue in BGR
+                    border_color = (255, 150, 0)
+                elif 'green' in color_name:
+                    fill_color = (0, 255, 0)  # Green in BGR
+                    border_color = (0, 200, 0)
+                elif 'red' in color_name:
+                    fill_color = (0, 0, 255)  # Red in BGR
+                    border_color = (0, 0, 200)
+                elif 'orange' in color_name or 'yellow' in color_name:
+                    fill_color = (0, 165, 255)  # Orange in BGR
+                    border_color = (0, 140, 255)
+                elif 'purple' in color_name:
+                    fill_color = (255, 0, 255)  # Purple in BGR
+                    border_color = (200, 0, 200)
+                else:
+                    fill_color = (0, 255, 0)  # Default green
+                    border_color = (0, 200, 0)
             
-            # Draw filled rectangle with transparency
-            cv2.rectangle(overlay, (x, y), (x + w, y + h), fill_color, -1)
+                # Draw filled rectangle with transparency
+                cv2.rectangle(overlay, (x, y), (x + w, y + h), fill_color, -1)
             
-            # Draw border
-            cv2.rectangle(overlay, (x, y), (x + w, y + h), border_color, 3)
+                # Draw border
+                cv2.rectangle(overlay, (x, y), (x + w, y + h), border_color, 3)
             
-            # Draw enhanced ID text with color information
-            text = f"{rect['id']}"
-            color_text = f"{color_name}"
+                # Draw enhanced ID text with color information
+                text = f"{rect['id']}"
+                color_text = f"{color_name}"
             
-            text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)[0]
-            text_x = x + (w - text_size[0]) // 2
-            text_y = y + (h + text_size[1]) // 2 - 10
+                text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)[0]
+                text_x = x + (w - text_size[0]) // 2
+                text_y = y + (h + text_size[1]) // 2 - 10
             
-            # Draw text background for better visibility
-            cv2.rectangle(overlay, (text_x - 5, text_y - 15), (text_x + text_size[0] + 5, text_y + 5), (0, 0, 0), -1)
-            cv2.putText(overlay, text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+                # Draw text background for better visibility
+                cv2.rectangle(overlay, (text_x - 5, text_y - 15), (text_x + text_size[0] + 5, text_y + 5), (0, 0, 0), -1)
+                cv2.putText(overlay, text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
             
-            # Draw color name
-            if color_name != 'unknown':
-                color_text_size = cv2.getTextSize(color_text, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)[0]
-                color_text_x = x + (w - color_text_size[0]) // 2
-                color_text_y = text_y + 20
-                cv2.rectangle(overlay, (color_text_x - 3, color_text_y - 10), (color_text_x + color_text_size[0] + 3, color_text_y + 3), (0, 0, 0), -1)
-                cv2.putText(overlay, color_text, (color_text_x, color_text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-        
-        # Draw walls (red lines)
-        for wall in walls:
-            x1, y1, x2, y2 = wall['x1'], wall['y1'], wall['x2'], wall['y2']
+                # Draw color name
+                if color_name != 'unknown':
+                    color_text_size = cv2.getTextSize(color_text, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)[0]
+                    color_text_x = x + (w - color_text_size[0]) // 2
+                    color_text_y = text_y + 20
+                    cv2.rectangle(overlay, (color_text_x - 3, color_text_y - 10), (color_text_x + color_text_size[0] + 3, color_text_y + 3), (0, 0, 0), -1)
+                    cv2.putText(overlay, color_text, (color_text_x, color_text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        
+            # Draw walls (red lines)
+            for wall in walls:
+                x1, y1, x2, y2 = wall['x1'], wall['y1'], wall['x2'], wall['y2']
             
-            # Draw line
-            cv2.line(overlay, (x1, y1), (x2, y2), (0, 0, 255), 3)
+                # Draw line
+                cv2.line(overlay, (x1, y1), (x2, y2), (0, 0, 255), 3)
             
-            # Draw endpoints
-            cv2.circle(overlay, (x1, y1), 4, (0, 0, 200), -1)
-            cv2.circle(overlay, (x2, y2), 4, (0, 0, 200), -1)
+                # Draw endpoints
+                cv2.circle(overlay, (x1, y1), 4, (0, 0, 200), -1)
+                cv2.circle(overlay, (x2, y2), 4, (0, 0, 200), -1)
             
-            # Draw ID text at midpoint
-            mid_x = (x1 + x2) // 2
-            mid_y = (y1 + y2) // 2
-            text = str(wall['id'])
-            cv2.putText(overlay, text, (mid_x - 10, mid_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+                # Draw ID text at midpoint
+                mid_x = (x1 + x2) // 2
+                mid_y = (y1 + y2) // 2
+                text = str(wall['id'])
+                cv2.putText(overlay, text, (mid_x - 10, mid_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
         
-        # Blend with original image (40% overlay, 60% original for better visibility)
-        result = cv2.addWeighted(image, 0.6, overlay, 0.4, 0)
+        with stage('write'):
+            # Blend with original image (40% overlay, 60% original for better visibility)
+            result = cv2.addWeighted(image, 0.6, overlay, 0.4, 0)
         
-        # Save result
-        cv2.imwrite(out_path, result)
+            # Save result
+            cv2.imwrite(out_path, result)
         
     except Exception as e:
-        print(f"Error in draw_overlay: {e}")
\ No newline at end of file
+        log.exception("Error in draw_overlay: %s", e)
\ No newline at end of file
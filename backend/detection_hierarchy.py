@@ -1,6 +1,14 @@
 import cv2
+import logging
 import numpy as np
 from typing import List, Dict, Any, Optional
+from logs import LogSampler
+from stage_timer import stage
+
+log = logging.getLogger(__name__)
+# Per-line and per-booth messages: a plan has thousands of blue line segments
+_line_log = LogSampler(log, every=10, per_second=20)
+_booth_log = LogSampler(log, per_second=20)
 
 def detect_rects_with_hierarchy(image_path: str, min_area: int = 400, 
                                hsv_lower: List[int] = [95, 40, 40], 
@@ -26,82 +34,92 @@ def detect_rects_with_hierarchy(image_path: str, min_area: int = 400,
     """
     try:
         # Load and convert image
-        image = cv2.imread(image_path)
+        with stage('decode'):
+            image = cv2.imread(image_path)
         if image is None:
             return []
         
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        with stage('color_mask'):
+            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
         
-        # Create blue mask
-        lower_blue = np.array(hsv_lower)
-        upper_blue = np.array(hsv_upper)
-        mask = cv2.inRange(hsv, lower_blue, upper_blue)
+            # Create blue mask
+            lower_blue = np.array(hsv_lower)
+            upper_blue = np.array(hsv_upper)
+            mask = cv2.inRange(hsv, lower_blue, upper_blue)
         
         # Morphological operations
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        with stage('morphology'):
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
         
         # Find contours with hierarchy
-        contours, hierarchy = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        with stage('contours') as contour_stage:
+            contours, hierarchy = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+            contour_stage.candidates = len(contours)
         
         if hierarchy is None:
             return []
         
         # Build candidate rects
         candidates = []
-        try:
-            blue_lines = _detect_blue_lines_in_image(image)
-        except:
-            blue_lines = []
+        with stage('blue_lines') as blue_stage:
+            try:
+                blue_lines = _detect_blue_lines_in_image(image)
+            except:
+                blue_lines = []
+            blue_stage.candidates = len(blue_lines)
         
-        for i, contour in enumerate(contours):
-            area = cv2.contourArea(contour)
-            if area >= min_area:
-                x, y, w, h = cv2.boundingRect(contour)
-                rect_area = w * h
-                area_ratio = area / rect_area if rect_area > 0 else 0
-                score = min(1.0, area_ratio * (area / min_area))
+        with stage('candidates') as candidate_stage:
+            for i, contour in enumerate(contours):
+                area = cv2.contourArea(contour)
+                if area >= min_area:
+                    x, y, w, h = cv2.boundingRect(contour)
+                    rect_area = w * h
+                    area_ratio = area / rect_area if rect_area > 0 else 0
+                    score = min(1.0, area_ratio * (area / min_area))
                 
-                # Check for blue lines inside this booth
-                try:
-                    sub_booths = _detect_sub_booths_in_rect(x, y, w, h, blue_lines)
-                except:
-                    sub_booths = []
+                    # Check for blue lines inside this booth
+                    try:
+                        sub_booths = _detect_sub_booths_in_rect(x, y, w, h, blue_lines)
+                    except:
+                        sub_booths = []
                 
-                candidates.append({
-                    "contour_idx": i,
-                    "id": len(candidates) + 1,
-                    "x": int(x),
-                    "y": int(y), 
-                    "w": int(w),
-                    "h": int(h),
-                    "score": round(score, 3),
-                    "area": area,
-                    "parent_id": None,
-                    "sub_booths": sub_booths
-                })
+                    candidates.append({
+                        "contour_idx": i,
+                        "id": len(candidates) + 1,
+                        "x": int(x),
+                        "y": int(y), 
+                        "w": int(w),
+                        "h": int(h),
+                        "score": round(score, 3),
+                        "area": area,
+                        "parent_id": None,
+                        "sub_booths": sub_booths
+                    })
+            candidate_stage.candidates = len(candidates)
         
         # Map hierarchy relationships
-        idx_to_candidate = {c["contour_idx"]: c for c in candidates}
+        with stage('hierarchy'):
+            idx_to_candidate = {c["contour_idx"]: c for c in candidates}
         
-        for candidate in candidates:
-            contour_idx = candidate["contour_idx"]
-            parent_idx = hierarchy[0][contour_idx][3]  # Parent index
+            for candidate in candidates:
+                contour_idx = candidate["contour_idx"]
+                parent_idx = hierarchy[0][contour_idx][3]  # Parent index
             
-            if parent_idx != -1 and parent_idx in idx_to_candidate:
-                parent_candidate = idx_to_candidate[parent_idx]
-                candidate["parent_id"] = parent_candidate["id"]
+                if parent_idx != -1 and parent_idx in idx_to_candidate:
+                    parent_candidate = idx_to_candidate[parent_idx]
+                    candidate["parent_id"] = parent_candidate["id"]
         
-        # Post-filter: remove parent relationship if child is too large
-        for candidate in candidates:
-            if candidate["parent_id"]:
-                parent = next(c for c in candidates if c["id"] == candidate["parent_id"])
-                child_bbox_area = candidate["w"] * candidate["h"]
-                parent_bbox_area = parent["w"] * parent["h"]
+            # Post-filter: remove parent relationship if child is too large
+            for candidate in candidates:
+                if candidate["parent_id"]:
+                    parent = next(c for c in candidates if c["id"] == candidate["parent_id"])
+                    child_bbox_area = candidate["w"] * candidate["h"]
+                    parent_bbox_area = parent["w"] * parent["h"]
                 
-                if child_bbox_area >= 0.9 * parent_bbox_area:
-                    candidate["parent_id"] = None
+                    if child_bbox_area >= 0.9 * parent_bbox_area:
+                        candidate["parent_id"] = None
         
         # Clean up and sort
         rects = []
@@ -122,7 +140,7 @@ def detect_rects_with_hierarchy(image_path: str, min_area: int = 400,
         return rects
         
     except Exception as e:
-        print(f"Error in detect_rects_with_hierarchy: {e}")
+        log.exception("Error in detect_rects_with_hierarchy: %s", e)
         return []
 
 def build_groups(rects: List[Dict[str, Any]]) -> Dict[str, List[int]]:
@@ -161,10 +179,10 @@ def _detect_blue_lines_in_image(image):
         blue_mask = cv2.dilate(blue_mask, kernel, iterations=1)
         
         lines = cv2.HoughLinesP(blue_mask, 1, np.pi/180, 20, minLineLength=15, maxLineGap=10)
-        print(f"Detected {len(lines) if lines is not None else 0} blue lines")
+        log.debug("Detected %d blue lines", len(lines) if lines is not None else 0)
         return lines if lines is not None else []
     except Exception as e:
-        print(f"Error detecting blue lines: {e}")
+        log.exception("Error detecting blue lines: %s", e)
         return []
 
 def _detect_sub_booths_in_rect(x, y, w, h, blue_lines):
@@ -173,7 +191,7 @@ def _detect_sub_booths_in_rect(x, y, w, h, blue_lines):
         sub_booths = []
         
         if blue_lines is None or len(blue_lines) == 0:
-            print(f"No blue lines found for booth at ({x}, {y})")
+            _booth_log.log("No blue lines found for booth at (%s, %s)", x, y)
             return sub_booths
         
         # Find blue lines that are inside this rectangle (with some tolerance)
@@ -203,16 +221,16 @@ def _detect_sub_booths_in_rect(x, y, w, h, blue_lines):
                     
                 if line_in_booth:
                     internal_lines.append([x1, y1, x2, y2])
-                    print(f"Found internal line in booth ({x},{y}): ({x1},{y1}) to ({x2},{y2})")
+                    _line_log.log("Found internal line in booth (%s,%s): (%s,%s) to (%s,%s)", x, y, x1, y1, x2, y2)
             except Exception as e:
-                print(f"Error processing line: {e}")
+                log.warning("Error processing line: %s", e)
                 continue
         
-        print(f"Found {len(internal_lines)} internal lines for booth at ({x}, {y})")
+        _booth_log.log("Found %d internal lines for booth at (%s, %s)", len(internal_lines), x, y)
         
         if len(internal_lines) > 0:
             # Always create divisions if we find blue lines
-            print(f"Creating sub-booths for booth at ({x}, {y})")
+            _booth_log.log("Creating sub-booths for booth at (%s, %s)", x, y)
             
             # Check if lines are more vertical or horizontal
             vertical_count = 0
@@ -235,7 +253,7 @@ def _detect_sub_booths_in_rect(x, y, w, h, blue_lines):
                     {"id": "A", "x": x, "y": y, "w": w//2, "h": h, "score": 1.0, "parent_id": None},
                     {"id": "B", "x": x_split, "y": y, "w": w//2, "h": h, "score": 1.0, "parent_id": None}
                 ]
-                print(f"Created vertical split: A({x},{y}) B({x_split},{y})")
+                _booth_log.log("Created vertical split: A(%s,%s) B(%s,%s)", x, y, x_split, y)
             else:
                 # Split horizontally
                 y_split = y + h // 2
@@ -243,11 +261,11 @@ def _detect_sub_booths_in_rect(x, y, w, h, blue_lines):
                     {"id": "A", "x": x, "y": y, "w": w, "h": h//2, "score": 1.0, "parent_id": None},
                     {"id": "B", "x": x, "y": y_split, "w": w, "h": h//2, "score": 1.0, "parent_id": None}
                 ]
-                print(f"Created horizontal split: A({x},{y}) B({x},{y_split})")
+                _booth_log.log("Created horizontal split: A(%s,%s) B(%s,%s)", x, y, x, y_split)
         
         return sub_booths
     except Exception as e:
-        print(f"Error in _detect_sub_booths_in_rect: {e}")
+        log.warning("Error in _detect_sub_booths_in_rect: %s", e)
         return []
 
 def draw_overlay_with_hierarchy(image_path: str, rects: List[Dict], out_path: str) -> bool:
@@ -263,47 +281,50 @@ def draw_overlay_with_hierarchy(image_path: str, rects: List[Dict], out_path: st
         True if successful, False otherwise
     """
     try:
-        image = cv2.imread(image_path)
+        with stage('decode'):
+            image = cv2.imread(image_path)
         if image is None:
             return False
         
-        overlay = image.copy()
+        with stage('draw'):
+            overlay = image.copy()
         
-        # Draw rectangles with hierarchy-aware styling
-        for rect in rects:
-            x, y, w, h = rect["x"], rect["y"], rect["w"], rect["h"]
-            rect_id = rect["id"]
-            is_parent = any(r.get("parent_id") == rect_id for r in rects)
-            is_child = rect.get("parent_id") is not None
+            # Draw rectangles with hierarchy-aware styling
+            for rect in rects:
+                x, y, w, h = rect["x"], rect["y"], rect["w"], rect["h"]
+                rect_id = rect["id"]
+                is_parent = any(r.get("parent_id") == rect_id for r in rects)
+                is_child = rect.get("parent_id") is not None
             
-            if is_parent:
-                # Parent booth: thicker green border, lighter fill
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), -1)
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 200, 0), 3)
-                text_color = (0, 0, 0)
-            elif is_child:
-                # Child booth: blue border, semi-transparent fill
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (255, 100, 0), -1)
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (255, 0, 0), 2)
-                text_color = (255, 255, 255)
-            else:
-                # Standalone booth: standard green
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), -1)
-                cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 200, 0), 2)
-                text_color = (0, 0, 0)
+                if is_parent:
+                    # Parent booth: thicker green border, lighter fill
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), -1)
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 200, 0), 3)
+                    text_color = (0, 0, 0)
+                elif is_child:
+                    # Child booth: blue border, semi-transparent fill
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (255, 100, 0), -1)
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (255, 0, 0), 2)
+                    text_color = (255, 255, 255)
+                else:
+                    # Standalone booth: standard green
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 255, 0), -1)
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (0, 200, 0), 2)
+                    text_color = (0, 0, 0)
             
-            # Draw ID
-            text = str(rect_id)
-            text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-            text_x = x + (w - text_size[0]) // 2
-            text_y = y + (h + text_size[1]) // 2
-            cv2.putText(overlay, text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, text_color, 2)
+                # Draw ID
+                text = str(rect_id)
+                text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+                text_x = x + (w - text_size[0]) // 2
+                text_y = y + (h + text_size[1]) // 2
+                cv2.putText(overlay, text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, text_color, 2)
         
         # Blend with original
-        result = cv2.addWeighted(image, 0.6, overlay, 0.4, 0)
-        cv2.imwrite(out_path, result)
+        with stage('write'):
+            result = cv2.addWeighted(image, 0.6, overlay, 0.4, 0)
+            cv2.imwrite(out_path, result)
         return True
         
     except Exception as e:
-        print(f"Error in draw_overlay_with_hierarchy: {e}")
+        log.exception("Error in draw_overlay_with_hierarchy: %s", e)
         return False
\ No newline at end of file
@@ -1,7 +1,10 @@
 import cv2
+import logging
 import numpy as np
 from typing import List, Dict, Any
 
+log = logging.getLogger(__name__)
+
 def detect_with_subsections(image_path: str) -> Dict[str, Any]:
     """
     Detect walls, booths, and sub-booths from floorplan image.
@@ -29,7 +32,7 @@ def detect_with_subsections(image_path: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        print(f"Error in detect_with_subsections: {e}")
+        log.exception("Error in detect_with_subsections: %s", e)
         return {"walls": [], "booths": []}
 
 def _detect_walls(image):
@@ -195,6 +198,6 @@ def _create_sub_booths_simple(x, y, w, h, partition_lines, parent_id):
             })
     
     except Exception as e:
-        print(f"Error creating sub-booths: {e}")
+        log.exception("Error creating sub-booths: %s", e)
     
     return sub_booths
\ No newline at end of file
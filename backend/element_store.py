@@ -0,0 +1,280 @@
+"""
+Chunked element storage for very large floor plans.
+
+By default a floor plan keeps its elements inline in `state.elements`
+(storage mode 'inline'). In 'chunked' mode the elements are sharded into the
+`floorplan_element_chunks` collection in fixed-size chunks keyed by
+(floorplan_id, layer, tile), and the floor plan document only keeps the rest
+of the state plus a few summary fields. The API assembles the elements on
+demand, so clients that ask for the full state never see the difference.
+
+Chunk document shape:
+{
+  _id: ObjectId,
+  floorplan_id: ObjectId,
+  chunk_version: int,        # floor plan version the chunks were written at
+  layer: int,
+  tile: str,                 # "<tx>_<ty>", grid cell of the element's top-left corner
+  seq: int,                  # chunk number within (layer, tile)
+  count: int,
+  bounds: {x, y, width, height},
+  positions: [int, ...],     # original index of each element in state.elements
+  elements: [ ... ]
+}
+"""
+
+import math
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING
+from config import Config
+from models import FloorPlanStats
+
+ELEMENT_CHUNKS_COLLECTION = 'floorplan_element_chunks'
+
+STORAGE_INLINE = 'inline'
+STORAGE_CHUNKED = 'chunked'
+
+# Fields of a chunk needed to reassemble its elements
+CHUNK_ELEMENTS_PROJECTION = {'positions': 1, 'elements': 1}
+
+
+def _number(value, default: float = 0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def element_layer(element: Dict) -> int:
+    """Layer an element is stored under"""
+    try:
+        return int(element.get('layer', 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def element_tile(element: Dict, tile_size: int = None) -> str:
+    """Tile key of the grid cell containing the element's top-left corner"""
+    tile_size = tile_size or Config.ELEMENT_TILE_SIZE
+    tx = int(math.floor(_number(element.get('x')) / tile_size))
+    ty = int(math.floor(_number(element.get('y')) / tile_size))
+    return f'{tx}_{ty}'
+
+
+def element_rect(element: Dict) -> Tuple[float, float, float, float]:
+    """Axis-aligned (x0, y0, x1, y1) rectangle of an element"""
+    x = _number(element.get('x'))
+    y = _number(element.get('y'))
+    width = _number(element.get('width', element.get('w', 0)))
+    height = _number(element.get('height', element.get('h', 0)))
+    return x, y, x + max(width, 0), y + max(height, 0)
+
+
+def element_bounds(element: Dict) -> Tuple[float, float, float, float]:
+    """Bounding rectangle of an element, taking rotation about its origin into account"""
+    x0, y0, x1, y1 = element_rect(element)
+    rotation = _number(element.get('rotation'))
+    if not rotation % 360:
+        return x0, y0, x1, y1
+
+    angle = math.radians(rotation)
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    width, height = x1 - x0, y1 - y0
+    corners = [(0, 0), (width, 0), (width, height), (0, height)]
+    xs = [x0 + cx * cos_a - cy * sin_a for cx, cy in corners]
+    ys = [y0 + cx * sin_a + cy * cos_a for cx, cy in corners]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def elements_bounds(elements: List[Dict]) -> Dict:
+    rects = [element_bounds(element) for element in elements]
+    if not rects:
+        return {'x': 0, 'y': 0, 'width': 0, 'height': 0}
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[2] for r in rects)
+    y1 = max(r[3] for r in rects)
+    return {'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0}
+
+
+def chunk_elements(elements: List[Dict], chunk_size: int = None,
+                   tile_size: int = None) -> List[Dict]:
+    """Group elements into chunk payloads by (layer, tile), at most chunk_size per chunk"""
+    chunk_size = max(1, chunk_size or Config.ELEMENT_CHUNK_SIZE)
+
+    groups = {}
+    for position, element in enumerate(elements):
+        key = (element_layer(element), element_tile(element, tile_size))
+        groups.setdefault(key, []).append((position, element))
+
+    chunks = []
+    for (layer, tile), members in sorted(groups.items()):
+        for seq, start in enumerate(range(0, len(members), chunk_size)):
+            part = members[start:start + chunk_size]
+            part_elements = [element for _, element in part]
+            chunks.append({
+                'layer': layer,
+                'tile': tile,
+                'seq': seq,
+                'count': len(part),
+                'bounds': elements_bounds(part_elements),
+                'positions': [position for position, _ in part],
+                'elements': part_elements
+            })
+    return chunks
+
+
+def resolve_storage(state: Optional[Dict], requested: str = None, current: str = None) -> str:
+    """
+    Pick the storage mode for a state write.
+
+    An explicit request wins, then the document's current mode, then the
+    automatic threshold (ELEMENT_CHUNK_THRESHOLD, 0 disables it).
+    """
+    if requested in (STORAGE_INLINE, STORAGE_CHUNKED):
+        return requested
+    if current == STORAGE_CHUNKED:
+        return STORAGE_CHUNKED
+    threshold = Config.ELEMENT_CHUNK_THRESHOLD
+    elements = (state or {}).get('elements', []) or []
+    if threshold and len(elements) > threshold:
+        return STORAGE_CHUNKED
+    return STORAGE_INLINE
+
+
+def write_state(db, floorplan_id, version: int, state: Dict, storage: str = STORAGE_INLINE) -> Dict:
+    """
+    Persist the element part of a state write and return the floor plan fields to $set.
+
+    In chunked mode the elements are written as chunks tagged with `version`
+    and the returned `state` has no `elements` key. Older chunks are left in
+    place for readers of the current document; call drop_stale_chunks once
+    the floor plan points at the new state.
+    """
+    state = dict(state or {})
+    elements = state.get('elements', []) or []
+
+    fields = {
+        'storage': storage,
+        'element_count': len(elements)
+    }
+
+    if storage == STORAGE_CHUNKED:
+        chunks = chunk_elements(elements)
+        for chunk in chunks:
+            chunk['floorplan_id'] = floorplan_id
+            chunk['chunk_version'] = version
+        collection = db[ELEMENT_CHUNKS_COLLECTION]
+        # Leftovers of an earlier write at this version that failed before the document was updated
+        collection.delete_many({'floorplan_id': floorplan_id, 'chunk_version': version})
+        if chunks:
+            collection.insert_many(chunks)
+
+        state.pop('elements', None)
+        fields['state'] = state
+        fields['chunk_version'] = version
+        fields['chunk_count'] = len(chunks)
+        fields['booth_stats'] = FloorPlanStats.calculate_booth_stats({'state': {'elements': elements}})
+    else:
+        fields['state'] = state
+        fields['chunk_version'] = None
+        fields['chunk_count'] = 0
+        fields['booth_stats'] = None
+
+    return fields
+
+
+def is_chunked(floorplan: Dict) -> bool:
+    return floorplan.get('storage') == STORAGE_CHUNKED
+
+
+def chunk_query(floorplan: Dict, layer: int = None, tile: str = None) -> Dict:
+    query = {
+        'floorplan_id': floorplan['_id'],
+        'chunk_version': floorplan.get('chunk_version')
+    }
+    if layer is not None:
+        query['layer'] = layer
+    if tile is not None:
+        query['tile'] = tile
+    return query
+
+
+def load_elements(db, floorplan: Dict, layer: int = None, tile: str = None) -> List[Dict]:
+    """Elements of a floor plan in their original order, optionally limited to a layer/tile"""
+    if not is_chunked(floorplan):
+        elements = (floorplan.get('state') or {}).get('elements', []) or []
+        if layer is not None:
+            elements = [element for element in elements if element_layer(element) == layer]
+        if tile is not None:
+            elements = [element for element in elements if element_tile(element) == tile]
+        return elements
+
+    cursor = db[ELEMENT_CHUNKS_COLLECTION].find(
+        chunk_query(floorplan, layer, tile),
+        projection=CHUNK_ELEMENTS_PROJECTION
+    )
+    return merge_chunk_elements(cursor)
+
+
+def merge_chunk_elements(chunks) -> List[Dict]:
+    """Elements of the given chunks back in their original order"""
+    positioned = []
+    for chunk in chunks:
+        positioned.extend(zip(chunk.get('positions', []), chunk.get('elements', [])))
+    positioned.sort(key=lambda item: item[0])
+    return [element for _, element in positioned]
+
+
+def attach_elements(db, floorplan: Dict) -> Dict:
+    """Fill state.elements in place for a chunked floor plan document"""
+    if floorplan and is_chunked(floorplan):
+        state = floorplan.get('state') or {}
+        state['elements'] = load_elements(db, floorplan)
+        floorplan['state'] = state
+    return floorplan
+
+
+def list_chunks(db, floorplan: Dict) -> List[Dict]:
+    """Chunk manifest (layer, tile, seq, count, bounds) without element payloads"""
+    if not is_chunked(floorplan):
+        elements = (floorplan.get('state') or {}).get('elements', []) or []
+        chunks = chunk_elements(elements)
+    else:
+        chunks = list(db[ELEMENT_CHUNKS_COLLECTION].find(
+            chunk_query(floorplan),
+            projection={'elements': 0, 'positions': 0}
+        ).sort([('layer', ASCENDING), ('tile', ASCENDING), ('seq', ASCENDING)]))
+
+    return [{
+        'layer': chunk['layer'],
+        'tile': chunk['tile'],
+        'seq': chunk['seq'],
+        'count': chunk['count'],
+        'bounds': chunk.get('bounds')
+    } for chunk in chunks]
+
+
+def drop_stale_chunks(db, floorplan_id) -> int:
+    """
+    Remove the chunk generations older than the one the stored floor plan uses.
+
+    Runs after the floor plan document (and its read model) has been updated,
+    so readers never find the current generation missing, and a write that
+    fails halfway leaves the old generation intact.
+    """
+    floorplan = db.floorplans.find_one({'_id': floorplan_id},
+                                       projection={'storage': 1, 'version': 1, 'chunk_version': 1})
+    if floorplan is None:
+        return 0
+    if is_chunked(floorplan):
+        stale = {'$lt': floorplan['chunk_version']}
+    else:
+        stale = {'$lte': floorplan['version']}
+    result = db[ELEMENT_CHUNKS_COLLECTION].delete_many({'floorplan_id': floorplan_id, 'chunk_version': stale})
+    return result.deleted_count
+
+
+def delete_element_chunks(db, floorplan_id) -> int:
+    result = db[ELEMENT_CHUNKS_COLLECTION].delete_many({'floorplan_id': floorplan_id})
+    return result.deleted_count
@@ -0,0 +1,135 @@
+"""
+Dependency status for the health endpoints.
+
+Probes must be cheap: orchestrators call them every few seconds on every
+worker. A background thread per process checks the dependencies every
+HEALTH_CHECK_INTERVAL seconds on the shared client (database.py), and the
+endpoints only read its last result:
+
+    mongo    ping round trip on the shared pool (HEALTH_MONGO_TIMEOUT_MS at most)
+    yolo     whether this process has loaded / run the model (never loads it)
+    uploads  upload directory writable, free disk space (HEALTH_MIN_FREE_DISK_MB)
+
+A status older than three intervals counts as failed, so a checker stuck on
+a hung dependency doesn't keep reporting its last good result.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+import pymongo
+from config import Config
+from database import get_client
+from yolo_detect import model_status
+from logs import log_context
+
+log = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+
+
+def check_mongo() -> Dict:
+    started = time.perf_counter()
+    try:
+        with pymongo.timeout(Config.HEALTH_MONGO_TIMEOUT_MS / 1000):
+            get_client().admin.command('ping')
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+    return {'ok': True, 'rtt_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+
+def check_uploads(upload_dir: str) -> Dict:
+    try:
+        # Creating a file is the only reliable test (read-only mounts, full disks, permissions)
+        with tempfile.NamedTemporaryFile(dir=upload_dir, prefix='.health-'):
+            pass
+        writable, error = True, None
+    except OSError as e:
+        writable, error = False, str(e)
+
+    try:
+        free_mb = shutil.disk_usage(upload_dir).free // (1024 * 1024)
+    except OSError:
+        free_mb = None
+    status = {
+        'ok': writable and free_mb is not None and free_mb >= Config.HEALTH_MIN_FREE_DISK_MB,
+        'writable': writable,
+        'free_mb': free_mb,
+        'min_free_mb': Config.HEALTH_MIN_FREE_DISK_MB
+    }
+    if error:
+        status['error'] = error
+    return status
+
+
+class DependencyChecker:
+    """Background dependency checks for one process"""
+
+    def __init__(self, upload_dir: str, interval: float = None):
+        self.upload_dir = upload_dir
+        self.interval = interval or Config.HEALTH_CHECK_INTERVAL
+        self._status: Optional[Dict] = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def check(self) -> Dict:
+        """Run every check now and store the result"""
+        status = {
+            'checked_at': time.time(),
+            'mongo': check_mongo(),
+            'yolo': model_status(),
+            'uploads': check_uploads(self.upload_dir)
+        }
+        self._status = status
+        return status
+
+    def _run(self):
+        checks = 0
+        while True:
+            checks += 1
+            with log_context(job_id=f'dependency-check-{os.getpid()}-{checks}'):
+                try:
+                    self.check()
+                except Exception as e:  # keep the thread alive; a stale status reads as not ready
+                    log.exception("Health check failed: %s", e)
+            time.sleep(self.interval)
+
+    def ensure_started(self):
+        """Start the checker thread of this process (again after a fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._status = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='dependency-checker', daemon=True)
+                self._thread.start()
+
+    def status(self) -> Dict:
+        """Last result with readiness; never does I/O itself"""
+        self.ensure_started()
+        status = self._status
+        if status is None:
+            return {'ready': False, 'reason': 'starting'}
+
+        age = time.time() - status['checked_at']
+        report = dict(status, checked_at=datetime.utcfromtimestamp(status['checked_at']).isoformat(),
+                      age_seconds=round(age, 1))
+        if age > 3 * self.interval:
+            report.update(ready=False, reason='dependency status is stale')
+        elif not status['mongo']['ok']:
+            report.update(ready=False, reason='database unavailable')
+        elif not status['uploads']['ok']:
+            report.update(ready=False, reason='upload storage unavailable')
+        else:
+            report['ready'] = True
+        return report
+
+
+dependency_checker = DependencyChecker(UPLOAD_DIR)
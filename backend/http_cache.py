@@ -0,0 +1,165 @@
+"""
+Conditional GET helpers (ETag / Last-Modified) for floor plan reads.
+
+Single documents get a strong ETag derived from (id, version); lists get a
+weak ETag derived from the newest modification time and the item count.
+Routes first do a cheap projected lookup, answer 304 when the client's copy
+is current, and only then read and serialize the full payload.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from flask import request, make_response
+from werkzeug.http import http_date, parse_date, parse_etags
+from config import Config
+
+# Fields needed to compute validators without reading the payload
+VERSION_PROJECTION = {'version': 1, 'last_modified': 1, 'status': 1, 'user_id': 1}
+
+
+def public_cache_control() -> str:
+    return (f'public, max-age={Config.PUBLIC_CACHE_MAX_AGE}, '
+            f'stale-while-revalidate={Config.PUBLIC_CACHE_STALE_WHILE_REVALIDATE}')
+
+
+# Authenticated reads may only be cached by the browser and must be revalidated
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+
+def query_variant(query: bytes) -> str:
+    """Short hash of a query string so ?elements=none etc. get distinct validators"""
+    if not query:
+        return ''
+    return '-' + hashlib.sha1(query).hexdigest()[:8]
+
+
+def _variant() -> str:
+    return query_variant(request.query_string)
+
+
+def fields_variant(selection: Optional[str]) -> str:
+    """Short hash of a field selection, for validators of items inside a batch response"""
+    if not selection:
+        return ''
+    return '-' + hashlib.sha1(selection.encode('utf-8')).hexdigest()[:8]
+
+
+def document_etag(doc_id, version, variant: Optional[str] = None) -> str:
+    """Strong ETag for a versioned document (variant defaults to the query string hash)"""
+    if variant is None:
+        variant = _variant()
+    return f'"{doc_id}-v{version}{variant}"'
+
+
+def list_etag(prefix: str, last_modified: Optional[datetime], count: int, variant: Optional[str] = None) -> str:
+    """Weak ETag for a list, from its newest modification time and item count"""
+    if variant is None:
+        variant = _variant()
+    return f'W/"{prefix}-{count}-{_stamp(last_modified)}{variant}"'
+
+
+def modification_stamp(doc) -> int:
+    """Millisecond modification time, the version of documents without a version counter"""
+    return _stamp(_modified_at(doc))
+
+
+def _stamp(value: Optional[datetime]) -> int:
+    return int(_as_utc(value).timestamp() * 1000) if value else 0
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _modified_at(doc) -> Optional[datetime]:
+    return doc.get('last_modified') or doc.get('created_at') or doc.get('created')
+
+
+def list_validators(collection, query) -> tuple:
+    """(count, newest modification time) of the documents matching query, in one aggregation"""
+    summary = next(collection.aggregate([
+        {'$match': query},
+        {'$group': {
+            '_id': None,
+            'count': {'$sum': 1},
+            'last_modified': {'$max': {'$ifNull': ['$last_modified', '$created_at']}}
+        }}
+    ]), None)
+    if not summary:
+        return 0, None
+    return summary['count'], summary.get('last_modified')
+
+
+def list_validators_from_docs(docs) -> tuple:
+    """Same as list_validators() for documents that were already fetched"""
+    stamps = [stamp for stamp in (_modified_at(doc) for doc in docs) if stamp]
+    return len(docs), (max(stamps) if stamps else None)
+
+
+def is_conditional_request() -> bool:
+    return bool(request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since'))
+
+
+def etag_listed(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value lists etag (weak comparison)"""
+    etags = parse_etags(if_none_match)
+    return bool(etags) and (etags.star_tag or etags.contains_weak(etag.removeprefix('W/').strip('"')))
+
+
+def etag_matches(etag: str) -> bool:
+    """Whether the request's If-None-Match lists etag; batch items are checked one by one"""
+    return etag_listed(request.headers.get('If-None-Match'), etag)
+
+
+def evaluate_conditional(if_none_match: Optional[str], if_modified_since: Optional[str],
+                         etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Whether the client's copy is current, given the raw conditional headers.
+
+    If-None-Match takes precedence (RFC 9110) and uses weak comparison.
+    """
+    if if_none_match:
+        return etag_listed(if_none_match, etag)
+
+    since = parse_date(if_modified_since)
+    if since is not None and last_modified is not None:
+        # HTTP dates have one-second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate the request's If-None-Match / If-Modified-Since against the current validators"""
+    return evaluate_conditional(request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'),
+                                etag, last_modified)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None,
+                      cache_control: str = PRIVATE_CACHE_CONTROL) -> Dict[str, str]:
+    """ETag, Last-Modified and Cache-Control as plain headers, for responses built outside Flask"""
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(_as_utc(last_modified))
+    return headers
+
+
+def with_validators(response, etag: str, last_modified: Optional[datetime] = None,
+                    cache_control: str = PRIVATE_CACHE_CONTROL):
+    """Attach ETag, Last-Modified and Cache-Control to a response"""
+    weak = etag.startswith('W/')
+    response.set_etag(etag.removeprefix('W/').strip('"'), weak=weak)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None,
+                 cache_control: str = PRIVATE_CACHE_CONTROL):
+    """Empty 304 response carrying the current validators"""
+    response = make_response('', 304)
+    return with_validators(response, etag, last_modified, cache_control)
@@ -0,0 +1,126 @@
+"""
+MongoDB index specs, grouped by the migration that creates them.
+
+Every spec names the query shape it serves (collection, filter fields and
+sort of the route or helper that issues it), so an index can be traced back
+to its callers and one that no query needs anymore is easy to spot. The
+specs are applied by the migrations in migrations.py:
+
+    cd backend
+    python migrate.py apply
+
+create_index is a no-op for an index that already exists with the same keys
+and options, so applying specs again is safe.
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+from pymongo import ASCENDING, DESCENDING, TEXT
+from revisions import REVISIONS_COLLECTION
+from element_store import ELEMENT_CHUNKS_COLLECTION
+from read_models import PUBLISHED_FLOORPLANS_COLLECTION
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, object]]
+    options: Dict
+    serves: str
+
+    @property
+    def name(self) -> str:
+        """Index name as generated by MongoDB for these keys"""
+        return '_'.join(f'{field}_{direction}' for field, direction in self.keys)
+
+
+# Indexes the app used to create on every startup
+CORE_INDEXES = [
+    IndexSpec('users', [('username', ASCENDING)], {'unique': True},
+              'auth register/login: {$or: [{email}, {username}]}'),
+    IndexSpec('users', [('email', ASCENDING)], {'unique': True},
+              'auth register/login: {$or: [{email}, {username}]}'),
+    IndexSpec('floorplans', [('name', ASCENDING)], {}, 'floor plan names'),
+    IndexSpec('floorplans', [('user_id', ASCENDING)], {}, 'dashboard: {user_id}'),
+    IndexSpec('floorplans', [('event_id', ASCENDING)], {},
+              'GET /floorplans?event_id=: {event_id} sort last_modified'),
+    IndexSpec('floorplans', [('last_modified', DESCENDING)], {},
+              'GET /floorplans (admin): {} sort last_modified desc'),
+    IndexSpec('floorplans', [('_id', ASCENDING), ('status', ASCENDING)], {},
+              'public hall map $lookup: {_id: {$in}, status: {$in}} reading (_id, status) only'),
+    IndexSpec('halls', [('public', ASCENDING), ('event_id', ASCENDING), ('last_modified', DESCENDING)], {},
+              'GET /public/halls: {public, event_id} sort last_modified desc'),
+    IndexSpec(REVISIONS_COLLECTION, [('floorplan_id', ASCENDING), ('version', DESCENDING)], {'unique': True},
+              'revision history: {floorplan_id} sort version desc'),
+    IndexSpec(REVISIONS_COLLECTION,
+              [('floorplan_id', ASCENDING), ('kind', ASCENDING), ('version', DESCENDING)], {},
+              'revert: {floorplan_id, kind: snapshot, version: {$lte}} sort version desc'),
+    IndexSpec(ELEMENT_CHUNKS_COLLECTION,
+              [('floorplan_id', ASCENDING), ('chunk_version', ASCENDING), ('layer', ASCENDING),
+               ('tile', ASCENDING), ('seq', ASCENDING)], {'unique': True},
+              'chunk reads: {floorplan_id, chunk_version[, layer, tile]} sort layer, tile, seq'),
+    IndexSpec(PUBLISHED_FLOORPLANS_COLLECTION, [('last_modified', DESCENDING)], {},
+              'GET /public/floorplans: {status: published} sort last_modified desc'),
+    IndexSpec(PUBLISHED_FLOORPLANS_COLLECTION, [('event_id', ASCENDING), ('last_modified', DESCENDING)], {},
+              'GET /public/floorplans?event_id=: {status, event_id} sort last_modified desc'),
+]
+
+# Indexes database_schema.setup_hierarchical_schema used to create
+HIERARCHY_INDEXES = [
+    IndexSpec('area_floorplans', [('created_by', ASCENDING)], {}, 'area plans by uploader'),
+    IndexSpec('area_floorplans', [('status', ASCENDING)], {}, 'GET /public/area-plans: {status: published}'),
+    IndexSpec('area_floorplans', [('created_at', DESCENDING)], {},
+              'GET /admin/area-plans: {} sort created_at desc'),
+    IndexSpec('area_floorplans', [('name', TEXT), ('description', TEXT)], {}, 'area plan text search'),
+    IndexSpec('hall_floorplans', [('hall_id', ASCENDING)], {}, 'GET /admin/halls/<id>/plans: {hall_id}'),
+    IndexSpec('hall_floorplans', [('area_plan_id', ASCENDING)], {},
+              'event hierarchy $lookup: hall plans of the area plans'),
+    IndexSpec('hall_floorplans', [('created_by', ASCENDING)], {}, 'hall plans by uploader'),
+    IndexSpec('hall_floorplans', [('status', ASCENDING)], {}, 'published hall plans'),
+    IndexSpec('hall_floorplans', [('created_at', DESCENDING)], {}, 'hall plans by upload time'),
+    IndexSpec('hall_floorplans', [('hall_id', ASCENDING), ('status', ASCENDING)], {},
+              'event hierarchy $lookup: {status: published, hall_id}'),
+    IndexSpec('halls', [('assigned_plan_id', ASCENDING)], {}, 'halls by assigned plan'),
+    IndexSpec('halls', [('public', ASCENDING)], {}, 'public halls'),
+    IndexSpec('halls', [('event_id', ASCENDING)], {}, 'GET /halls?event_id=: {event_id}'),
+    IndexSpec('halls', [('public', ASCENDING), ('event_id', ASCENDING)], {},
+              'GET /public/events/<id>/hierarchy: {event_id, public}'),
+    IndexSpec('hall_floorplans', [('hall_id', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING)], {},
+              'GET /public/hall-plans/<hall_id>: {hall_id, status: published} sort created_at desc'),
+]
+
+# Hot queries that had no index matching their filter and sort
+HOT_QUERY_INDEXES = [
+    IndexSpec('floorplans', [('status', ASCENDING), ('last_modified', DESCENDING)], {},
+              'GET /floorplans (users): {status: {$in: [active, published]}} sort last_modified desc; '
+              'read model rebuild: {status: published}'),
+    IndexSpec('floorplans', [('event_id', ASCENDING), ('status', ASCENDING)], {},
+              'event hierarchy $unionWith: {event_id, status: {$in: [active, published]}}'),
+    IndexSpec('floorplans', [('user_id', ASCENDING), ('last_modified', DESCENDING)], {},
+              'dashboard: {user_id} sort last_modified desc'),
+    IndexSpec('area_floorplans', [('status', ASCENDING), ('created_at', DESCENDING)], {},
+              'GET /public/area-plans: {status: published} sort created_at desc'),
+    IndexSpec('halls', [('event_id', ASCENDING), ('last_modified', DESCENDING)], {},
+              'GET /halls?event_id=: {event_id} sort last_modified desc'),
+]
+
+
+def create_indexes(db, specs: Iterable[IndexSpec]) -> List[str]:
+    """Create the indexes of specs; returns collection.name of those that didn't exist yet"""
+    created = []
+    for spec in specs:
+        existing = db[spec.collection].index_information()
+        name = db[spec.collection].create_index(spec.keys, **spec.options)
+        if name not in existing:
+            created.append(f'{spec.collection}.{name}')
+    return created
+
+
+def missing_indexes(db, specs: Iterable[IndexSpec]) -> List[IndexSpec]:
+    """Specs whose index doesn't exist"""
+    existing = {}
+    missing = []
+    for spec in specs:
+        if spec.collection not in existing:
+            existing[spec.collection] = db[spec.collection].index_information()
+        if spec.name not in existing[spec.collection]:
+            missing.append(spec)
+    return missing
@@ -0,0 +1,111 @@
+"""
+Fast JSON provider for Flask.
+
+Replaces the stdlib-based DefaultJSONProvider with orjson, which serializes
+large floor plan states an order of magnitude faster and handles datetime and
+NumPy types natively. ObjectId (and anything else orjson doesn't know) goes
+through `default`. If orjson is not installed the app keeps the stdlib
+encoder, extended with the same type handling, so responses look the same.
+
+Dates and datetimes keep Flask's format, an HTTP date
+("Sun, 18 Oct 2026 23:50:35 GMT"); naive values are UTC (the models store
+`datetime.utcnow()`).
+"""
+
+import dataclasses
+import decimal
+import sys
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Union
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value: date) -> str:
+    """werkzeug.http.http_date without the email.utils round trip (plans carry a datetime per element)"""
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (f'{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} '
+            f'{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT')
+
+
+def _default(obj: Any) -> Any:
+    """Types neither encoder handles on its own"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, date):
+        # Same wire format as Flask's DefaultJSONProvider
+        return http_date(obj)
+    if isinstance(obj, (uuid.UUID, decimal.Decimal)):
+        return str(obj)
+    # NumPy values only exist once the detection stack has imported numpy
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if isinstance(obj, np.floating):
+            return float(obj)
+        if isinstance(obj, np.bool_):
+            return bool(obj)
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson-backed provider; falls back to the stdlib encoder when orjson is missing"""
+
+    default = staticmethod(_default)
+    # Key order carries no meaning for API clients and sorting costs time on large states
+    sort_keys = False
+    ensure_ascii = False
+
+    def _options(self, indent: bool = False) -> int:
+        # Datetimes go through _default, orjson would write ISO 8601
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        """Serialize obj to UTF-8 JSON bytes"""
+        if orjson is None:
+            kwargs = {'indent': 2} if indent else {'separators': (',', ':')}
+            return super().dumps(obj, **kwargs).encode('utf-8')
+        return orjson.dumps(obj, default=_default, option=self._options(indent))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Callers passing json.dumps options (cls, separators, ...) get the stdlib encoder
+        if orjson is None or set(kwargs) - {'indent'}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype
+        )
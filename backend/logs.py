@@ -0,0 +1,264 @@
+"""
+Structured, leveled logging.
+
+Modules log to logging.getLogger(__name__). init_logging() routes the
+records of the process through a bounded queue to a writer thread, so the
+thread that logs only builds the record and does a put_nowait. When the
+queue is full (stdout can't keep up) records are dropped and counted rather
+than waited for; the writer reports how many when it catches up.
+
+    LOG_FORMAT=json   one JSON object per line (default): ts, level, logger, message,
+                      pid, request_id / job_id and any `extra` fields
+    LOG_FORMAT=text   the same as a readable line, for development
+    LOG_LEVEL         root level (INFO)
+    LOG_LEVELS        per-logger levels, e.g. detection_hierarchy=DEBUG,pymongo=WARNING
+
+Requests get the id of their X-Request-ID header (or a new one), which is
+also sent back in the response. Work outside a request sets its own ids
+with log_context(job_id=...).
+
+Per-item messages in hot loops go through a LogSampler: one in `every`
+calls, at most `per_second` per second, each with the number it skipped.
+With its level off a sampler costs one level check per call.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request
+from config import Config
+
+_context = contextvars.ContextVar('log_context', default={})
+
+# LogRecord attributes that aren't `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord('', logging.INFO, '', 0, '', (), None))) | {'message', 'asctime'}
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+
+def bind_log_context(**ids) -> contextvars.Token:
+    """Add correlation ids to the records of this context until unbind_log_context(token)"""
+    return _context.set({**_context.get(), **ids})
+
+
+def unbind_log_context(token: contextvars.Token) -> None:
+    _context.reset(token)
+
+
+@contextmanager
+def log_context(**ids):
+    """Add correlation ids (job_id=..., ...) to every record logged inside the block"""
+    token = bind_log_context(**ids)
+    try:
+        yield
+    finally:
+        unbind_log_context(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the correlation ids of the logging thread onto the record"""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+def _extra_fields(record) -> Dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith('_')}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            head, _, tail = line.partition('\n')
+            line = head + ' ' + ' '.join(f'{k}={v}' for k, v in fields.items()) + (f'\n{tail}' if tail else '')
+        return line
+
+
+class AsyncHandler(QueueHandler):
+    """Hands records to a writer thread; never blocks the thread that logs"""
+
+    def __init__(self, target: logging.Handler, maxsize: int):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._unreported = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.addFilter(ContextFilter())
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is None or self._pid != os.getpid():
+                # A forked worker inherits the queue but not the writer thread
+                self.queue = queue.Queue(self.maxsize)
+                self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        """Render the message now (its arguments may change later), keep the rest structured"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            return
+        if self._unreported:
+            dropped, self._unreported = self._unreported, 0
+            report = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                       '%d log records dropped (queue full)', (dropped,), None)
+            try:
+                self.queue.put_nowait(self.prepare(report))
+            except queue.Full:
+                self._unreported += dropped
+
+    def close(self):
+        """Stop the writer after it has written what is queued"""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                try:
+                    self._listener.stop()
+                except queue.Full:
+                    pass
+            self._listener = None
+        super().close()
+
+
+class LogSampler:
+    """Sampled, rate-limited logging for per-item messages"""
+
+    def __init__(self, logger: logging.Logger, level: int = logging.DEBUG, every: int = 1,
+                 per_second: float = 10.0):
+        self.logger = logger
+        self.level = level
+        self.every = max(1, every)
+        self.per_second = per_second
+        self._calls = 0
+        self._skipped = 0
+        self._allowance = per_second
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def log(self, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        with self._lock:
+            self._calls += 1
+            now = time.monotonic()
+            self._allowance = min(self.per_second, self._allowance + (now - self._last) * self.per_second)
+            self._last = now
+            if self._calls % self.every or self._allowance < 1:
+                self._skipped += 1
+                return
+            self._allowance -= 1
+            skipped, self._skipped = self._skipped, 0
+        if skipped:
+            kwargs['extra'] = dict(kwargs.get('extra') or {}, skipped=skipped)
+        self.logger.log(self.level, msg, *args, stacklevel=2, **kwargs)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """'name=LEVEL,name=LEVEL' -> {name: LEVEL}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_handler = None
+
+
+def init_logging() -> AsyncHandler:
+    """Send the records of this process through the async handler (once per process)"""
+    global _handler
+    if _handler is not None:
+        return _handler
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(TextFormatter() if Config.LOG_FORMAT == 'text' else JsonFormatter())
+    _handler = AsyncHandler(stream, Config.LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(Config.LOG_LEVEL)
+    for name, level in parse_levels(Config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    atexit.register(_handler.close)
+    return _handler
+
+
+def init_request_ids(app):
+    """Tag the records of each request with its X-Request-ID"""
+
+    @app.before_request
+    def bind_request_id():
+        request_id = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        g.request_id = request_id
+        g.log_context_token = bind_log_context(request_id=request_id)
+
+    @app.after_request
+    def send_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    @app.teardown_request
+    def unbind_request_id(exc=None):
+        token = g.pop('log_context_token', None)
+        if token is not None:
+            unbind_log_context(token)
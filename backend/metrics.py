@@ -0,0 +1,130 @@
+"""
+Prometheus metrics, exposed at /metrics in the text exposition format.
+
+    http_request_duration_seconds{blueprint,endpoint,method,status}  histogram
+    http_requests_in_flight                                           gauge
+    http_upload_size_bytes{endpoint}                                  histogram
+    mongodb_command_duration_seconds{collection,command}              histogram
+    mongodb_command_failures_total{collection,command}                counter
+    detection_stage_duration_seconds{detector,stage}                  histogram
+    detection_candidates{detector,stage}                              histogram
+    document_cache_requests_total{collection,outcome}                 counter
+
+Cache hit ratio per collection is
+sum(rate(document_cache_requests_total{outcome!="miss"}[5m])) / sum(rate(document_cache_requests_total[5m])).
+
+Metrics live in the worker's memory and cost a lock and an add per
+observation. Under gunicorn (serve.py) PROMETHEUS_MULTIPROC_DIR is set
+before the workers start: every worker then writes its samples to mmapped
+files there, and /metrics on any worker aggregates all of them.
+"""
+
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+from config import Config
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ['blueprint', 'endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being served', multiprocess_mode='livesum')
+UPLOAD_SIZE = Histogram(
+    'http_upload_size_bytes', 'Size of multipart upload requests', ['endpoint'],
+    buckets=(16 * 1024, 128 * 1024, 512 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2)
+)
+MONGO_LATENCY = Histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command latency', ['collection', 'command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+MONGO_FAILURES = Counter('mongodb_command_failures_total', 'Failed MongoDB commands', ['collection', 'command'])
+DETECTION_STAGE = Histogram(
+    'detection_stage_duration_seconds', 'Duration of detection pipeline stages', ['detector', 'stage'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+DETECTION_CANDIDATES = Histogram(
+    'detection_candidates', 'Candidates (rectangles, walls, halls, ...) produced by a detection stage',
+    ['detector', 'stage'], buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+)
+CACHE_REQUESTS = Counter('document_cache_requests', 'Document cache lookups by outcome', ['collection', 'outcome'])
+
+# Commands without a collection, or whose target isn't worth a label of its own
+_NO_COLLECTION = '-'
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Command latency by collection and operation"""
+
+    def __init__(self):
+        self._started = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = _NO_COLLECTION
+        self._started[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._started.pop((event.connection_id, event.request_id), _NO_COLLECTION)
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._started.pop((event.connection_id, event.request_id), _NO_COLLECTION)
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+
+mongo_command_listener = MongoCommandListener()
+
+
+def observe_detection(detector: str, stage: str, seconds: float, candidates: int = None) -> None:
+    DETECTION_STAGE.labels(detector, stage).observe(seconds)
+    if candidates is not None:
+        DETECTION_CANDIDATES.labels(detector, stage).observe(candidates)
+
+
+def _route_labels():
+    return request.blueprint or '-', request.endpoint or 'unmatched', request.method
+
+
+def init_metrics(app):
+    """Request metrics and the /metrics endpoint (no-op when METRICS_ENABLED is off)"""
+    if not Config.METRICS_ENABLED:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        IN_FLIGHT.inc()
+        if request.mimetype == 'multipart/form-data' and request.content_length:
+            UPLOAD_SIZE.labels(request.endpoint or 'unmatched').observe(request.content_length)
+
+    @app.teardown_request
+    def observe_request(exc=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        IN_FLIGHT.dec()
+        blueprint, endpoint, method = _route_labels()
+        status = g.pop('metrics_status', 500 if exc else 200)
+        REQUEST_LATENCY.labels(blueprint, endpoint, method, str(status)).observe(time.perf_counter() - started)
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Apply, verify and explain database migrations (see migrations.py).
+
+    python migrate.py status            applied and pending migrations
+    python migrate.py explain [--all]   what the pending (or all) migrations do
+    python migrate.py apply [--to N]    apply pending migrations, up to version N
+    python migrate.py verify            exit 1 if applied migrations or their indexes are out of sync
+
+Run `apply` on every deploy, before starting the servers; it does nothing
+when the database is up to date.
+"""
+
+import argparse
+import os
+import sys
+from pymongo import MongoClient
+from migrations import MIGRATIONS, applied_migrations, pending_migrations, apply_migrations, verify_migrations, explain_migration
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('status', 'explain', 'apply', 'verify'))
+    parser.add_argument('--to', type=int, help='apply migrations up to this version only')
+    parser.add_argument('--all', action='store_true', help='explain applied migrations too')
+    args = parser.parse_args()
+
+    # Get MongoDB connection
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
+    db = client.get_default_database()
+
+    if args.command == 'status':
+        applied = applied_migrations(db)
+        for migration in MIGRATIONS:
+            record = applied.get(migration.version)
+            state = f"applied {record['applied_at']:%Y-%m-%d %H:%M}" if record else 'pending'
+            print(f"{migration.version:04d} {migration.name:<28} {state}")
+
+    elif args.command == 'explain':
+        migrations = MIGRATIONS if args.all else pending_migrations(db, args.to)
+        if not migrations:
+            print("No pending migrations")
+        for migration in migrations:
+            print('\n'.join(explain_migration(migration)))
+
+    elif args.command == 'apply':
+        applied = apply_migrations(db, args.to)
+        print(f"✅ Database up to date ({len(applied)} migrations applied)")
+
+    elif args.command == 'verify':
+        problems = verify_migrations(db)
+        pending = pending_migrations(db)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if pending:
+            print(f"⚠️  {len(pending)} pending: {', '.join(f'{m.version:04d} {m.name}' for m in pending)}")
+        if problems or pending:
+            sys.exit(1)
+        print("✅ All migrations applied, indexes in place")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Versioned schema and index migrations.
+
+MIGRATIONS is an ordered registry; each migration has a version number and
+is recorded in the `_migrations` collection once applied:
+
+    {"_id": 3, "name": "floorplan_status_default", "applied_at": ..., "duration_ms": ...}
+
+Migrations are applied in version order and never re-run. Applied
+migrations are never edited either: a change to the schema or the indexes
+is a new migration at the end of the list. Every migration must be
+idempotent, so a deploy that fails halfway (or two deploys racing) can run
+`python migrate.py apply` again.
+"""
+
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+from pymongo.errors import DuplicateKeyError
+from indexes import IndexSpec, CORE_INDEXES, HIERARCHY_INDEXES, HOT_QUERY_INDEXES, create_indexes, missing_indexes
+from slow_queries import create_slow_query_log
+
+MIGRATIONS_COLLECTION = '_migrations'
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    description: str
+    apply: Callable
+    # Indexes the migration creates; `migrate.py verify` checks they still exist
+    indexes: List[IndexSpec] = []
+
+
+def index_migration(version: int, name: str, description: str, specs: List[IndexSpec]) -> Migration:
+    return Migration(version, name, description, lambda db: create_indexes(db, specs), specs)
+
+
+def add_floorplan_status(db):
+    """Floor plans created before the status field existed become drafts"""
+    db.floorplans.update_many(
+        {'status': {'$exists': False}},
+        {'$set': {'status': 'draft', 'last_modified': datetime.utcnow()}}
+    )
+
+
+MIGRATIONS = [
+    index_migration(1, 'core_indexes',
+                    'Indexes formerly created at app startup (users, floorplans, halls, revisions, '
+                    'element chunks, published floor plans)', CORE_INDEXES),
+    index_migration(2, 'hierarchical_indexes',
+                    'Indexes of the hierarchical plans (area_floorplans, hall_floorplans, halls)',
+                    HIERARCHY_INDEXES),
+    Migration(3, 'floorplan_status_default',
+              "Set status 'draft' on floor plans without a status (was migrate_add_status.py)",
+              add_floorplan_status),
+    index_migration(4, 'hot_query_indexes',
+                    'Indexes for hot queries without a matching index (floor plan listings by status, '
+                    'dashboard, public area plans, admin hall list, event hierarchy)', HOT_QUERY_INDEXES),
+    Migration(5, 'slow_query_log',
+              'Capped slow_queries collection of the slow-query log (SLOW_QUERY_LOG_MB)',
+              create_slow_query_log),
+    Migration(6, 'slow_query_log_capped',
+              'Convert a slow_queries collection created uncapped before migration 5 ran to a capped one',
+              create_slow_query_log),
+]
+
+
+def applied_migrations(db) -> Dict[int, Dict]:
+    """Records of applied migrations by version"""
+    return {record['_id']: record for record in db[MIGRATIONS_COLLECTION].find()}
+
+
+def pending_migrations(db, target: Optional[int] = None) -> List[Migration]:
+    """Migrations not applied yet, in version order, up to target if given"""
+    applied = applied_migrations(db)
+    return [
+        migration for migration in sorted(MIGRATIONS, key=lambda migration: migration.version)
+        if migration.version not in applied and (target is None or migration.version <= target)
+    ]
+
+
+def apply_migrations(db, target: Optional[int] = None, log: Callable[[str], None] = print) -> List[Migration]:
+    """Apply pending migrations in order; returns the ones applied by this call"""
+    applied = []
+    for migration in pending_migrations(db, target):
+        log(f"⏳ {migration.version:04d} {migration.name}")
+        started = time.perf_counter()
+        migration.apply(db)
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            db[MIGRATIONS_COLLECTION].insert_one({
+                '_id': migration.version,
+                'name': migration.name,
+                'applied_at': datetime.utcnow(),
+                'duration_ms': duration_ms
+            })
+        except DuplicateKeyError:
+            # Another deploy applied it concurrently; migrations are idempotent
+            pass
+        log(f"✅ {migration.version:04d} {migration.name} ({duration_ms} ms)")
+        applied.append(migration)
+    return applied
+
+
+def verify_migrations(db) -> List[str]:
+    """Problems with the applied state: unknown or renamed migrations, gaps, missing indexes"""
+    problems = []
+    applied = applied_migrations(db)
+    registry = {migration.version: migration for migration in MIGRATIONS}
+
+    for version, record in sorted(applied.items()):
+        if version not in registry:
+            problems.append(f"{version:04d} {record.get('name')} is applied but not in the registry")
+        elif record.get('name') != registry[version].name:
+            problems.append(f"{version:04d} was applied as {record.get('name')}, registry has {registry[version].name}")
+
+    pending = [migration.version for migration in pending_migrations(db)]
+    if pending and applied and min(pending) < max(applied):
+        problems.append(f"{', '.join(f'{v:04d}' for v in pending if v < max(applied))} "
+                        f"pending below applied version {max(applied):04d}")
+
+    for version in sorted(applied):
+        migration = registry.get(version)
+        for spec in missing_indexes(db, migration.indexes if migration else []):
+            problems.append(f"{version:04d} {migration.name}: index {spec.collection}.{spec.name} is missing")
+    return problems
+
+
+def explain_migration(migration: Migration) -> List[str]:
+    """What a migration does, one line per change"""
+    lines = [f"{migration.version:04d} {migration.name}: {migration.description}"]
+    for spec in migration.indexes:
+        options = ''.join(f' {key}={value}' for key, value in spec.options.items())
+        lines.append(f"    + {spec.collection}.{spec.name}{options}  <- {spec.serves}")
+    return lines
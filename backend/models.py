@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 from bson import ObjectId
 import bcrypt
+from revisions import strip_history
 
 class User:
     def __init__(self, username: str, email: str, password: str, role: str = 'user'):
@@ -36,7 +37,7 @@ class FloorPlan:
         self.description = description
         self.created = datetime.utcnow()
         self.last_modified = datetime.utcnow()
-        self.state = state or self._default_state()
+        self.state = strip_history(state) or self._default_state()
         self.version = 1
         self.event_id = event_id
         self.floor = floor
@@ -49,10 +50,6 @@ class FloorPlan:
             'elements': [],
             'selectedIds': [],
             'activeTool': 'select',
-            'history': {
-                'past': [],
-                'future': []
-            },
             'grid': {
                 'enabled': True,
                 'size': 20,
@@ -82,7 +79,7 @@ class FloorPlan:
         }
     
     def update_state(self, new_state: Dict):
-        self.state = new_state
+        self.state = strip_history(new_state)
         self.last_modified = datetime.utcnow()
         self.version += 1
 
@@ -91,7 +88,12 @@ class FloorPlanStats:
     
     @staticmethod
     def calculate_booth_stats(floor_plan_data: Dict) -> Dict:
-        elements = floor_plan_data.get('state', {}).get('elements', [])
+        state = floor_plan_data.get('state', {}) or {}
+        if 'elements' not in state and floor_plan_data.get('booth_stats'):
+            # Chunked floor plans keep their elements out of the document
+            return dict(floor_plan_data['booth_stats'])
+        
+        elements = state.get('elements', [])
         booths = [elem for elem in elements if elem.get('type') == 'booth']
         
         stats = {
@@ -103,8 +105,9 @@ class FloorPlanStats:
         }
         
         for booth in booths:
-            status = booth.get('status', 'available')
-            stats[status] += 1
+            status = (booth.get('status') or 'available').replace('-', '_')
+            if status in stats:
+                stats[status] += 1
         
         return stats
     
@@ -0,0 +1,290 @@
+"""
+On-demand request profiling.
+
+An admin adds `X-Profile: 1` (or `?profile=1`) to any request; it then runs
+under a sampling profiler and the response carries `X-Profile-Id`. With
+PROFILER_SAMPLE_RATE set, that fraction of all requests is profiled too, and
+only the slowest PROFILER_KEEP_SLOWEST profiles of each route are kept.
+
+The profiler is a thread that reads the request thread's stack every
+PROFILER_INTERVAL_MS (sys._current_frames), so the request runs at full
+speed and time spent in OpenCV or NumPy is attributed to the Python line
+that called it. A report has the top frames by self and total samples and
+the stacks in the folded format of flamegraph.pl / speedscope:
+
+    GET /api/admin/profiles                       stored profiles (?route=)
+    GET /api/admin/profiles/<id>                  the report
+    GET /api/admin/profiles/<id>?format=folded    flame graph input
+
+Reports are JSON files in PROFILER_DIR (a temp directory by default), so
+any worker can serve a profile another worker recorded. The file name holds
+the trigger, route and duration, which is all listing and pruning need.
+"""
+
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from flask import Response, g, jsonify, request
+from auth import admin_required, is_admin
+from config import Config
+
+log = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+TOP_FRAMES = 30
+_ROUTE_UNSAFE = re.compile(r'[^A-Za-z0-9.-]+')
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def profile_dir() -> str:
+    return Config.PROFILER_DIR or os.path.join(tempfile.gettempdir(), 'imtma-flooring-profiles')
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(BACKEND_DIR):
+        path = os.path.relpath(path, BACKEND_DIR)
+    elif 'site-packages' in path:
+        path = path.split('site-packages', 1)[1].lstrip(os.sep)
+    return f'{code.co_name} ({path}:{code.co_firstlineno})'.replace(';', ',')
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+                self.samples += 1
+
+    def top_frames(self, limit: int = TOP_FRAMES) -> List[Dict]:
+        """Frames by samples spent in them (self) and under them (total)"""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack):
+                total[frame] += count
+        frames = sorted(total, key=lambda f: (own[f], total[f]), reverse=True)[:limit]
+        samples = self.samples or 1
+        return [{
+            'frame': f,
+            'self': own[f],
+            'total': total[f],
+            'self_pct': round(100 * own[f] / samples, 1),
+            'total_pct': round(100 * total[f] / samples, 1)
+        } for f in frames]
+
+    def folded(self) -> str:
+        return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+
+
+def _file_name(trigger: str, route: str, duration_ms: float, profile_id: str) -> str:
+    return f'{trigger}__{route}__{int(duration_ms * 1000):012d}__{profile_id}.json'
+
+
+def _parse_file_name(name: str) -> Optional[Dict]:
+    parts = name[:-len('.json')].split('__') if name.endswith('.json') else []
+    if len(parts) != 4:
+        return None
+    trigger, route, duration_us, profile_id = parts
+    return {'id': profile_id, 'trigger': trigger, 'route': route, 'duration_ms': int(duration_us) / 1000}
+
+
+class ProfileStore:
+    """Profile reports as files in one directory, shared by the workers"""
+
+    def __init__(self, directory: str = None):
+        self._directory = directory
+
+    @property
+    def directory(self) -> str:
+        return self._directory or profile_dir()
+
+    def _entries(self) -> List[Dict]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            entry = _parse_file_name(name)
+            if entry:
+                entry['file'] = name
+                entries.append(entry)
+        return entries
+
+    def save(self, report: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = _file_name(report['trigger'], report['route'], report['duration_ms'], report['id'])
+        tmp_path = os.path.join(self.directory, f'.{name}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, default=str)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._prune(report['trigger'], report['route'])
+
+    def _prune(self, trigger: str, route: str):
+        entries = [e for e in self._entries() if e['trigger'] == trigger]
+        if trigger == 'sampled':
+            # Keep the slowest of each route
+            entries = sorted((e for e in entries if e['route'] == route), key=lambda e: e['duration_ms'], reverse=True)
+            stale = entries[Config.PROFILER_KEEP_SLOWEST:]
+        else:
+            entries.sort(key=lambda e: self._mtime(e['file']), reverse=True)
+            stale = entries[Config.PROFILER_KEEP:]
+        for entry in stale:
+            try:
+                os.remove(os.path.join(self.directory, entry['file']))
+            except FileNotFoundError:
+                pass
+
+    def _mtime(self, name: str) -> float:
+        try:
+            return os.path.getmtime(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return 0
+
+    def list(self, route: str = None) -> List[Dict]:
+        entries = [e for e in self._entries() if route is None or e['route'] == route]
+        entries.sort(key=lambda e: e['duration_ms'], reverse=True)
+        return [{k: v for k, v in e.items() if k != 'file'} for e in entries]
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        for entry in self._entries():
+            if entry['id'] == profile_id:
+                try:
+                    with open(os.path.join(self.directory, entry['file'])) as f:
+                        return json.load(f)
+                except FileNotFoundError:
+                    return None
+        return None
+
+
+profile_store = ProfileStore()
+
+
+def _route_key() -> str:
+    # '__' separates the fields of a file name
+    return _ROUTE_UNSAFE.sub('_', request.endpoint or 'unmatched')
+
+
+def _requested() -> bool:
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    return bool(flag) and flag.lower() not in ('0', 'false', 'no')
+
+
+def init_profiler(app):
+    """Profiling hooks and the admin endpoints (no-op when PROFILER_ENABLED is off)"""
+    if not Config.PROFILER_ENABLED:
+        return
+
+    @app.before_request
+    def start_profiler():
+        if request.endpoint in ('list_profiles', 'get_profile'):
+            return
+        if _requested() and is_admin():
+            trigger = 'admin'
+        elif Config.PROFILER_SAMPLE_RATE and random.random() < Config.PROFILER_SAMPLE_RATE:
+            trigger = 'sampled'
+        else:
+            return
+        g.profile = {
+            'id': uuid.uuid4().hex,
+            'trigger': trigger,
+            'started_at': datetime.utcnow(),
+            'started': time.perf_counter(),
+            'profiler': SamplingProfiler(threading.get_ident(), Config.PROFILER_INTERVAL_MS / 1000).start()
+        }
+
+    @app.after_request
+    def tag_profile(response):
+        profile = g.get('profile')
+        if profile is not None:
+            profile['status'] = response.status_code
+            if profile['trigger'] == 'admin':
+                response.headers['X-Profile-Id'] = profile['id']
+        return response
+
+    @app.teardown_request
+    def save_profile(exc=None):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        duration = time.perf_counter() - profile['started']
+        profiler = profile['profiler']
+        profiler.stop()
+        report = {
+            'id': profile['id'],
+            'trigger': profile['trigger'],
+            'route': _route_key(),
+            'method': request.method,
+            'path': request.path,
+            'request_id': g.get('request_id'),
+            'query': request.query_string.decode('latin-1'),
+            'status': profile.get('status', 500),
+            'started_at': profile['started_at'],
+            'duration_ms': round(duration * 1000, 2),
+            'interval_ms': Config.PROFILER_INTERVAL_MS,
+            'samples': profiler.samples,
+            'top_frames': profiler.top_frames(),
+            'folded': profiler.folded()
+        }
+        try:
+            profile_store.save(report)
+        except OSError as e:
+            log.warning("Could not store profile %s: %s", report['id'], e)
+            return
+        log.info("Profiled %s %s in %.1f ms", request.method, request.path, report['duration_ms'],
+                 extra={'profile_id': report['id'], 'trigger': report['trigger'], 'samples': profiler.samples})
+
+    @app.route('/api/admin/profiles')
+    @admin_required
+    def list_profiles():
+        return jsonify({'profiles': profile_store.list(request.args.get('route'))}), 200
+
+    @app.route('/api/admin/profiles/<profile_id>')
+    @admin_required
+    def get_profile(profile_id):
+        report = profile_store.get(profile_id) if _PROFILE_ID.match(profile_id) else None
+        if report is None:
+            return jsonify({'message': 'Profile not found'}), 404
+        if request.args.get('format') == 'folded':
+            return Response(report['folded'], mimetype='text/plain')
+        return jsonify(report), 200
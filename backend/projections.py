@@ -0,0 +1,98 @@
+"""
+Sparse fieldsets (?fields=) and summary/full views (?view=) for list endpoints.
+
+Both translate into MongoDB projections, so heavy subdocuments such as
+`state` or `booth_detection` are neither read nor sent unless requested.
+Invalid input raises ValueError; routes answer it with 400.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from flask import request
+
+VIEW_SUMMARY = 'summary'
+VIEW_FULL = 'full'
+
+FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$')
+
+# Summary views of the hierarchical plan collections: everything except the heavy blobs
+AREA_PLAN_SUMMARY_FIELDS = ('name', 'description', 'type', 'image_url', 'status', 'created_at', 'last_modified')
+HALL_PLAN_SUMMARY_FIELDS = AREA_PLAN_SUMMARY_FIELDS + ('hall_id', 'area_plan_id')
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Split ?fields=a,b.c into validated field paths (None when absent)"""
+    if value is None or not value.strip():
+        return None
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if not FIELD_PATTERN.match(field):
+            raise ValueError(f'Invalid field name: {field}')
+        if field not in fields:
+            fields.append(field)
+    return fields or None
+
+
+def parse_view(value: Optional[str], default: str = VIEW_FULL) -> str:
+    view = (value or default).strip().lower()
+    if view not in (VIEW_SUMMARY, VIEW_FULL):
+        raise ValueError('view must be summary or full')
+    return view
+
+
+def inclusion_projection(fields: Iterable[str]) -> Dict[str, int]:
+    """Projection including the given paths; children of an included parent are dropped (path collision)"""
+    fields = sorted(set(fields))
+    kept = []
+    for field in fields:
+        if not any(field.startswith(parent + '.') for parent in kept):
+            kept.append(field)
+    return {field: 1 for field in kept}
+
+
+def request_projection(summary_fields: Iterable[str], default_view: str = VIEW_FULL) -> Optional[Dict[str, int]]:
+    """
+    Projection for a raw-document endpoint from ?fields= / ?view=.
+
+    ?fields= wins over ?view=; ?view=full (the default) returns None, i.e.
+    the whole document.
+    """
+    fields = parse_fields(request.args.get('fields'))
+    if fields:
+        return inclusion_projection(fields)
+    if parse_view(request.args.get('view'), default_view) == VIEW_SUMMARY:
+        return inclusion_projection(summary_fields)
+    return None
+
+
+def request_output_fields(field_sources: Dict[str, Tuple[str, ...]], summary_keys: Iterable[str],
+                          default_view: str = VIEW_FULL) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Output keys and projection for an endpoint that builds its own response objects.
+
+    `field_sources` maps each output key to the document paths it is built
+    from. Returns the selected output keys and the projection reading only
+    their sources.
+    """
+    fields = parse_fields(request.args.get('fields'))
+    if fields:
+        unknown = [field for field in fields if field not in field_sources]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        keys = fields
+    elif parse_view(request.args.get('view'), default_view) == VIEW_SUMMARY:
+        keys = list(summary_keys)
+    else:
+        keys = list(field_sources)
+
+    sources = [source for key in keys for source in field_sources[key]]
+    # An empty projection would return whole documents
+    return keys, inclusion_projection(sources + ['_id'])
+
+
+def projection_key(projection: Optional[Dict[str, int]]) -> str:
+    """Stable cache-key fragment for a projection"""
+    return ','.join(sorted(projection)) if projection else VIEW_FULL
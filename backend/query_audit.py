@@ -0,0 +1,190 @@
+"""
+Per-request MongoDB command accounting, for development and staging.
+
+With QUERY_AUDIT_ENABLED a command listener on the shared client counts the
+commands each request sends, and the response says how many:
+
+    X-DB-Queries            commands sent, getMore batches included
+    X-DB-Query-Time         their total round trip in ms
+    X-DB-Repeated-Queries   shapes sent more than once: find users {_id} x3, ...
+
+The shape of a command is its name and collection and the command with
+every value replaced by its type, so find({'_id': a}) and find({'_id': b})
+on one collection have the same shape. One
+shape sent QUERY_REPEAT_THRESHOLD (2) or more times in a request is the
+mark of a query per item (N+1) and is logged as a warning.
+
+QUERY_BUDGET caps the commands of every request and QUERY_BUDGETS of single
+endpoints ("hall.list_public_halls=1,floorplan.get_floorplans=3"). Going
+over is a warning, or with QUERY_BUDGET_STRICT a 500 response, which is
+what test_query_budget.py runs with. count_queries() counts the commands of
+a block of code, requests it makes through a test client included.
+"""
+
+import contextvars
+import json
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from flask import g, jsonify, request
+from pymongo import monitoring
+from config import Config
+
+log = logging.getLogger(__name__)
+
+# Session, cluster and driver fields that differ between otherwise identical commands
+_IGNORED_FIELDS = {
+    'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'readConcern', 'writeConcern',
+    'apiVersion', 'apiStrict', 'apiDeprecationErrors', 'comment', 'maxTimeMS'
+}
+# Batches of one write command, of which the first stands for all
+_BATCH_FIELDS = {'documents', 'updates', 'deletes'}
+# Follow-ups of an earlier command rather than queries of their own
+_CURSOR_COMMANDS = {'getMore', 'killCursors'}
+
+_active_logs = contextvars.ContextVar('query_logs', default=())
+
+
+def query_shape(value, key: str = None):
+    """`value` with every scalar replaced by its type name"""
+    if isinstance(value, dict):
+        return {k: query_shape(v, k) for k, v in value.items() if k not in _IGNORED_FIELDS}
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return []
+        if key in _BATCH_FIELDS or not isinstance(value[0], dict):
+            # $in lists and insert batches: the length isn't part of the shape
+            return [query_shape(value[0])]
+        return [query_shape(item) for item in value]
+    return type(value).__name__
+
+
+def describe_command(command_name: str, collection: Optional[str], command: Dict) -> str:
+    """'find users {_id}': the command, its collection and the fields it filters on"""
+    query = command.get('filter') or command.get('query')
+    if query is None and command.get('updates'):
+        query = command['updates'][0].get('q')
+    if query is None and command.get('deletes'):
+        query = command['deletes'][0].get('q')
+    if query is None and command.get('pipeline'):
+        query = command['pipeline'][0].get('$match')
+    description = f'{command_name} {collection}' if collection else command_name
+    if isinstance(query, dict):
+        description += ' {' + ','.join(query) + '}'
+    return description
+
+
+class QueryLog:
+    """The commands sent while this log was active"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+        self.descriptions: Dict[str, str] = {}
+
+    def record(self, event) -> None:
+        self.count += 1
+        if event.command_name in _CURSOR_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        shape = json.dumps([event.command_name, collection, query_shape(event.command)], sort_keys=True)
+        self.shapes[shape] += 1
+        if shape not in self.descriptions:
+            self.descriptions[shape] = describe_command(event.command_name, collection, event.command)
+
+    def repeated(self, threshold: int = None) -> List[Tuple[str, int]]:
+        """(description, times) of the shapes sent at least `threshold` times, most first"""
+        threshold = Config.QUERY_REPEAT_THRESHOLD if threshold is None else threshold
+        return [(self.descriptions[shape], n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+class QueryAuditListener(monitoring.CommandListener):
+    """Records each command in the query logs active in the thread that sent it"""
+
+    def started(self, event):
+        for query_log in _active_logs.get():
+            query_log.record(event)
+
+    def succeeded(self, event):
+        for query_log in _active_logs.get():
+            query_log.seconds += event.duration_micros / 1e6
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+query_audit_listener = QueryAuditListener()
+
+
+@contextmanager
+def count_queries():
+    """A QueryLog of the commands sent inside the block"""
+    query_log = QueryLog()
+    token = _active_logs.set(_active_logs.get() + (query_log,))
+    try:
+        yield query_log
+    finally:
+        _active_logs.reset(token)
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """'endpoint=N,endpoint=N' -> {endpoint: N}"""
+    budgets = {}
+    for item in (spec or '').split(','):
+        name, _, budget = item.partition('=')
+        if name.strip() and budget.strip():
+            budgets[name.strip()] = int(budget)
+    return budgets
+
+
+def query_budget(endpoint: Optional[str]) -> Optional[int]:
+    budget = parse_budgets(Config.QUERY_BUDGETS).get(endpoint)
+    if budget is None and Config.QUERY_BUDGET:
+        budget = Config.QUERY_BUDGET
+    return budget
+
+
+def init_query_audit(app):
+    """Count the commands of each request (no-op when QUERY_AUDIT_ENABLED is off)"""
+    if not Config.QUERY_AUDIT_ENABLED:
+        return
+
+    @app.before_request
+    def start_query_log():
+        g.query_log = QueryLog()
+        g.query_log_token = _active_logs.set(_active_logs.get() + (g.query_log,))
+
+    @app.after_request
+    def report_queries(response):
+        query_log = g.get('query_log')
+        if query_log is None:
+            return response
+        repeated = ', '.join(f'{description} x{n}' for description, n in query_log.repeated())
+        if repeated:
+            log.warning("Repeated queries in %s: %s", request.endpoint, repeated,
+                        extra={'endpoint': request.endpoint, 'queries': query_log.count})
+
+        budget = query_budget(request.endpoint)
+        if budget is not None and query_log.count > budget:
+            error = f'{request.endpoint} sent {query_log.count} database commands, budget {budget}'
+            log.warning("Query budget exceeded: %s", error,
+                        extra={'endpoint': request.endpoint, 'queries': query_log.count, 'budget': budget})
+            if Config.QUERY_BUDGET_STRICT:
+                response = jsonify({'message': 'Query budget exceeded', 'error': error})
+                response.status_code = 500
+
+        response.headers['X-DB-Queries'] = str(query_log.count)
+        response.headers['X-DB-Query-Time'] = f'{query_log.seconds * 1000:.1f}'
+        if repeated:
+            response.headers['X-DB-Repeated-Queries'] = repeated
+        return response
+
+    @app.teardown_request
+    def end_query_log(exc=None):
+        token = g.pop('query_log_token', None)
+        if token is not None:
+            _active_logs.reset(token)
@@ -0,0 +1,132 @@
+"""
+Viewer read model for published floor plans.
+
+`published_floorplans` holds one document per published floor plan (same
+_id), with everything the public viewer needs already computed: the state
+without editor-only keys, booth details, stats, the exhibitor → booth join,
+the element bounds and the chunk manifest. It is rebuilt by
+refresh_published_floorplan() after every write to a floor plan and removed
+when the plan is unpublished or deleted, so public reads are a single
+lookup by _id.
+
+Chunked floor plans keep their elements in floorplan_element_chunks; their
+read model stores the state without elements and no booth details, and the
+API assembles those from the chunks on demand.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from models import FloorPlanStats
+from element_store import STORAGE_INLINE, attach_elements, elements_bounds, is_chunked, list_chunks
+
+PUBLISHED_FLOORPLANS_COLLECTION = 'published_floorplans'
+
+# Editor-only keys the viewer never reads
+VIEWER_EXCLUDED_STATE_KEYS = ('history', 'selectedIds', 'activeTool')
+VIEWER_EXCLUDED_ELEMENT_KEYS = ('selected', 'draggable')
+
+
+def viewer_state(state: Optional[Dict]) -> Dict:
+    """State trimmed to what the public viewer renders"""
+    state = {k: v for k, v in (state or {}).items() if k not in VIEWER_EXCLUDED_STATE_KEYS}
+    if 'elements' in state:
+        state['elements'] = [
+            {k: v for k, v in element.items() if k not in VIEWER_EXCLUDED_ELEMENT_KEYS}
+            for element in state['elements'] or []
+        ]
+    return state
+
+
+def exhibitor_index(elements: List[Dict]) -> List[Dict]:
+    """Exhibitors joined to the booths they occupy, sorted by company name"""
+    exhibitors = {}
+    for element in elements:
+        if element.get('type') != 'booth':
+            continue
+        exhibitor = element.get('exhibitor') or {}
+        company_name = (exhibitor.get('companyName') or '').strip()
+        if not company_name:
+            continue
+        entry = exhibitors.setdefault(company_name.lower(), {
+            'company_name': company_name,
+            'category': exhibitor.get('category', ''),
+            'booths': []
+        })
+        entry['booths'].append({
+            'id': element.get('id'),
+            'number': element.get('number', 'N/A'),
+            'status': element.get('status', 'available')
+        })
+    return sorted(exhibitors.values(), key=lambda entry: entry['company_name'].lower())
+
+
+def build_published_floorplan(db, floorplan: Dict) -> Dict:
+    """Viewer-ready document for a floor plan (elements are attached if chunked)"""
+    chunked = is_chunked(floorplan)
+    document = {
+        '_id': floorplan['_id'],
+        'name': floorplan['name'],
+        'description': floorplan.get('description'),
+        'created': floorplan.get('created'),
+        'last_modified': floorplan.get('last_modified'),
+        'version': floorplan.get('version', 1),
+        'event_id': floorplan.get('event_id'),
+        'floor': floorplan.get('floor', 1),
+        'layer': floorplan.get('layer', 0),
+        'status': floorplan.get('status', 'draft'),
+        'storage': floorplan.get('storage', STORAGE_INLINE),
+        'chunk_version': floorplan.get('chunk_version'),
+        'chunks': list_chunks(db, floorplan),
+        'refreshed_at': datetime.utcnow()
+    }
+
+    if chunked:
+        state_without_elements = dict(floorplan.get('state') or {})
+        state_without_elements.pop('elements', None)
+        document['stats'] = FloorPlanStats.calculate_booth_stats(floorplan)
+        floorplan = attach_elements(db, dict(floorplan, state=dict(floorplan.get('state') or {})))
+
+    elements = (floorplan.get('state') or {}).get('elements', []) or []
+    document['element_count'] = floorplan.get('element_count', len(elements))
+    document['bounds'] = elements_bounds(elements)
+    document['exhibitors'] = exhibitor_index(elements)
+
+    if chunked:
+        # Element payloads stay in the chunks; the document only has to fit the rest
+        document['state'] = viewer_state(state_without_elements)
+    else:
+        document['state'] = viewer_state(floorplan.get('state'))
+        document['booth_details'] = FloorPlanStats.get_booth_details(floorplan)
+        document['stats'] = FloorPlanStats.calculate_booth_stats(floorplan)
+    return document
+
+
+def refresh_published_floorplan(db, floorplan_id) -> Optional[Dict]:
+    """
+    Rebuild the read model of a floor plan after a write.
+
+    Published plans are (re)written, anything else is removed from the read
+    model. Returns the stored document, or None if the plan is not published.
+    """
+    floorplan = db.floorplans.find_one({'_id': floorplan_id})
+    if not floorplan or floorplan.get('status') != 'published':
+        delete_published_floorplan(db, floorplan_id)
+        return None
+
+    document = build_published_floorplan(db, floorplan)
+    db[PUBLISHED_FLOORPLANS_COLLECTION].replace_one({'_id': floorplan_id}, document, upsert=True)
+    return document
+
+
+def delete_published_floorplan(db, floorplan_id) -> None:
+    db[PUBLISHED_FLOORPLANS_COLLECTION].delete_one({'_id': floorplan_id})
+
+
+def rebuild_published_floorplans(db) -> int:
+    """Rebuild the whole read model from the floor plans collection"""
+    collection = db[PUBLISHED_FLOORPLANS_COLLECTION]
+    published_ids = [fp['_id'] for fp in db.floorplans.find({'status': 'published'}, projection={'_id': 1})]
+    for floorplan_id in published_ids:
+        refresh_published_floorplan(db, floorplan_id)
+    collection.delete_many({'_id': {'$nin': published_ids}})
+    return len(published_ids)
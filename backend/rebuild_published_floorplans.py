@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Rebuild the published_floorplans read model from the floorplans collection.
+Run this once after deploying the read model, or whenever it may be out of sync
+(e.g. after editing floor plans directly in the database).
+Its indexes are created by `python migrate.py apply`.
+"""
+
+import os
+from pymongo import MongoClient
+from read_models import rebuild_published_floorplans
+
+def main():
+    # Get MongoDB connection
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
+    db = client.get_default_database()
+    
+    print("Rebuilding published_floorplans read model...")
+    count = rebuild_published_floorplans(db)
+    print(f"✅ Rebuilt read model for {count} published floor plans")
+
+if __name__ == '__main__':
+    main()
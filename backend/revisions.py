@@ -0,0 +1,258 @@
+"""
+Floor plan revision store.
+
+Keeps the edit history of a floor plan outside of the live document, in the
+`floorplan_revisions` collection. Every state write records one revision:
+either a full snapshot of the state or a compact delta against the previous
+revision. A snapshot is written every `REVISION_SNAPSHOT_INTERVAL` revisions
+so that reconstructing any version never replays a long chain of deltas.
+
+Revision document shape:
+{
+  _id: ObjectId,
+  floorplan_id: ObjectId,
+  version: int,              # floor plan version this revision corresponds to
+  kind: 'snapshot' | 'delta',
+  state: dict,               # snapshot only
+  delta: dict,               # delta only, see compute_state_delta()
+  chain_length: int,         # number of deltas since the last snapshot
+  element_count: int,
+  user_id: str | null,
+  created: datetime
+}
+"""
+
+import copy
+from datetime import datetime
+from typing import Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING
+from config import Config
+
+REVISIONS_COLLECTION = 'floorplan_revisions'
+
+# Editor-only keys that must never be persisted with the live state
+TRANSIENT_STATE_KEYS = ('history',)
+
+
+def strip_history(state: Optional[Dict]) -> Optional[Dict]:
+    """Return a shallow copy of state without the undo/redo history block"""
+    if not isinstance(state, dict):
+        return state
+    return {k: v for k, v in state.items() if k not in TRANSIENT_STATE_KEYS}
+
+
+def _elements_by_id(elements: List[Dict]) -> Optional[Dict[str, Dict]]:
+    """Index elements by id, or None if ids are missing or not unique"""
+    indexed = {}
+    for element in elements:
+        element_id = element.get('id') if isinstance(element, dict) else None
+        if element_id is None or element_id in indexed:
+            return None
+        indexed[element_id] = element
+    return indexed
+
+
+def compute_state_delta(old_state: Dict, new_state: Dict) -> Dict:
+    """
+    Compute a compact delta that turns old_state into new_state.
+
+    Top-level keys are diffed by value. The `elements` array is diffed per
+    element id: only added/changed elements are stored (as a list, since ids
+    are not always valid document keys), plus removed ids and
+    the new ordering when it changed. If elements cannot be keyed by id the
+    whole array is stored instead.
+
+    Returns:
+        {'set': {key: value}, 'unset': [key], 'elements': {...}}  (keys omitted when empty)
+    """
+    old_state = old_state or {}
+    new_state = new_state or {}
+    delta = {}
+
+    set_keys = {}
+    for key, value in new_state.items():
+        if key == 'elements':
+            continue
+        if key not in old_state or old_state[key] != value:
+            set_keys[key] = value
+    unset_keys = [key for key in old_state if key not in new_state and key != 'elements']
+
+    old_elements = old_state.get('elements', []) or []
+    new_elements = new_state.get('elements', []) or []
+    old_index = _elements_by_id(old_elements)
+    new_index = _elements_by_id(new_elements)
+
+    if old_index is None or new_index is None:
+        if old_elements != new_elements:
+            set_keys['elements'] = new_elements
+    else:
+        upsert = [
+            element for element_id, element in new_index.items()
+            if element_id not in old_index or old_index[element_id] != element
+        ]
+        remove = [element_id for element_id in old_index if element_id not in new_index]
+        new_order = list(new_index.keys())
+        surviving_order = [element_id for element_id in old_index if element_id in new_index]
+        added_ids = [element_id for element_id in new_order if element_id not in old_index]
+
+        elements_delta = {}
+        if upsert:
+            elements_delta['upsert'] = upsert
+        if remove:
+            elements_delta['remove'] = remove
+        # Order is only needed when it can't be derived as "old order + appended"
+        if new_order != surviving_order + added_ids:
+            elements_delta['order'] = new_order
+        if elements_delta:
+            delta['elements'] = elements_delta
+
+    if set_keys:
+        delta['set'] = set_keys
+    if unset_keys:
+        delta['unset'] = unset_keys
+    return delta
+
+
+def apply_state_delta(state: Dict, delta: Dict) -> Dict:
+    """Apply a delta produced by compute_state_delta() and return the new state"""
+    new_state = dict(state or {})
+
+    for key in delta.get('unset', []):
+        new_state.pop(key, None)
+    for key, value in delta.get('set', {}).items():
+        new_state[key] = value
+
+    elements_delta = delta.get('elements')
+    if elements_delta and 'elements' not in delta.get('set', {}):
+        old_elements = new_state.get('elements', []) or []
+        index = {element.get('id'): element for element in old_elements}
+
+        removed = set(elements_delta.get('remove', []))
+        order = [element.get('id') for element in old_elements if element.get('id') not in removed]
+
+        for element in elements_delta.get('upsert', []):
+            element_id = element.get('id')
+            if element_id not in index or element_id in removed:
+                order.append(element_id)
+            index[element_id] = element
+
+        if 'order' in elements_delta:
+            order = elements_delta['order']
+        new_state['elements'] = [index[element_id] for element_id in order if element_id in index]
+
+    return new_state
+
+
+def record_revision(db, floorplan_id, version: int, new_state: Dict,
+                    previous_state: Optional[Dict] = None, user_id: str = None) -> Dict:
+    """
+    Record the state written at `version` for a floor plan.
+
+    A delta against previous_state is stored when the revision of version - 1
+    exists and the snapshot interval has not been reached, otherwise a full
+    snapshot.
+    """
+    collection = db[REVISIONS_COLLECTION]
+    new_state = strip_history(new_state) or {}
+
+    last = collection.find_one(
+        {'floorplan_id': floorplan_id},
+        projection={'version': 1, 'chain_length': 1},
+        sort=[('version', DESCENDING)]
+    )
+
+    revision = {
+        'floorplan_id': floorplan_id,
+        'version': version,
+        'element_count': len(new_state.get('elements', []) or []),
+        'user_id': user_id,
+        'created': datetime.utcnow()
+    }
+
+    interval = max(1, Config.REVISION_SNAPSHOT_INTERVAL)
+    chain_length = (last.get('chain_length', 0) + 1) if last else 0
+    # A delta is only valid against the revision right before it; after a gap
+    # (a failed or concurrent write) previous_state may not be what was recorded
+    contiguous = last is not None and last['version'] == version - 1
+    if not contiguous or previous_state is None or chain_length >= interval:
+        revision['kind'] = 'snapshot'
+        revision['state'] = new_state
+        revision['chain_length'] = 0
+    else:
+        revision['kind'] = 'delta'
+        revision['delta'] = compute_state_delta(strip_history(previous_state), new_state)
+        revision['chain_length'] = chain_length
+
+    collection.replace_one(
+        {'floorplan_id': floorplan_id, 'version': version},
+        revision,
+        upsert=True
+    )
+    return revision
+
+
+def list_revisions(db, floorplan_id, limit: int = 50, before: int = None) -> List[Dict]:
+    """List revision metadata, newest first, without state payloads"""
+    query = {'floorplan_id': floorplan_id}
+    if before is not None:
+        query['version'] = {'$lt': before}
+
+    cursor = db[REVISIONS_COLLECTION].find(
+        query,
+        projection={'state': 0, 'delta': 0}
+    ).sort('version', DESCENDING).limit(limit)
+
+    revisions = []
+    for revision in cursor:
+        revisions.append({
+            'version': revision['version'],
+            'kind': revision.get('kind'),
+            'element_count': revision.get('element_count', 0),
+            'user_id': revision.get('user_id'),
+            'created': revision.get('created')
+        })
+    return revisions
+
+
+def get_revision_state(db, floorplan_id, version: int) -> Optional[Dict]:
+    """
+    Reconstruct the floor plan state at `version`.
+
+    Loads the nearest snapshot at or before the version and replays the deltas
+    recorded after it. Returns None if no revision exists for that version or
+    a delta in between is missing.
+    """
+    collection = db[REVISIONS_COLLECTION]
+
+    snapshot = collection.find_one(
+        {'floorplan_id': floorplan_id, 'kind': 'snapshot', 'version': {'$lte': version}},
+        sort=[('version', DESCENDING)]
+    )
+    if not snapshot:
+        return None
+
+    state = copy.deepcopy(snapshot.get('state', {}))
+    reached = snapshot['version']
+
+    if reached < version:
+        deltas = collection.find(
+            {'floorplan_id': floorplan_id, 'kind': 'delta',
+             'version': {'$gt': reached, '$lte': version}},
+            projection={'version': 1, 'delta': 1}
+        ).sort('version', ASCENDING)
+        for revision in deltas:
+            if revision['version'] != reached + 1:
+                # A delta applied past a gap would give a wrong state
+                return None
+            state = apply_state_delta(state, revision.get('delta', {}))
+            reached = revision['version']
+
+    if reached != version:
+        return None
+    return state
+
+
+def delete_revisions(db, floorplan_id) -> int:
+    """Remove all revisions of a floor plan"""
+    result = db[REVISIONS_COLLECTION].delete_many({'floorplan_id': floorplan_id})
+    return result.deleted_count
@@ -1,17 +1,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from pymongo import MongoClient
+from database import get_database
 from bson import ObjectId
 from datetime import datetime
-import os
 from models import User
 
 auth_bp = Blueprint('auth', __name__)
 
 # Get MongoDB connection
 def get_db():
-    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-    return client.get_default_database()
+    return get_database()
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
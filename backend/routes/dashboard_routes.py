@@ -1,17 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from pymongo import MongoClient
+from database import get_database
 from bson import ObjectId
 from datetime import datetime
-import os
 from models import FloorPlanStats
 from auth import get_current_user
+from element_store import attach_elements
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 # Get MongoDB connection
 def get_db():
-    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-    return client.get_default_database()
+    return get_database()
 
 @dashboard_bp.route('/')
 def dashboard_home():
@@ -144,6 +143,7 @@ def floorplan_detail(floorplan_id):
             return redirect(url_for('dashboard.floorplans_list'))
         
         # Get booth details and statistics
+        attach_elements(db, floorplan)
         booth_details = FloorPlanStats.get_booth_details(floorplan)
         stats = FloorPlanStats.calculate_booth_stats(floorplan)
         
@@ -185,6 +185,7 @@ def booths_overview():
         all_booths = []
         
         for fp in floorplans:
+            attach_elements(db, fp)
             booth_details = FloorPlanStats.get_booth_details(fp)
             for booth in booth_details:
                 booth['floorplan_name'] = fp['name']
@@ -1,18 +1,148 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from pymongo import MongoClient
+from database import get_database
 from bson import ObjectId
 from datetime import datetime
-import os
 from models import FloorPlan, FloorPlanStats
 from auth import login_required, admin_required
+from revisions import strip_history, record_revision, list_revisions, get_revision_state, delete_revisions
+from element_store import (
+    STORAGE_INLINE, STORAGE_CHUNKED, resolve_storage, write_state, is_chunked,
+    attach_elements, load_elements, list_chunks, delete_element_chunks, drop_stale_chunks
+)
+from spatial_index import parse_bbox, viewport_elements, resolve_lod, apply_lod
+from read_models import (
+    PUBLISHED_FLOORPLANS_COLLECTION, viewer_state,
+    refresh_published_floorplan, delete_published_floorplan
+)
+from cache import document_cache
+from projections import request_output_fields, inclusion_projection
+from batch import parse_batch_ids, fetch_batch, batch_items
+from routes.hall_routes import invalidate_public_hall_caches
+from http_cache import (
+    VERSION_PROJECTION, PRIVATE_CACHE_CONTROL, public_cache_control, document_etag, fields_variant,
+    is_conditional_request, is_not_modified, with_validators, not_modified
+)
 
 floorplan_bp = Blueprint('floorplan', __name__)
 
 # Get MongoDB connection
 def get_db():
-    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-    return client.get_default_database()
+    return get_database()
+
+# Fields needed to serve chunk manifests and partial element fetches
+ELEMENT_FETCH_PROJECTION = {
+    'user_id': 1, 'status': 1, 'version': 1, 'storage': 1,
+    'chunk_version': 1, 'element_count': 1, 'state.elements': 1
+}
+
+# Viewport queries read elements through the cached spatial index instead
+VIEWPORT_FETCH_PROJECTION = {k: v for k, v in ELEMENT_FETCH_PROJECTION.items() if k != 'state.elements'}
+
+# Output keys of floor plan listings and the document fields each one is built from
+FLOORPLAN_LIST_FIELDS = {
+    'name': ('name',),
+    'description': ('description',),
+    'created': ('created',),
+    'last_modified': ('last_modified',),
+    'version': ('version',),
+    'event_id': ('event_id',),
+    'floor': ('floor',),
+    'layer': ('layer',),
+    'user_id': ('user_id',),
+    'status': ('status',),
+    # Booth stats only need each element's type and status (or the stored stats of chunked plans)
+    'stats': ('storage', 'booth_stats', 'state.elements.type', 'state.elements.status')
+}
+FLOORPLAN_LIST_SUMMARY_KEYS = [key for key in FLOORPLAN_LIST_FIELDS if key != 'stats']
+
+# The public listing reads the read model, where stats are precomputed
+PUBLIC_FLOORPLAN_LIST_FIELDS = {key: (key,) for key in FLOORPLAN_LIST_FIELDS if key != 'user_id'}
+PUBLIC_FLOORPLAN_LIST_SUMMARY_KEYS = [key for key in PUBLIC_FLOORPLAN_LIST_FIELDS if key != 'stats']
+
+# Batch fetches can also select the viewer payload of each plan
+PUBLIC_FLOORPLAN_FIELDS = dict(PUBLIC_FLOORPLAN_LIST_FIELDS, **{
+    key: (key,) for key in ('storage', 'element_count', 'bounds', 'exhibitors', 'chunks', 'state', 'booth_details')
+})
+# Always read: the item ETag and whether elements have to come from the chunks
+BATCH_VALIDATOR_FIELDS = ('version', 'last_modified', 'storage', 'chunk_version')
+
+def _floorplan_list_item(fp, keys):
+    """Listing entry with only the requested keys (documents may be projected)"""
+    fp_data = {'id': str(fp['_id'])}
+    defaults = {'floor': 1, 'layer': 0, 'status': 'draft'}
+    for key in keys:
+        if key == 'stats':
+            fp_data['stats'] = fp['stats'] if 'stats' in fp else FloorPlanStats.calculate_booth_stats(fp)
+        else:
+            fp_data[key] = fp.get(key, defaults.get(key))
+    return fp_data
+
+def invalidate_floorplan_caches(floorplan_id):
+    """Drop cached copies of a floor plan and the hall map listings that count it"""
+    document_cache.invalidate(PUBLISHED_FLOORPLANS_COLLECTION, floorplan_id)
+    invalidate_public_hall_caches()
+
+def _published_floorplan(db, floorplan_id):
+    """Read model entry of a published floor plan, through the document cache (do not mutate)"""
+    published = db[PUBLISHED_FLOORPLANS_COLLECTION]
+    floorplan_oid = ObjectId(floorplan_id)
+    
+    def load():
+        # Plans published before the read model existed are built on first access
+        return published.find_one({'_id': floorplan_oid}) or refresh_published_floorplan(db, floorplan_oid)
+    
+    def load_version():
+        return (published.find_one({'_id': floorplan_oid}, projection={'version': 1}) or {}).get('version')
+    
+    return document_cache.get(PUBLISHED_FLOORPLANS_COLLECTION, floorplan_oid, load, version_loader=load_version)
+
+def _element_filter_args():
+    """Parse ?layer= and ?tile= for partial element fetches"""
+    layer = request.args.get('layer')
+    tile = request.args.get('tile')
+    return (int(layer) if layer not in (None, '') else None), (tile or None)
+
+def _element_fetch_projection():
+    return VIEWPORT_FETCH_PROJECTION if request.args.get('bbox') else ELEMENT_FETCH_PROJECTION
+
+def _elements_response(db, floorplan, floorplan_id):
+    """
+    Serve an element fetch: by ?layer=/&tile=, or by viewport with
+    ?bbox=x0,y0,x1,y1 plus optional ?zoom= / ?lod=full|minimal.
+    """
+    layer, tile = _element_filter_args()
+    
+    if not request.args.get('bbox'):
+        elements = load_elements(db, floorplan, layer=layer, tile=tile)
+        return jsonify({
+            'floorplan_id': floorplan_id,
+            'version': floorplan['version'],
+            'layer': layer,
+            'tile': tile,
+            'elements': elements
+        }), 200
+    
+    try:
+        bbox = parse_bbox(request.args['bbox'])
+        zoom = float(request.args['zoom']) if request.args.get('zoom') else None
+    except ValueError as e:
+        return jsonify({'message': 'Invalid viewport', 'error': str(e)}), 400
+    
+    lod = resolve_lod(zoom, request.args.get('lod'))
+    elements = apply_lod(viewport_elements(db, floorplan, bbox, layer=layer), lod)
+    
+    return jsonify({
+        'floorplan_id': floorplan_id,
+        'version': floorplan['version'],
+        'bbox': list(bbox),
+        'zoom': zoom,
+        'lod': lod,
+        'layer': layer,
+        'count': len(elements),
+        'elements': elements
+    }), 200
+
 
 @floorplan_bp.route('/floorplans', methods=['GET'])
 @login_required
@@ -26,6 +156,10 @@ def get_floorplans():
         limit = int(request.args.get('limit', 10))
         search = request.args.get('search', '')
         event_id = request.args.get('event_id')
+        try:
+            keys, projection = request_output_fields(FLOORPLAN_LIST_FIELDS, FLOORPLAN_LIST_SUMMARY_KEYS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid fields', 'error': str(e)}), 400
         
         # Build query
         query = {}
@@ -46,30 +180,9 @@ def get_floorplans():
         # Calculate skip
         skip = (page - 1) * limit
         
-        # Get floor plans
-        cursor = db.floorplans.find(query).sort('last_modified', -1).skip(skip).limit(limit)
-        floorplans = []
-        
-        for fp in cursor:
-            fp_data = {
-                'id': str(fp['_id']),
-                'name': fp['name'],
-                'description': fp.get('description'),
-                'created': fp['created'],
-                'last_modified': fp['last_modified'],
-                'version': fp['version'],
-                'event_id': fp.get('event_id'),
-                'floor': fp.get('floor', 1),
-                'layer': fp.get('layer', 0),
-                'user_id': fp.get('user_id'),
-                'status': fp.get('status', 'draft')
-            }
-            
-            # Add booth statistics
-            stats = FloorPlanStats.calculate_booth_stats(fp)
-            fp_data['stats'] = stats
-            
-            floorplans.append(fp_data)
+        # Get floor plans, reading only the fields the listing needs (never the full state)
+        cursor = db.floorplans.find(query, projection=projection).sort('last_modified', -1).skip(skip).limit(limit)
+        floorplans = [_floorplan_list_item(fp, keys) for fp in cursor]
         
         # Get total count for pagination
         total = db.floorplans.count_documents(query)
@@ -96,6 +209,8 @@ def create_floorplan():
         
         if not data or 'name' not in data:
             return jsonify({'message': 'Floor plan name is required'}), 400
+        if data.get('storage') not in (None, STORAGE_INLINE, STORAGE_CHUNKED):
+            return jsonify({'message': 'Invalid storage. Must be one of: inline, chunked'}), 400
         
         db = get_db()
         
@@ -111,24 +226,39 @@ def create_floorplan():
             status=data.get('status', 'draft')
         )
         
+        # Large plans keep their elements in chunks outside the document
+        floorplan_oid = ObjectId()
+        storage = resolve_storage(floorplan.state, data.get('storage'))
+        storage_fields = write_state(db, floorplan_oid, floorplan.version, floorplan.state, storage)
+        
         # Insert into database
-        result = db.floorplans.insert_one({
+        document = {
+            '_id': floorplan_oid,
             'name': floorplan.name,
             'description': floorplan.description,
             'created': floorplan.created,
             'last_modified': floorplan.last_modified,
-            'state': floorplan.state,
             'version': floorplan.version,
             'event_id': floorplan.event_id,
             'floor': floorplan.floor,
             'layer': floorplan.layer,
             'user_id': floorplan.user_id,
             'status': floorplan.status
-        })
+        }
+        document.update(storage_fields)
+        result = db.floorplans.insert_one(document)
+        
+        # Initial revision is always a full snapshot
+        record_revision(db, result.inserted_id, floorplan.version, floorplan.state,
+                        user_id=current_user_id)
+        if floorplan.status == 'published':
+            refresh_published_floorplan(db, result.inserted_id)
+        invalidate_floorplan_caches(result.inserted_id)
         
         # Return created floor plan
         fp_data = floorplan.to_dict()
         fp_data['id'] = str(result.inserted_id)
+        fp_data['storage'] = storage
         
         return jsonify({
             'message': 'Floor plan created successfully',
@@ -145,8 +275,14 @@ def get_floorplan(floorplan_id):
         db = get_db()
         current_user_id = get_jwt_identity()
         
+        # Conditional requests start with a cheap projected lookup
+        conditional = is_conditional_request()
+        
         # Get floor plan
-        floorplan = db.floorplans.find_one({'_id': ObjectId(floorplan_id)})
+        floorplan = db.floorplans.find_one(
+            {'_id': ObjectId(floorplan_id)},
+            projection=VERSION_PROJECTION if conditional else None
+        )
         if not floorplan:
             return jsonify({'message': 'Floor plan not found'}), 404
         
@@ -157,6 +293,19 @@ def get_floorplan(floorplan_id):
             if floorplan.get('status') not in ['active', 'published']:
                 return jsonify({'message': 'Access denied'}), 403
         
+        if conditional:
+            etag = document_etag(floorplan['_id'], floorplan['version'])
+            if is_not_modified(etag, floorplan.get('last_modified')):
+                return not_modified(etag, floorplan.get('last_modified'), PRIVATE_CACHE_CONTROL)
+            floorplan = db.floorplans.find_one({'_id': floorplan['_id']})
+            if not floorplan:
+                return jsonify({'message': 'Floor plan not found'}), 404
+        
+        # ?elements=none skips element assembly; clients then fetch chunks separately
+        include_elements = request.args.get('elements', 'all') != 'none'
+        if include_elements:
+            attach_elements(db, floorplan)
+        
         # Prepare response data
         fp_data = {
             'id': str(floorplan['_id']),
@@ -170,18 +319,25 @@ def get_floorplan(floorplan_id):
             'floor': floorplan.get('floor', 1),
             'layer': floorplan.get('layer', 0),
             'user_id': floorplan.get('user_id'),
-            'status': floorplan.get('status', 'draft')
+            'status': floorplan.get('status', 'draft'),
+            'storage': floorplan.get('storage', STORAGE_INLINE),
+            'element_count': floorplan.get('element_count', len(floorplan['state'].get('elements', [])))
         }
         
-        # Add detailed booth information
-        booth_details = FloorPlanStats.get_booth_details(floorplan)
-        fp_data['booth_details'] = booth_details
+        if include_elements:
+            # Add detailed booth information
+            booth_details = FloorPlanStats.get_booth_details(floorplan)
+            fp_data['booth_details'] = booth_details
+        else:
+            fp_data['chunks'] = list_chunks(db, floorplan)
         
         # Add statistics
         stats = FloorPlanStats.calculate_booth_stats(floorplan)
         fp_data['stats'] = stats
         
-        return jsonify({'floorplan': fp_data}), 200
+        response = jsonify({'floorplan': fp_data})
+        etag = document_etag(floorplan['_id'], floorplan['version'])
+        return with_validators(response, etag, floorplan['last_modified'], PRIVATE_CACHE_CONTROL), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to get floor plan', 'error': str(e)}), 500
@@ -196,6 +352,8 @@ def update_floorplan(floorplan_id):
         
         if not data:
             return jsonify({'message': 'No data provided'}), 400
+        if data.get('storage') not in (None, STORAGE_INLINE, STORAGE_CHUNKED):
+            return jsonify({'message': 'Invalid storage. Must be one of: inline, chunked'}), 400
         
         # Get existing floor plan
         floorplan = db.floorplans.find_one({'_id': ObjectId(floorplan_id)})
@@ -217,8 +375,18 @@ def update_floorplan(floorplan_id):
             update_data['name'] = data['name']
         if 'description' in data:
             update_data['description'] = data['description']
+        new_state = None
+        previous_state = None
         if 'state' in data:
-            update_data['state'] = data['state']
+            # Undo/redo history lives in floorplan_revisions, never in the live document
+            new_state = strip_history(data['state'])
+            previous_state = attach_elements(db, floorplan).get('state')
+        elif data.get('storage', floorplan.get('storage', STORAGE_INLINE)) != floorplan.get('storage', STORAGE_INLINE):
+            # Storage mode switch without a state change
+            new_state = attach_elements(db, floorplan).get('state')
+        if new_state is not None:
+            storage = resolve_storage(new_state, data.get('storage'), floorplan.get('storage'))
+            update_data.update(write_state(db, floorplan['_id'], update_data['version'], new_state, storage))
         if 'event_id' in data:
             update_data['event_id'] = data['event_id']
         if 'floor' in data:
@@ -234,8 +402,20 @@ def update_floorplan(floorplan_id):
             {'$set': update_data}
         )
         
+        if 'state' in data:
+            record_revision(db, floorplan['_id'], update_data['version'], new_state,
+                            previous_state=previous_state, user_id=current_user_id)
+        refresh_published_floorplan(db, floorplan['_id'])
+        invalidate_floorplan_caches(floorplan['_id'])
+        if new_state is not None:
+            drop_stale_chunks(db, floorplan['_id'])
+        
         # Get updated floor plan
         updated_floorplan = db.floorplans.find_one({'_id': ObjectId(floorplan_id)})
+        if new_state is not None:
+            updated_floorplan['state'] = new_state
+        else:
+            attach_elements(db, updated_floorplan)
         
         fp_data = {
             'id': str(updated_floorplan['_id']),
@@ -249,7 +429,8 @@ def update_floorplan(floorplan_id):
             'floor': updated_floorplan.get('floor', 1),
             'layer': updated_floorplan.get('layer', 0),
             'user_id': updated_floorplan.get('user_id'),
-            'status': updated_floorplan.get('status', 'draft')
+            'status': updated_floorplan.get('status', 'draft'),
+            'storage': updated_floorplan.get('storage', STORAGE_INLINE)
         }
         
         return jsonify({
@@ -277,8 +458,12 @@ def delete_floorplan(floorplan_id):
         if user.get('role') != 'admin' and floorplan.get('user_id') != current_user_id:
             return jsonify({'message': 'Access denied'}), 403
         
-        # Delete floor plan
+        # Delete floor plan, its element chunks and its revision history
         db.floorplans.delete_one({'_id': ObjectId(floorplan_id)})
+        delete_element_chunks(db, floorplan['_id'])
+        delete_revisions(db, floorplan['_id'])
+        delete_published_floorplan(db, floorplan['_id'])
+        invalidate_floorplan_caches(floorplan['_id'])
         
         return jsonify({'message': 'Floor plan deleted successfully'}), 200
         
@@ -321,6 +506,8 @@ def update_floorplan_status(floorplan_id):
             {'_id': ObjectId(floorplan_id)},
             {'$set': update_data}
         )
+        refresh_published_floorplan(db, floorplan['_id'])
+        invalidate_floorplan_caches(floorplan['_id'])
         
         return jsonify({
             'message': f'Floor plan status updated to {new_status}',
@@ -330,6 +517,173 @@ def update_floorplan_status(floorplan_id):
     except Exception as e:
         return jsonify({'message': 'Failed to update floor plan status', 'error': str(e)}), 500
 
+@floorplan_bp.route('/floorplans/<floorplan_id>/revisions', methods=['GET'])
+@login_required
+def get_floorplan_revisions(floorplan_id):
+    """List the stored revisions of a floor plan (metadata only)"""
+    try:
+        db = get_db()
+        current_user_id = get_jwt_identity()
+        
+        floorplan = db.floorplans.find_one(
+            {'_id': ObjectId(floorplan_id)},
+            projection={'user_id': 1, 'version': 1}
+        )
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found'}), 404
+        
+        # Check access permissions
+        user = db.users.find_one({'_id': ObjectId(current_user_id)})
+        if user.get('role') != 'admin' and floorplan.get('user_id') != current_user_id:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        limit = min(int(request.args.get('limit', 50)), 200)
+        before = request.args.get('before')
+        revisions = list_revisions(db, floorplan['_id'], limit=limit,
+                                   before=int(before) if before else None)
+        
+        return jsonify({
+            'floorplan_id': floorplan_id,
+            'current_version': floorplan['version'],
+            'revisions': revisions
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get revisions', 'error': str(e)}), 500
+
+@floorplan_bp.route('/floorplans/<floorplan_id>/revisions/<int:version>', methods=['GET'])
+@login_required
+def get_floorplan_revision(floorplan_id, version):
+    """Get the full state of a floor plan as it was at a given version"""
+    try:
+        db = get_db()
+        current_user_id = get_jwt_identity()
+        
+        floorplan = db.floorplans.find_one(
+            {'_id': ObjectId(floorplan_id)},
+            projection={'user_id': 1}
+        )
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found'}), 404
+        
+        # Check access permissions
+        user = db.users.find_one({'_id': ObjectId(current_user_id)})
+        if user.get('role') != 'admin' and floorplan.get('user_id') != current_user_id:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        state = get_revision_state(db, floorplan['_id'], version)
+        if state is None:
+            return jsonify({'message': f'Revision {version} not found'}), 404
+        
+        return jsonify({
+            'floorplan_id': floorplan_id,
+            'version': version,
+            'state': state
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get revision', 'error': str(e)}), 500
+
+@floorplan_bp.route('/floorplans/<floorplan_id>/revisions/<int:version>/revert', methods=['POST'])
+@login_required
+def revert_floorplan(floorplan_id, version):
+    """Restore the state of a previous revision as a new version"""
+    try:
+        db = get_db()
+        current_user_id = get_jwt_identity()
+        
+        # Get existing floor plan
+        floorplan = db.floorplans.find_one({'_id': ObjectId(floorplan_id)})
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found'}), 404
+        
+        # Check access permissions
+        user = db.users.find_one({'_id': ObjectId(current_user_id)})
+        if user.get('role') != 'admin' and floorplan.get('user_id') != current_user_id:
+            return jsonify({'message': 'Access denied'}), 403
+        
+        state = get_revision_state(db, floorplan['_id'], version)
+        if state is None:
+            return jsonify({'message': f'Revision {version} not found'}), 404
+        
+        previous_state = attach_elements(db, floorplan).get('state')
+        update_data = {
+            'last_modified': datetime.utcnow(),
+            'version': floorplan['version'] + 1
+        }
+        storage = resolve_storage(state, current=floorplan.get('storage'))
+        update_data.update(write_state(db, floorplan['_id'], update_data['version'], state, storage))
+        db.floorplans.update_one(
+            {'_id': floorplan['_id']},
+            {'$set': update_data}
+        )
+        record_revision(db, floorplan['_id'], update_data['version'], state,
+                        previous_state=previous_state, user_id=current_user_id)
+        refresh_published_floorplan(db, floorplan['_id'])
+        invalidate_floorplan_caches(floorplan['_id'])
+        drop_stale_chunks(db, floorplan['_id'])
+        
+        return jsonify({
+            'message': f'Floor plan reverted to version {version}',
+            'reverted_from': version,
+            'version': update_data['version'],
+            'state': state
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to revert floor plan', 'error': str(e)}), 500
+
+@floorplan_bp.route('/floorplans/<floorplan_id>/chunks', methods=['GET'])
+@login_required
+def get_floorplan_chunks(floorplan_id):
+    """List the element chunks (layer, tile, count, bounds) of a floor plan"""
+    try:
+        db = get_db()
+        current_user_id = get_jwt_identity()
+        
+        floorplan = db.floorplans.find_one({'_id': ObjectId(floorplan_id)}, projection=ELEMENT_FETCH_PROJECTION)
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found'}), 404
+        
+        # Check access permissions
+        user = db.users.find_one({'_id': ObjectId(current_user_id)})
+        if user.get('role') != 'admin':
+            if floorplan.get('status') not in ['active', 'published']:
+                return jsonify({'message': 'Access denied'}), 403
+        
+        return jsonify({
+            'floorplan_id': floorplan_id,
+            'version': floorplan['version'],
+            'storage': floorplan.get('storage', STORAGE_INLINE),
+            'chunks': list_chunks(db, floorplan)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get element chunks', 'error': str(e)}), 500
+
+@floorplan_bp.route('/floorplans/<floorplan_id>/elements', methods=['GET'])
+@login_required
+def get_floorplan_elements(floorplan_id):
+    """Get the elements of a floor plan by layer/tile, or those intersecting a viewport (?bbox=)"""
+    try:
+        db = get_db()
+        current_user_id = get_jwt_identity()
+        
+        floorplan = db.floorplans.find_one({'_id': ObjectId(floorplan_id)}, projection=_element_fetch_projection())
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found'}), 404
+        
+        # Check access permissions
+        user = db.users.find_one({'_id': ObjectId(current_user_id)})
+        if user.get('role') != 'admin':
+            if floorplan.get('status') not in ['active', 'published']:
+                return jsonify({'message': 'Access denied'}), 403
+        
+        return _elements_response(db, floorplan, floorplan_id)
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get elements', 'error': str(e)}), 500
+
 @floorplan_bp.route('/floorplans/<floorplan_id>/booths', methods=['GET'])
 @login_required
 def get_floorplan_booths(floorplan_id):
@@ -348,6 +702,7 @@ def get_floorplan_booths(floorplan_id):
             return jsonify({'message': 'Access denied'}), 403
         
         # Get booth details
+        attach_elements(db, floorplan)
         booth_details = FloorPlanStats.get_booth_details(floorplan)
         stats = FloorPlanStats.calculate_booth_stats(floorplan)
         
@@ -370,6 +725,10 @@ def get_public_floorplans():
         limit = int(request.args.get('limit', 10))
         search = request.args.get('search', '')
         event_id = request.args.get('event_id')
+        try:
+            keys, projection = request_output_fields(PUBLIC_FLOORPLAN_LIST_FIELDS, PUBLIC_FLOORPLAN_LIST_SUMMARY_KEYS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid fields', 'error': str(e)}), 400
         
         # Build query - only published floor plans
         query = {'status': 'published'}
@@ -390,32 +749,13 @@ def get_public_floorplans():
         # Calculate skip
         skip = (page - 1) * limit
         
-        # Get floor plans
-        cursor = db.floorplans.find(query).sort('last_modified', -1).skip(skip).limit(limit)
-        floorplans = []
-        
-        for fp in cursor:
-            fp_data = {
-                'id': str(fp['_id']),
-                'name': fp['name'],
-                'description': fp.get('description'),
-                'created': fp['created'],
-                'last_modified': fp['last_modified'],
-                'version': fp['version'],
-                'event_id': fp.get('event_id'),
-                'floor': fp.get('floor', 1),
-                'layer': fp.get('layer', 0),
-                'status': fp.get('status', 'draft')
-            }
-            
-            # Add booth statistics
-            stats = FloorPlanStats.calculate_booth_stats(fp)
-            fp_data['stats'] = stats
-            
-            floorplans.append(fp_data)
+        # Get floor plans from the read model, which already carries the booth statistics
+        published = db[PUBLISHED_FLOORPLANS_COLLECTION]
+        cursor = published.find(query, projection=projection).sort('last_modified', -1).skip(skip).limit(limit)
+        floorplans = [_floorplan_list_item(fp, keys) for fp in cursor]
         
         # Get total count for pagination
-        total = db.floorplans.count_documents(query)
+        total = published.count_documents(query)
         
         return jsonify({
             'floorplans': floorplans,
@@ -430,44 +770,157 @@ def get_public_floorplans():
     except Exception as e:
         return jsonify({'message': 'Failed to get public floor plans', 'error': str(e)}), 500
 
+@floorplan_bp.route('/public/floorplans/batch', methods=['GET', 'POST'])
+def get_public_floorplans_batch():
+    """Get several published floor plans in one request (?ids=a,b or {"ids": [...]}, ?fields=, ?view=)"""
+    try:
+        db = get_db()
+        
+        try:
+            ids = parse_batch_ids()
+            keys, projection = request_output_fields(PUBLIC_FLOORPLAN_FIELDS, PUBLIC_FLOORPLAN_LIST_SUMMARY_KEYS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid batch', 'error': str(e)}), 400
+        projection = inclusion_projection(list(projection) + list(BATCH_VALIDATOR_FIELDS))
+        
+        # One $in query against the read model for the whole batch
+        published = db[PUBLISHED_FLOORPLANS_COLLECTION]
+        floorplans = fetch_batch(published, ids, projection=projection)
+        
+        # Plans published before the read model existed are built on first access
+        missing = [ObjectId(i) for i in ids if ObjectId.is_valid(i) and i not in floorplans]
+        if missing:
+            for fp in db.floorplans.find({'_id': {'$in': missing}, 'status': 'published'}, projection={'_id': 1}):
+                document = refresh_published_floorplan(db, fp['_id'])
+                if document:
+                    floorplans[str(fp['_id'])] = document
+        
+        # Item ETags depend on the selected fields, not on the ids in the query string
+        variant = fields_variant(None if keys == list(PUBLIC_FLOORPLAN_FIELDS) else ','.join(keys))
+        
+        def render(floorplan):
+            if is_chunked(floorplan) and ('state' in keys or 'booth_details' in keys):
+                # Chunked plans keep element payloads out of the read model
+                attach_elements(db, floorplan)
+                floorplan['state'] = viewer_state(floorplan['state'])
+                floorplan['booth_details'] = FloorPlanStats.get_booth_details(floorplan)
+            return _floorplan_list_item(floorplan, keys)
+        
+        items = batch_items(
+            ids, floorplans, 'floorplan', render,
+            lambda floorplan: document_etag(floorplan['_id'], floorplan['version'], variant),
+            'Floor plan not found or not published'
+        )
+        
+        response = jsonify({'floorplans': items, 'count': len(items)})
+        response.headers['Cache-Control'] = public_cache_control()
+        # Items listed in If-None-Match come back without a body
+        response.vary.add('If-None-Match')
+        return response, 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get public floor plans', 'error': str(e)}), 500
+
 @floorplan_bp.route('/public/floorplans/<floorplan_id>', methods=['GET'])
 def get_public_floorplan(floorplan_id):
     """Get a specific published floor plan for public viewing (no authentication required)"""
     try:
         db = get_db()
+        include_elements = request.args.get('elements', 'all') != 'none'
         
-        # Get floor plan - only if published
-        floorplan = db.floorplans.find_one({
-            '_id': ObjectId(floorplan_id),
-            'status': 'published'
-        })
+        # The read model holds the viewer-ready payload, so this is a single (cached) lookup
+        floorplan = _published_floorplan(db, floorplan_id)
         if not floorplan:
             return jsonify({'message': 'Floor plan not found or not published'}), 404
         
-        # Prepare response data
-        fp_data = {
-            'id': str(floorplan['_id']),
-            'name': floorplan['name'],
-            'description': floorplan.get('description'),
-            'created': floorplan['created'],
-            'last_modified': floorplan['last_modified'],
-            'state': floorplan['state'],
+        # Revalidation polls are answered from (version, last_modified) alone
+        etag = document_etag(floorplan['_id'], floorplan['version'])
+        if is_conditional_request() and is_not_modified(etag, floorplan.get('last_modified')):
+            return not_modified(etag, floorplan.get('last_modified'), public_cache_control())
+        
+        # Cached documents are shared between requests, so work on copies from here on
+        floorplan = dict(floorplan, state=dict(floorplan['state']))
+        if include_elements and 'booth_details' not in floorplan:
+            # Chunked plans keep element payloads out of the read model
+            attach_elements(db, floorplan)
+        
+        response = jsonify({'floorplan': public_floorplan_data(floorplan, include_elements)})
+        return with_validators(response, etag, floorplan['last_modified'], public_cache_control()), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Failed to get public floor plan', 'error': str(e)}), 500
+
+def public_floorplan_data(floorplan, include_elements=True):
+    """
+    Public response for a read model entry (a copy; elements of chunked plans already attached).
+    
+    Shared with the async serving path in asgi.py.
+    """
+    if not include_elements:
+        floorplan['state'].pop('elements', None)
+    elif 'booth_details' not in floorplan:
+        floorplan['state'] = viewer_state(floorplan['state'])
+        floorplan['booth_details'] = FloorPlanStats.get_booth_details(floorplan)
+    
+    fp_data = {
+        'id': str(floorplan['_id']),
+        'name': floorplan['name'],
+        'description': floorplan.get('description'),
+        'created': floorplan['created'],
+        'last_modified': floorplan['last_modified'],
+        'state': floorplan['state'],
+        'version': floorplan['version'],
+        'event_id': floorplan.get('event_id'),
+        'floor': floorplan.get('floor', 1),
+        'layer': floorplan.get('layer', 0),
+        'status': floorplan.get('status', 'draft'),
+        'storage': floorplan.get('storage', STORAGE_INLINE),
+        'element_count': floorplan.get('element_count', 0),
+        'bounds': floorplan.get('bounds'),
+        'exhibitors': floorplan.get('exhibitors', []),
+        'stats': floorplan.get('stats', {})
+    }
+    
+    if include_elements:
+        fp_data['booth_details'] = floorplan['booth_details']
+    else:
+        fp_data['chunks'] = floorplan.get('chunks', [])
+    return fp_data
+
+@floorplan_bp.route('/public/floorplans/<floorplan_id>/chunks', methods=['GET'])
+def get_public_floorplan_chunks(floorplan_id):
+    """List the element chunks of a published floor plan (no authentication required)"""
+    try:
+        db = get_db()
+        
+        floorplan = _published_floorplan(db, floorplan_id)
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found or not published'}), 404
+        
+        return jsonify({
+            'floorplan_id': floorplan_id,
             'version': floorplan['version'],
-            'event_id': floorplan.get('event_id'),
-            'floor': floorplan.get('floor', 1),
-            'layer': floorplan.get('layer', 0),
-            'status': floorplan.get('status', 'draft')
-        }
+            'storage': floorplan.get('storage', STORAGE_INLINE),
+            'chunks': floorplan.get('chunks', [])
+        }), 200
         
-        # Add detailed booth information
-        booth_details = FloorPlanStats.get_booth_details(floorplan)
-        fp_data['booth_details'] = booth_details
+    except Exception as e:
+        return jsonify({'message': 'Failed to get element chunks', 'error': str(e)}), 500
+
+@floorplan_bp.route('/public/floorplans/<floorplan_id>/elements', methods=['GET'])
+def get_public_floorplan_elements(floorplan_id):
+    """Get elements of a published floor plan by layer/tile or viewport (no authentication required)"""
+    try:
+        db = get_db()
         
-        # Add statistics
-        stats = FloorPlanStats.calculate_booth_stats(floorplan)
-        fp_data['stats'] = stats
+        floorplan = db.floorplans.find_one(
+            {'_id': ObjectId(floorplan_id), 'status': 'published'},
+            projection=_element_fetch_projection()
+        )
+        if not floorplan:
+            return jsonify({'message': 'Floor plan not found or not published'}), 404
         
-        return jsonify({'floorplan': fp_data}), 200
+        return _elements_response(db, floorplan, floorplan_id)
         
     except Exception as e:
-        return jsonify({'message': 'Failed to get public floor plan', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to get elements', 'error': str(e)}), 500
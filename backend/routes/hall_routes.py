@@ -1,17 +1,164 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_cors import cross_origin
-from pymongo import MongoClient
+from database import get_database
 from bson import ObjectId
 from datetime import datetime
-import os
+from config import Config
+from cache import document_cache
+from projections import AREA_PLAN_SUMMARY_FIELDS, HALL_PLAN_SUMMARY_FIELDS
+from http_cache import (
+    list_etag, list_validators_from_docs, public_cache_control,
+    is_conditional_request, is_not_modified, with_validators, not_modified
+)
 
 hall_bp = Blueprint('hall', __name__)
 
+# Floor plan statuses visible on the public hall map
+PUBLIC_PLAN_STATUSES = ['active', 'published']
+
+# Document cache collections of the public hall map, keyed by event_id / hall_id
+PUBLIC_HALLS_CACHE = 'public_halls'
+PUBLIC_HALL_FLOORPLANS_CACHE = 'public_hall_floorplans'
+PUBLIC_EVENT_HIERARCHY_CACHE = 'public_event_hierarchy'
+
+# Fields read at each level of the event hierarchy (summaries; plan payloads are fetched separately)
+HIERARCHY_FIELDS = {
+    'halls': ('name', 'color', 'polygon', 'event_id', 'last_modified'),
+    'floorplans': ('name', 'description', 'status', 'floor', 'layer', 'version', 'last_modified'),
+    # area_plan_id links hall plans to their area plan, so it is always read
+    'hall_plans': HALL_PLAN_SUMMARY_FIELDS,
+    'area_plans': AREA_PLAN_SUMMARY_FIELDS
+}
+# Revalidating the cached hierarchy only needs modification times
+HIERARCHY_VERSION_FIELDS = {
+    level: ('last_modified', 'created_at', 'created') + (('area_plan_id',) if level == 'hall_plans' else ())
+    for level in HIERARCHY_FIELDS
+}
+
+def invalidate_public_hall_caches(hall_id=None):
+    """Drop cached hall map listings (and the hall document itself when given)"""
+    document_cache.invalidate_collection(PUBLIC_HALLS_CACHE)
+    document_cache.invalidate_collection(PUBLIC_HALL_FLOORPLANS_CACHE)
+    document_cache.invalidate_collection(PUBLIC_EVENT_HIERARCHY_CACHE)
+    if hall_id is not None:
+        document_cache.invalidate('halls', hall_id)
+
 # Get MongoDB connection (mirrors floorplan_routes.get_db)
 def get_db():
-    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-    return client.get_default_database()
+    return get_database()
+
+def event_hierarchy_pipeline(event_id, fields):
+    """
+    Aggregation returning the whole tree of an event in one round trip.
+    
+    Each public hall of the event gets its visible floor plans, its published
+    hall plans and the published area plans those belong to joined in; the
+    event's floor plans are appended with $unionWith so plans not placed in
+    any hall are part of the tree too. `fields` gives the projection of each level.
+    """
+    def project(level, *extra):
+        return {'$project': {field: 1 for field in fields[level] + extra}}
+    
+    return [
+        {'$match': {'event_id': event_id, 'public': True}},
+        {'$sort': {'name': 1}},
+        {'$lookup': {
+            'from': 'floorplans',
+            'localField': 'floorplan_ids',
+            'foreignField': '_id',
+            'pipeline': [
+                {'$match': {'status': {'$in': PUBLIC_PLAN_STATUSES}}},
+                {'$sort': {'floor': 1, 'layer': 1}},
+                project('floorplans')
+            ],
+            'as': 'floorplans'
+        }},
+        {'$lookup': {
+            'from': 'hall_floorplans',
+            # Hall plans store the hall's id as a string
+            'let': {'hall_id': {'$toString': '$_id'}},
+            'pipeline': [
+                {'$match': {'status': 'published', '$expr': {'$eq': ['$hall_id', '$$hall_id']}}},
+                {'$sort': {'created_at': -1}},
+                project('hall_plans')
+            ],
+            'as': 'hall_plans'
+        }},
+        {'$lookup': {
+            'from': 'area_floorplans',
+            'let': {'area_plan_ids': {'$ifNull': ['$hall_plans.area_plan_id', []]}},
+            'pipeline': [
+                {'$match': {'status': 'published', '$expr': {'$in': [{'$toString': '$_id'}, '$$area_plan_ids']}}},
+                project('area_plans')
+            ],
+            'as': 'area_plans'
+        }},
+        project('halls', 'floorplans', 'hall_plans', 'area_plans'),
+        {'$addFields': {'kind': 'hall'}},
+        {'$unionWith': {
+            'coll': 'floorplans',
+            'pipeline': [
+                {'$match': {'event_id': event_id, 'status': {'$in': PUBLIC_PLAN_STATUSES}}},
+                {'$sort': {'floor': 1, 'layer': 1}},
+                project('floorplans'),
+                {'$addFields': {'kind': 'floorplan'}}
+            ]
+        }}
+    ]
+
+def collect_event_hierarchy(docs):
+    """Split the aggregation output into halls, unassigned floor plans and the distinct area plans"""
+    halls, floorplans, area_plans = [], [], {}
+    assigned = set()
+    for doc in docs:
+        if doc.pop('kind', None) == 'floorplan':
+            floorplans.append(doc)
+            continue
+        halls.append(doc)
+        assigned.update(fp['_id'] for fp in doc.get('floorplans', []))
+        for area_plan in doc.pop('area_plans', []):
+            area_plans[area_plan['_id']] = area_plan
+    floorplans = [fp for fp in floorplans if fp['_id'] not in assigned]
+    return halls, floorplans, list(area_plans.values())
+
+def hierarchy_version(halls, floorplans, area_plans):
+    """Composite version: (count, newest modification time) of every level of the tree"""
+    return (
+        list_validators_from_docs(halls),
+        list_validators_from_docs(floorplans + [fp for hall in halls for fp in hall.get('floorplans', [])]),
+        list_validators_from_docs([plan for hall in halls for plan in hall.get('hall_plans', [])]),
+        list_validators_from_docs(area_plans)
+    )
+
+def hierarchy_etag(event_id, version, variant=None):
+    """One validator for the whole tree: newest modification and item count over all levels"""
+    stamps = [last_modified for _, last_modified in version if last_modified]
+    last_modified = max(stamps) if stamps else None
+    count = sum(count for count, _ in version)
+    return list_etag(f'hierarchy-{event_id}', last_modified, count, variant), last_modified
+
+def _summary(doc):
+    doc['id'] = str(doc.pop('_id'))
+    return doc
+
+def event_hierarchy(event_id, docs):
+    """Event tree from the aggregation output, with its composite version for the document cache"""
+    halls, floorplans, area_plans = collect_event_hierarchy(docs)
+    version = hierarchy_version(halls, floorplans, area_plans)
+    for hall in halls:
+        hall['floorplans'] = [_summary(fp) for fp in hall.get('floorplans', [])]
+        hall['hall_plans'] = [_summary(plan) for plan in hall.get('hall_plans', [])]
+        hall['area_plan_ids'] = sorted({plan['area_plan_id'] for plan in hall['hall_plans'] if plan.get('area_plan_id')})
+    return {
+        'version': version,
+        'hierarchy': {
+            'event_id': event_id,
+            'area_plans': [_summary(plan) for plan in area_plans],
+            'halls': [_summary(hall) for hall in halls],
+            'floorplans': [_summary(fp) for fp in floorplans]
+        }
+    }
 
 # Hall document shape:
 # {
@@ -48,6 +195,7 @@ def create_hall():
             'public': bool(data.get('public', True)),
         }
         result = db.halls.insert_one(hall_doc)
+        invalidate_public_hall_caches(result.inserted_id)
         hall_doc['id'] = str(result.inserted_id)
         hall_doc.pop('_id', None)
         return jsonify({'message': 'Hall created', 'hall': hall_doc}), 201
@@ -100,38 +248,89 @@ def update_hall(hall_id):
         if 'floorplan_ids' in data:
             update['floorplan_ids'] = [ObjectId(fp) for fp in data.get('floorplan_ids', []) if ObjectId.is_valid(fp)]
         db.halls.update_one({'_id': ObjectId(hall_id)}, {'$set': update})
+        invalidate_public_hall_caches(hall_id)
         return jsonify({'message': 'Hall updated'}), 200
     except Exception as e:
         return jsonify({'message': 'Failed to update hall', 'error': str(e)}), 500
 
-# Public endpoints
+# Public endpoints (the async serving path in asgi.py reuses the pipelines and item builders below)
+def public_halls_pipeline(event_id=None):
+    """Public halls with the number of visible plans per hall"""
+    match = {'public': True}
+    if event_id:
+        match['event_id'] = event_id
+    # One round trip: count published/active plans per hall inside the $lookup,
+    # reading only (_id, status) so the floorplans (_id, status) index covers it
+    return [
+        {'$match': match},
+        {'$sort': {'last_modified': -1}},
+        {'$lookup': {
+            'from': 'floorplans',
+            'localField': 'floorplan_ids',
+            'foreignField': '_id',
+            'pipeline': [
+                {'$match': {'status': {'$in': PUBLIC_PLAN_STATUSES}}},
+                {'$group': {'_id': None, 'count': {'$sum': 1}}}
+            ],
+            'as': 'published'
+        }},
+        {'$project': {
+            'name': 1,
+            'color': 1,
+            'polygon': 1,
+            'event_id': 1,
+            'plans': {'$ifNull': [{'$first': '$published.count'}, 0]}
+        }}
+    ]
+
+def public_hall_item(h):
+    return {
+        'id': str(h['_id']),
+        'name': h.get('name'),
+        'color': h.get('color'),
+        'polygon': h.get('polygon', []),
+        'event_id': h.get('event_id'),
+        'plans': h.get('plans', 0),
+    }
+
+def public_hall_floorplans_pipeline(hall_id):
+    """Hall lookup and its visible plans in a single aggregation"""
+    return [
+        {'$match': {'_id': ObjectId(hall_id), 'public': {'$ne': False}}},
+        {'$lookup': {
+            'from': 'floorplans',
+            'localField': 'floorplan_ids',
+            'foreignField': '_id',
+            'pipeline': [
+                {'$match': {'status': {'$in': PUBLIC_PLAN_STATUSES}}},
+                {'$sort': {'last_modified': -1}},
+                {'$project': {'name': 1, 'description': 1, 'status': 1, 'last_modified': 1}}
+            ],
+            'as': 'floorplans'
+        }},
+        {'$project': {'floorplans': 1}}
+    ]
+
+def public_hall_floorplan_item(fp):
+    return {
+        'id': str(fp['_id']),
+        'name': fp.get('name'),
+        'description': fp.get('description'),
+        'status': fp.get('status', 'draft'),
+        'last_modified': fp.get('last_modified'),
+    }
+
 @hall_bp.route('/public/halls', methods=['GET'])
 @cross_origin()
 def list_public_halls():
     try:
-        db = get_db()
         event_id = request.args.get('event_id')
-        query = {'public': True}
-        if event_id:
-            query['event_id'] = event_id
-        halls = []
-        for h in db.halls.find(query).sort('last_modified', -1):
-            # Optionally compute count of published/active plans
-            published_count = 0
-            fp_ids = h.get('floorplan_ids', [])
-            if fp_ids:
-                published_count = db.floorplans.count_documents({
-                    '_id': {'$in': fp_ids},
-                    'status': {'$in': ['active', 'published']}
-                })
-            halls.append({
-                'id': str(h['_id']),
-                'name': h.get('name'),
-                'color': h.get('color'),
-                'polygon': h.get('polygon', []),
-                'event_id': h.get('event_id'),
-                'plans': published_count,
-            })
+        
+        def load():
+            db = get_db()
+            return [public_hall_item(h) for h in db.halls.aggregate(public_halls_pipeline(event_id))]
+        
+        halls = document_cache.get(PUBLIC_HALLS_CACHE, event_id or '*', load, ttl=Config.PUBLIC_HALLS_CACHE_TTL)
         return jsonify({'success': True, 'halls': halls}), 200
     except Exception as e:
         return jsonify({'message': 'Failed to list public halls', 'error': str(e)}), 500
@@ -140,25 +339,42 @@ def list_public_halls():
 @cross_origin()
 def list_public_hall_floorplans(hall_id):
     try:
-        db = get_db()
-        hall = db.halls.find_one({'_id': ObjectId(hall_id)})
-        if not hall or not hall.get('public', True):
+        def load():
+            db = get_db()
+            hall = next(db.halls.aggregate(public_hall_floorplans_pipeline(hall_id)), None)
+            if not hall:
+                return None
+            return [public_hall_floorplan_item(fp) for fp in hall.get('floorplans', [])]
+        
+        floorplans = document_cache.get(PUBLIC_HALL_FLOORPLANS_CACHE, hall_id, load, ttl=Config.PUBLIC_HALLS_CACHE_TTL)
+        if floorplans is None:
             return jsonify({'message': 'Hall not found'}), 404
-        fp_ids = hall.get('floorplan_ids', [])
-        floorplans = []
-        if fp_ids:
-            cursor = db.floorplans.find({
-                '_id': {'$in': fp_ids},
-                'status': {'$in': ['active', 'published']}
-            }).sort('last_modified', -1)
-            for fp in cursor:
-                floorplans.append({
-                    'id': str(fp['_id']),
-                    'name': fp.get('name'),
-                    'description': fp.get('description'),
-                    'status': fp.get('status', 'draft'),
-                    'last_modified': fp.get('last_modified'),
-                })
         return jsonify({'success': True, 'floorplans': floorplans}), 200
     except Exception as e:
-        return jsonify({'message': 'Failed to list hall floorplans', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to list hall floorplans', 'error': str(e)}), 500
+
+@hall_bp.route('/public/events/<event_id>/hierarchy', methods=['GET'])
+@cross_origin()
+def get_public_event_hierarchy(event_id):
+    """Area plans, halls, hall plans and floor plans of an event in one response"""
+    try:
+        db = get_db()
+        
+        def load():
+            return event_hierarchy(event_id, db.halls.aggregate(event_hierarchy_pipeline(event_id, HIERARCHY_FIELDS)))
+        
+        def load_version():
+            # The same aggregation reading only timestamps
+            docs = db.halls.aggregate(event_hierarchy_pipeline(event_id, HIERARCHY_VERSION_FIELDS))
+            return hierarchy_version(*collect_event_hierarchy(docs))
+        
+        cached = document_cache.get(PUBLIC_EVENT_HIERARCHY_CACHE, event_id, load, version_loader=load_version)
+        
+        etag, last_modified = hierarchy_etag(event_id, cached['version'])
+        if is_conditional_request() and is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified, public_cache_control())
+        
+        response = jsonify({'success': True, 'hierarchy': cached['hierarchy']})
+        return with_validators(response, etag, last_modified, public_cache_control()), 200
+    except Exception as e:
+        return jsonify({'message': 'Failed to get event hierarchy', 'error': str(e)}), 500
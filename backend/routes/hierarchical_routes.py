@@ -3,12 +3,22 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 import os
 import uuid
-import cv2
-import numpy as np
 from datetime import datetime
 from auth import admin_required
-from pymongo import MongoClient
+from database import get_database
+import bson
 from bson import ObjectId
+from cache import document_cache
+from stage_timer import StageTimer, stage
+from tracing import span
+from projections import AREA_PLAN_SUMMARY_FIELDS, HALL_PLAN_SUMMARY_FIELDS, request_projection, projection_key
+from batch import parse_batch_ids, fetch_batch, batch_items
+from routes.hall_routes import invalidate_public_hall_caches
+from http_cache import (
+    list_etag, list_validators, list_validators_from_docs, public_cache_control,
+    document_etag, fields_variant, modification_stamp,
+    is_conditional_request, is_not_modified, with_validators, not_modified
+)
 
 hierarchical_bp = Blueprint('hierarchical', __name__)
 
@@ -16,13 +26,60 @@ hierarchical_bp = Blueprint('hierarchical', __name__)
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 
+def _save_upload(file, file_path):
+    with span('upload.save', **{'upload.filename': file.filename}) as save_span:
+        file.save(file_path)
+        save_span.set_attribute('upload.bytes', os.path.getsize(file_path))
+
+def _insert_plan(collection, plan):
+    """insert_one, traced with the size of the document"""
+    with span('plan.insert', **{'db.mongodb.collection': collection.name}) as insert_span:
+        if insert_span.recording:
+            insert_span.set_attribute('document.bytes', len(bson.encode(plan)))
+        return collection.insert_one(plan)
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def get_db():
-    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring'))
-    return client.get_default_database()
+    return get_database()
+
+# Document cache collections of the public plan listings
+PUBLIC_AREA_PLANS_CACHE = 'public_area_plans'
+PUBLIC_HALL_PLANS_CACHE = 'public_hall_plans'
+
+def _validator_projection(projection):
+    """The validators need the timestamps even when the client didn't ask for them"""
+    return dict(projection, last_modified=1, created_at=1) if projection else None
+
+def _public_plan(plan, projection=None):
+    """Plan document as returned by the public endpoints"""
+    plan['id'] = str(plan['_id'])
+    plan.pop('_id', None)
+    # Remove sensitive data
+    plan.pop('created_by', None)
+    if projection:
+        for field in ('last_modified', 'created_at'):
+            if field not in projection:
+                plan.pop(field, None)
+    return plan
+
+def _cached_plan_list(cache_collection, key, collection, query, projection=None):
+    """
+    Published plans matching query, through the document cache.
+    
+    The cached entry is versioned by (count, newest modification time), so an
+    expired entry is revalidated with one small aggregation instead of a refetch.
+    Each projection is cached separately.
+    """
+    def load():
+        plans = list(collection.find(query, projection=_validator_projection(projection)).sort('created_at', -1))
+        count, last_modified = list_validators_from_docs(plans)
+        return {'version': (count, last_modified), 'plans': [_public_plan(plan, projection) for plan in plans]}
+    
+    return document_cache.get(cache_collection, f'{key}:{projection_key(projection)}', load,
+                              version_loader=lambda: list_validators(collection, query))
 
 @hierarchical_bp.route('/admin/floorplans/area-upload', methods=['POST'])
 @admin_required
@@ -49,10 +106,13 @@ def upload_area_floorplan():
         
         # Save file
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        file.save(file_path)
+        _save_upload(file, file_path)
         
-        # Detect halls using computer vision
-        detected_halls = detect_halls_in_area(file_path)
+        # Detect halls using computer vision (OpenCV loads on the first upload)
+        from hall_detection import detect_halls_in_area
+        with StageTimer('area_plan'), stage('halls') as halls_stage:
+            detected_halls = detect_halls_in_area(file_path)
+            halls_stage.candidates = len(detected_halls)
         
         # Create area floor plan record
         db = get_db()
@@ -66,10 +126,12 @@ def upload_area_floorplan():
             'detected_halls': detected_halls,
             'created_by': current_user_id,
             'created_at': datetime.utcnow(),
+            'last_modified': datetime.utcnow(),
             'status': 'draft'
         }
         
-        result = db.area_floorplans.insert_one(area_plan)
+        result = _insert_plan(db.area_floorplans, area_plan)
+        document_cache.invalidate_collection(PUBLIC_AREA_PLANS_CACHE)
         area_plan['id'] = str(result.inserted_id)
         area_plan.pop('_id', None)
         
@@ -100,7 +162,7 @@ def upload_hall_floorplan(hall_id):
         
         # Verify hall exists
         db = get_db()
-        hall = db.halls.find_one({'_id': ObjectId(hall_id)})
+        hall = document_cache.get('halls', hall_id, lambda: db.halls.find_one({'_id': ObjectId(hall_id)}))
         if not hall:
             return jsonify({'message': 'Hall not found'}), 404
         
@@ -111,10 +173,13 @@ def upload_hall_floorplan(hall_id):
         
         # Save file
         file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        file.save(file_path)
+        _save_upload(file, file_path)
         
         # Process hall floor plan
-        booth_detection = detect_booths_in_hall(file_path)
+        from hall_detection import detect_booths_in_hall
+        with StageTimer('hall_plan'), stage('booths') as booths_stage:
+            booth_detection = detect_booths_in_hall(file_path)
+            booths_stage.candidates = len(booth_detection.get('booths', []))
         
         # Create hall floor plan record
         current_user_id = get_jwt_identity()
@@ -129,6 +194,7 @@ def upload_hall_floorplan(hall_id):
             'booth_detection': booth_detection,
             'created_by': current_user_id,
             'created_at': datetime.utcnow(),
+            'last_modified': datetime.utcnow(),
             'status': 'draft',
             'state': {
                 'elements': booth_detection.get('booths', []),
@@ -139,7 +205,8 @@ def upload_hall_floorplan(hall_id):
             }
         }
         
-        result = db.hall_floorplans.insert_one(hall_plan)
+        result = _insert_plan(db.hall_floorplans, hall_plan)
+        document_cache.invalidate_collection(PUBLIC_HALL_PLANS_CACHE)
         hall_plan['id'] = str(result.inserted_id)
         hall_plan.pop('_id', None)
         
@@ -155,13 +222,18 @@ def upload_hall_floorplan(hall_id):
 @hierarchical_bp.route('/admin/area-plans', methods=['GET'])
 @admin_required
 def get_area_plans():
-    """Get all area floor plans"""
+    """Get all area floor plans (?view=summary|full, ?fields=a,b)"""
     try:
         db = get_db()
         current_user_id = get_jwt_identity()
         
+        try:
+            projection = request_projection(AREA_PLAN_SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid fields', 'error': str(e)}), 400
+        
         # Admin can see all area plans
-        area_plans = list(db.area_floorplans.find().sort('created_at', -1))
+        area_plans = list(db.area_floorplans.find({}, projection=projection).sort('created_at', -1))
         
         for plan in area_plans:
             plan['id'] = str(plan['_id'])
@@ -178,12 +250,17 @@ def get_area_plans():
 @hierarchical_bp.route('/admin/hall-plans/<hall_id>', methods=['GET'])
 @admin_required
 def get_hall_plans(hall_id):
-    """Get floor plans for a specific hall"""
+    """Get floor plans for a specific hall (?view=summary|full, ?fields=a,b)"""
     try:
         db = get_db()
         
+        try:
+            projection = request_projection(HALL_PLAN_SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid fields', 'error': str(e)}), 400
+        
         # Get hall plans for specific hall
-        hall_plans = list(db.hall_floorplans.find({'hall_id': hall_id}).sort('created_at', -1))
+        hall_plans = list(db.hall_floorplans.find({'hall_id': hall_id}, projection=projection).sort('created_at', -1))
         
         for plan in hall_plans:
             plan['id'] = str(plan['_id'])
@@ -225,6 +302,7 @@ def assign_plan_to_hall(hall_id):
                 }
             }
         )
+        invalidate_public_hall_caches(hall_id)
         
         return jsonify({
             'success': True,
@@ -234,644 +312,98 @@ def assign_plan_to_hall(hall_id):
     except Exception as e:
         return jsonify({'message': 'Failed to assign plan', 'error': str(e)}), 500
 
-def detect_halls_in_area(image_path):
-    """
-    Enhanced computer vision algorithm to detect hall spaces in BIEC area floor plans
-    Optimized for 100% accuracy in detecting all colored hall structures
-    """
-    try:
-        # Load image
-        image = cv2.imread(image_path)
-        if image is None:
-            return []
-        
-        h, w = image.shape[:2]
-        print(f"Processing BIEC area floor plan: {w}x{h} pixels")
-        
-        # Convert to different color spaces for better detection
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        detected_halls = []
-        
-        # Method 1: Enhanced Color-based Hall Detection for BIEC
-        color_halls = detect_biec_halls_by_color(image, hsv)
-        detected_halls.extend(color_halls)
-        
-        # Method 2: Contour-based Large Structure Detection
-        contour_halls = detect_halls_by_contours(image, gray)
-        detected_halls.extend(contour_halls)
-        
-        # Method 3: Template-based Hall Detection for known BIEC layout
-        template_halls = detect_biec_template_halls(image, w, h)
-        detected_halls.extend(template_halls)
-        
-        # Merge overlapping detections and remove duplicates
-        merged_halls = merge_overlapping_halls(detected_halls)
-        
-        # Sort by area (largest first) and confidence
-        merged_halls.sort(key=lambda h: (h['area'], h['confidence']), reverse=True)
-        
-        # Limit to reasonable number and ensure quality
-        final_halls = []
-        for hall in merged_halls[:15]:  # Max 15 halls
-            if hall['confidence'] > 0.6 and hall['area'] > 5000:  # Quality threshold
-                final_halls.append(hall)
-        
-        print(f"Final detection: {len(final_halls)} high-quality halls")
-        return final_halls
-        
-    except Exception as e:
-        print(f"Error in hall detection: {e}")
-        return []
-
-def detect_biec_halls_by_color(image, hsv):
-    """Detect BIEC halls based on their specific color coding"""
-    halls = []
-    
-    try:
-        # BIEC-specific color ranges based on the floor plan
-        biec_color_ranges = [
-            # Orange/Yellow halls (Hall 5)
-            ([15, 100, 100], [35, 255, 255], 'orange', 'Hall 5'),
-            
-            # Green halls (Hall 4) 
-            ([40, 100, 100], [80, 255, 255], 'green', 'Hall 4'),
-            
-            # Blue halls (Hall 1)
-            ([90, 100, 100], [120, 255, 255], 'blue', 'Hall 1'),
-            
-            # Purple/Magenta halls (Hall 2)
-            ([130, 100, 100], [160, 255, 255], 'purple', 'Hall 2'),
-            
-            # Red halls (Hall 3)
-            ([0, 100, 100], [15, 255, 255], 'red', 'Hall 3'),
-            ([160, 100, 100], [179, 255, 255], 'red', 'Hall 3'),
-            
-            # Additional ranges for variations in lighting/saturation
-            ([15, 50, 50], [35, 255, 255], 'light_orange', 'Hall 5 Area'),
-            ([40, 50, 50], [80, 255, 255], 'light_green', 'Hall 4 Area'),
-            ([90, 50, 50], [120, 255, 255], 'light_blue', 'Hall 1 Area'),
-            ([130, 50, 50], [160, 255, 255], 'light_purple', 'Hall 2 Area'),
-        ]
-        
-        hall_counter = 1
-        
-        for lower, upper, color_name, hall_name in biec_color_ranges:
-            lower_bound = np.array(lower)
-            upper_bound = np.array(upper)
-            
-            # Create mask for this color range
-            mask = cv2.inRange(hsv, lower_bound, upper_bound)
-            
-            # Enhanced morphological operations for better hall detection
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            
-            # Find contours in color mask
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                # Minimum area threshold for halls (much larger than booths)
-                if area >= 15000:  # Large structures only
-                    x, y, w, h = cv2.boundingRect(contour)
-                    
-                    # Calculate rectangularity for quality assessment
-                    rect_area = w * h
-                    rectangularity = area / rect_area if rect_area > 0 else 0
-                    
-                    # Only accept well-formed rectangular halls
-                    if rectangularity > 0.7:
-                        hall_data = {
-                            'id': f'hall_{color_name}_{hall_counter}',
-                            'name': hall_name,
-                            'bounds': {
-                                'x': int(x),
-                                'y': int(y),
-                                'width': int(w),
-                                'height': int(h)
-                            },
-                            'area': int(area),
-                            'confidence': min(0.95, rectangularity * 0.9),
-                            'detection_method': f'color_{color_name}',
-                            'color': color_name,
-                            'rectangularity': rectangularity
-                        }
-                        halls.append(hall_data)
-                        hall_counter += 1
-        
-        return halls
-        
-    except Exception as e:
-        print(f"Error in BIEC color-based hall detection: {e}")
-        return []
-
-def detect_halls_by_contours(image, gray):
-    """Detect halls using contour analysis for geometric structures"""
-    halls = []
-    
-    try:
-        # Apply multiple threshold techniques
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-        
-        # Find contours
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        h, w = gray.shape
-        min_hall_area = (w * h) * 0.03  # Minimum 3% of image area for halls
-        
-        for i, contour in enumerate(contours):
-            area = cv2.contourArea(contour)
-            
-            if area >= min_hall_area:
-                # Check rectangularity
-                epsilon = 0.015 * cv2.arcLength(contour, True)
-                approx = cv2.approxPolyDP(contour, epsilon, True)
-                
-                if len(approx) >= 4:  # Roughly rectangular
-                    x, y, w_rect, h_rect = cv2.boundingRect(contour)
-                    
-                    # Calculate rectangularity score
-                    rect_area = w_rect * h_rect
-                    rectangularity = area / rect_area if rect_area > 0 else 0
-                    
-                    if rectangularity > 0.75:  # High rectangularity for halls
-                        hall_data = {
-                            'id': f'contour_hall_{i + 1}',
-                            'name': f'Detected Hall {i + 1}',
-                            'bounds': {
-                                'x': int(x),
-                                'y': int(y),
-                                'width': int(w_rect),
-                                'height': int(h_rect)
-                            },
-                            'area': int(area),
-                            'confidence': round(rectangularity * 0.85, 3),
-                            'detection_method': 'contour_analysis',
-                            'rectangularity': rectangularity
-                        }
-                        halls.append(hall_data)
-        
-        return halls
-        
-    except Exception as e:
-        print(f"Error in contour-based hall detection: {e}")
-        return []
-
-def detect_biec_template_halls(image, width, height):
-    """Detect halls using BIEC-specific layout templates"""
-    halls = []
-    
-    try:
-        # Based on BIEC floor plan layout, define expected hall positions
-        # These are approximate positions that can be refined by actual detection
-        biec_hall_templates = [
-            {
-                'name': 'Hall 1 (Blue)',
-                'expected_region': (int(width * 0.75), int(height * 0.1), int(width * 0.2), int(height * 0.6)),
-                'color_hint': 'blue'
-            },
-            {
-                'name': 'Hall 2 (Purple)', 
-                'expected_region': (int(width * 0.55), int(height * 0.1), int(width * 0.15), int(height * 0.6)),
-                'color_hint': 'purple'
-            },
-            {
-                'name': 'Hall 3 (Red)',
-                'expected_region': (int(width * 0.4), int(height * 0.1), int(width * 0.1), int(height * 0.8)),
-                'color_hint': 'red'
-            },
-            {
-                'name': 'Hall 4 (Green)',
-                'expected_region': (int(width * 0.05), int(height * 0.4), int(width * 0.3), int(height * 0.3)),
-                'color_hint': 'green'
-            },
-            {
-                'name': 'Hall 5 (Orange)',
-                'expected_region': (int(width * 0.05), int(height * 0.1), int(width * 0.3), int(height * 0.25)),
-                'color_hint': 'orange'
-            }
-        ]
-        
-        for i, template in enumerate(biec_hall_templates):
-            x, y, w, h = template['expected_region']
-            
-            # Validate the template region has reasonable dimensions
-            if w > 50 and h > 50:
-                hall_data = {
-                    'id': f'template_hall_{i + 1}',
-                    'name': template['name'],
-                    'bounds': {
-                        'x': x,
-                        'y': y,
-                        'width': w,
-                        'height': h
-                    },
-                    'area': w * h,
-                    'confidence': 0.8,  # Template-based confidence
-                    'detection_method': 'template_matching',
-                    'color': template['color_hint']
-                }
-                halls.append(hall_data)
-        
-        return halls
-        
-    except Exception as e:
-        print(f"Error in template-based hall detection: {e}")
-        return []
-
-def detect_booths_in_hall(image_path):
-    """Enhanced booth detection within hall floor plans with 100% accuracy"""
+@hierarchical_bp.route('/public/area-plans', methods=['GET'])
+def get_public_area_plans():
+    """Get published area floor plans for public viewing (?view=summary|full, ?fields=a,b)"""
     try:
-        # Load image
-        image = cv2.imread(image_path)
-        if image is None:
-            return {'booths': [], 'imageWidth': 0, 'imageHeight': 0}
-        
-        h, w = image.shape[:2]
-        print(f"Processing hall floor plan: {w}x{h} pixels")
-        
-        # Use enhanced detection from main detection module
-        from detection import detect_rects_by_color
-        from yolo_detect import detect_booths
-        
-        # Try multiple detection methods for maximum accuracy
-        all_booths = []
-        
-        # Method 1: Enhanced color detection
-        try:
-            color_booths = detect_rects_by_color(image_path, min_area=200)  # Lower threshold for hall booths
-            all_booths.extend(color_booths)
-            print(f"Color detection found {len(color_booths)} booths")
-        except Exception as e:
-            print(f"Color detection failed: {e}")
+        db = get_db()
         
-        # Method 2: YOLO detection if available
         try:
-            yolo_booths = detect_booths(image_path, conf=0.25, iou=0.4)  # Lower confidence for more detections
-            all_booths.extend(yolo_booths)
-            print(f"YOLO detection found {len(yolo_booths)} booths")
-        except Exception as e:
-            print(f"YOLO detection failed: {e}")
-        
-        # Remove duplicates and merge overlapping detections
-        unique_booths = remove_duplicate_booths(all_booths)
-        
-        # Convert booth format for hall floor plans with enhanced properties
-        hall_booths = []
-        for i, booth in enumerate(unique_booths):
-            # Determine booth status based on color or detection method
-            status = 'available'
-            fill_color = '#FFFFFF'
-            
-            if booth.get('color_name'):
-                color = booth['color_name']
-                if 'green' in color:
-                    status = 'available'
-                    fill_color = '#E8F5E8'
-                elif 'blue' in color:
-                    status = 'reserved'
-                    fill_color = '#E3F2FD'
-                elif 'red' in color:
-                    status = 'sold'
-                    fill_color = '#FFEBEE'
-                elif 'orange' in color or 'yellow' in color:
-                    status = 'on-hold'
-                    fill_color = '#FFF8E1'
-            
-            hall_booth = {
-                'id': f'booth_{i + 1}',
-                'type': 'booth',
-                'x': booth['x'],
-                'y': booth['y'],
-                'width': booth['w'],
-                'height': booth['h'],
-                'rotation': 0,
-                'fill': fill_color,
-                'stroke': '#333333',
-                'strokeWidth': 2,
-                'draggable': True,
-                'selected': False,
-                'layer': 1,
-                'customProperties': {
-                    'detection_method': booth.get('type', 'unknown'),
-                    'detection_score': booth.get('score', 0),
-                    'color_detected': booth.get('color_name', 'none'),
-                    'area': booth.get('area', 0),
-                    'rectangularity': booth.get('rectangularity', 0)
-                },
-                'number': f'H{i + 1:03d}',
-                'status': status,
-                'dimensions': {
-                    'imperial': f'{int(booth["w"]/10)}\' x {int(booth["h"]/10)}\'',
-                    'metric': f'{booth["w"]/40:.1f}m x {booth["h"]/40:.1f}m'
-                }
-            }
-            hall_booths.append(hall_booth)
-        
-        print(f"Generated {len(hall_booths)} booth elements for hall floor plan")
-        
-        return {
-            'booths': hall_booths,
-            'imageWidth': w,
-            'imageHeight': h,
-            'detection_count': len(hall_booths),
-            'detection_summary': {
-                'total_detections': len(all_booths),
-                'unique_booths': len(unique_booths),
-                'final_booths': len(hall_booths)
-            }
-        }
+            projection = request_projection(AREA_PLAN_SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid fields', 'error': str(e)}), 400
         
-    except Exception as e:
-        print(f"Error detecting booths in hall: {e}")
-        return {'booths': [], 'imageWidth': 0, 'imageHeight': 0}
-
-def remove_duplicate_booths(booths):
-    """Remove duplicate booth detections based on position overlap"""
-    if not booths:
-        return []
-    
-    unique_booths = []
-    
-    for booth in booths:
-        is_duplicate = False
-        
-        for existing in unique_booths:
-            # Check for significant overlap
-            x_overlap = max(0, min(booth['x'] + booth['w'], existing['x'] + existing['w']) - max(booth['x'], existing['x']))
-            y_overlap = max(0, min(booth['y'] + booth['h'], existing['y'] + existing['h']) - max(booth['y'], existing['y']))
-            
-            overlap_area = x_overlap * y_overlap
-            booth_area = booth['w'] * booth['h']
-            existing_area = existing['w'] * existing['h']
-            
-            # If overlap is more than 50% of either booth, consider it a duplicate
-            if overlap_area > 0.5 * min(booth_area, existing_area):
-                is_duplicate = True
-                # Keep the one with higher score
-                if booth.get('score', 0) > existing.get('score', 0):
-                    unique_booths.remove(existing)
-                    unique_booths.append(booth)
-                break
-        
-        if not is_duplicate:
-            unique_booths.append(booth)
-    
-    return unique_booths
-
-
-def detect_halls_by_color(image, hsv):
-    """Detect halls based on distinct color regions"""
-    halls = []
-    
-    try:
-        # Define color ranges for different hall types
-        color_ranges = [
-            # Blue halls
-            ([100, 50, 50], [130, 255, 255], 'blue'),
-            # Green halls  
-            ([40, 50, 50], [80, 255, 255], 'green'),
-            # Red halls
-            ([0, 50, 50], [20, 255, 255], 'red'),
-            # Yellow halls
-            ([20, 50, 50], [40, 255, 255], 'yellow'),
-        ]
-        
-        hall_counter = 1
-        
-        for lower, upper, color_name in color_ranges:
-            lower_bound = np.array(lower)
-            upper_bound = np.array(upper)
-            
-            # Create mask for this color range
-            mask = cv2.inRange(hsv, lower_bound, upper_bound)
-            
-            # Clean up mask
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            
-            # Find contours in color mask
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                # Minimum area threshold for halls
-                if area >= 5000:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    
-                    hall_data = {
-                        'id': f'hall_{color_name}_{hall_counter}',
-                        'name': f'{color_name.title()} Hall {hall_counter}',
-                        'bounds': {
-                            'x': int(x),
-                            'y': int(y),
-                            'width': int(w),
-                            'height': int(h)
-                        },
-                        'area': int(area),
-                        'confidence': 0.8,
-                        'detection_method': f'color_{color_name}',
-                        'color': color_name
-                    }
-                    halls.append(hall_data)
-                    hall_counter += 1
-        
-        return halls
-        
-    except Exception as e:
-        print(f"Error in color-based hall detection: {e}")
-        return []
-
-def merge_overlapping_halls(halls):
-    """Merge overlapping hall detections"""
-    if not halls:
-        return []
-    
-    merged = []
-    used = set()
-    
-    for i, hall1 in enumerate(halls):
-        if i in used:
-            continue
-        
-        current_hall = hall1.copy()
-        used.add(i)
-        
-        # Check for overlaps with remaining halls
-        for j, hall2 in enumerate(halls[i+1:], i+1):
-            if j in used:
-                continue
-            
-            if halls_overlap(hall1['bounds'], hall2['bounds']):
-                # Merge the halls
-                current_hall = merge_two_halls(current_hall, hall2)
-                used.add(j)
-        
-        merged.append(current_hall)
-    
-    return merged
-
-def halls_overlap(bounds1, bounds2, threshold=0.3):
-    """Check if two hall bounds overlap significantly"""
-    x1, y1, w1, h1 = bounds1['x'], bounds1['y'], bounds1['width'], bounds1['height']
-    x2, y2, w2, h2 = bounds2['x'], bounds2['y'], bounds2['width'], bounds2['height']
-    
-    # Calculate intersection
-    left = max(x1, x2)
-    top = max(y1, y2)
-    right = min(x1 + w1, x2 + w2)
-    bottom = min(y1 + h1, y2 + h2)
-    
-    if left < right and top < bottom:
-        intersection_area = (right - left) * (bottom - top)
-        area1 = w1 * h1
-        area2 = w2 * h2
-        
-        # Check if intersection is significant
-        overlap_ratio = intersection_area / min(area1, area2)
-        return overlap_ratio > threshold
-    
-    return False
-
-def merge_two_halls(hall1, hall2):
-    """Merge two overlapping halls"""
-    bounds1 = hall1['bounds']
-    bounds2 = hall2['bounds']
-    
-    # Calculate merged bounds
-    min_x = min(bounds1['x'], bounds2['x'])
-    min_y = min(bounds1['y'], bounds2['y'])
-    max_x = max(bounds1['x'] + bounds1['width'], bounds2['x'] + bounds2['width'])
-    max_y = max(bounds1['y'] + bounds1['height'], bounds2['y'] + bounds2['height'])
-    
-    merged_hall = {
-        'id': hall1['id'],  # Keep first hall's ID
-        'name': hall1['name'],
-        'bounds': {
-            'x': min_x,
-            'y': min_y,
-            'width': max_x - min_x,
-            'height': max_y - min_y
-        },
-        'area': (max_x - min_x) * (max_y - min_y),
-        'confidence': (hall1['confidence'] + hall2['confidence']) / 2,
-        'detection_method': 'merged',
-        'merged_from': [hall1['id'], hall2['id']]
-    }
-    
-    return merged_hall
-
-def detect_booths_in_hall(image_path):
-    """Detect booths within a hall floor plan"""
-    try:
-        # Load image
-        image = cv2.imread(image_path)
-        if image is None:
-            return {'booths': [], 'imageWidth': 0, 'imageHeight': 0}
-        
-        h, w = image.shape[:2]
+        # Only published area plans
+        cached = _cached_plan_list(PUBLIC_AREA_PLANS_CACHE, 'published', db.area_floorplans,
+                                   {'status': 'published'}, projection)
+        count, last_modified = cached['version']
         
-        # Use existing booth detection logic
-        from detection import detect_rects_by_color
-        from yolo_detect import detect_booths
+        # Revalidation polls only need the count and newest modification time
+        etag = list_etag('area-plans', last_modified, count)
+        if is_conditional_request() and is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified, public_cache_control())
         
-        # Try YOLO detection first
-        try:
-            booths = detect_booths(image_path, conf=0.3, iou=0.5)
-        except:
-            # Fallback to OpenCV detection
-            booths = detect_rects_by_color(image_path, min_area=800)
-        
-        # Convert booth format for hall floor plans
-        hall_booths = []
-        for i, booth in enumerate(booths):
-            hall_booth = {
-                'id': f'booth_{i + 1}',
-                'type': 'booth',
-                'x': booth['x'],
-                'y': booth['y'],
-                'width': booth['w'],
-                'height': booth['h'],
-                'rotation': 0,
-                'fill': '#FFFFFF',
-                'stroke': '#000000',
-                'strokeWidth': 2,
-                'draggable': True,
-                'selected': False,
-                'layer': 1,
-                'customProperties': {},
-                'number': f'H{i + 1:03d}',
-                'status': 'available',
-                'dimensions': {
-                    'imperial': f'{int(booth["w"]/10)}\' x {int(booth["h"]/10)}\'',
-                    'metric': f'{booth["w"]/40:.1f}m x {booth["h"]/40:.1f}m'
-                }
-            }
-            hall_booths.append(hall_booth)
-        
-        return {
-            'booths': hall_booths,
-            'imageWidth': w,
-            'imageHeight': h,
-            'detection_count': len(hall_booths)
-        }
+        response = jsonify({
+            'success': True,
+            'area_plans': cached['plans']
+        })
+        return with_validators(response, etag, last_modified, public_cache_control()), 200
         
     except Exception as e:
-        print(f"Error detecting booths in hall: {e}")
-        return {'booths': [], 'imageWidth': 0, 'imageHeight': 0}
+        return jsonify({'message': 'Failed to get public area plans', 'error': str(e)}), 500
 
-@hierarchical_bp.route('/public/area-plans', methods=['GET'])
-def get_public_area_plans():
-    """Get published area floor plans for public viewing"""
+@hierarchical_bp.route('/public/hall-plans/batch', methods=['GET', 'POST'])
+def get_public_hall_plans_batch():
+    """Get several published hall plans by id in one request (?ids=a,b or {"ids": [...]}, ?fields=, ?view=)"""
     try:
         db = get_db()
         
-        # Only published area plans
-        area_plans = list(db.area_floorplans.find({'status': 'published'}).sort('created_at', -1))
-        
-        for plan in area_plans:
-            plan['id'] = str(plan['_id'])
-            plan.pop('_id', None)
-            # Remove sensitive data
-            plan.pop('created_by', None)
+        try:
+            ids = parse_batch_ids()
+            projection = request_projection(HALL_PLAN_SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid batch', 'error': str(e)}), 400
+        
+        # One $in query for the whole batch; unpublished plans are reported like missing ones
+        hall_plans = fetch_batch(db.hall_floorplans, ids, {'status': 'published'},
+                                 _validator_projection(projection))
+        
+        # Hall plans have no version counter, so item ETags use the modification time
+        variant = fields_variant(projection_key(projection) if projection else None)
+        items = batch_items(
+            ids, hall_plans, 'hall_plan', lambda plan: _public_plan(plan, projection),
+            lambda plan: document_etag(plan['_id'], modification_stamp(plan), variant),
+            'Hall plan not found or not published'
+        )
         
-        return jsonify({
-            'success': True,
-            'area_plans': area_plans
-        }), 200
+        response = jsonify({'success': True, 'hall_plans': items, 'count': len(items)})
+        response.headers['Cache-Control'] = public_cache_control()
+        # Items listed in If-None-Match come back without a body
+        response.vary.add('If-None-Match')
+        return response, 200
         
     except Exception as e:
-        return jsonify({'message': 'Failed to get public area plans', 'error': str(e)}), 500
+        return jsonify({'message': 'Failed to get public hall plans', 'error': str(e)}), 500
 
 @hierarchical_bp.route('/public/hall-plans/<hall_id>', methods=['GET'])
 def get_public_hall_plans(hall_id):
-    """Get published hall floor plans for public viewing"""
+    """Get published hall floor plans for public viewing (?view=summary|full, ?fields=a,b)"""
     try:
         db = get_db()
-        
-        # Only published hall plans for this hall
-        hall_plans = list(db.hall_floorplans.find({
+        query = {
             'hall_id': hall_id,
             'status': 'published'
-        }).sort('created_at', -1))
+        }
         
-        for plan in hall_plans:
-            plan['id'] = str(plan['_id'])
-            plan.pop('_id', None)
-            # Remove sensitive data
-            plan.pop('created_by', None)
+        try:
+            projection = request_projection(HALL_PLAN_SUMMARY_FIELDS)
+        except ValueError as e:
+            return jsonify({'message': 'Invalid fields', 'error': str(e)}), 400
         
-        return jsonify({
+        # Only published hall plans for this hall
+        cached = _cached_plan_list(PUBLIC_HALL_PLANS_CACHE, hall_id, db.hall_floorplans, query, projection)
+        count, last_modified = cached['version']
+        
+        # Revalidation polls only need the count and newest modification time
+        etag = list_etag(f'hall-plans-{hall_id}', last_modified, count)
+        if is_conditional_request() and is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified, public_cache_control())
+        
+        response = jsonify({
             'success': True,
-            'hall_plans': hall_plans
-        }), 200
+            'hall_plans': cached['plans']
+        })
+        return with_validators(response, etag, last_modified, public_cache_control()), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to get public hall plans', 'error': str(e)}), 500
\ No newline at end of file
@@ -4,10 +4,13 @@ IMTMA Flooring Backend Server
 Main entry point for the Flask application
 """
 
+import logging
 import os
 import sys
 from app import create_app
 
+log = logging.getLogger('run')
+
 if __name__ == '__main__':
     # Add the backend directory to the Python path
     backend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,11 +19,12 @@ if __name__ == '__main__':
     # Create and run the Flask app
     app = create_app()
     if app:
-        print("🚀 Starting IMTMA Flooring Backend Server...")
-        print(f"📊 Dashboard: http://localhost:5000/dashboard")
-        print(f"🔗 API: http://localhost:5000/api")
-        print(f"💚 Health Check: http://localhost:5000/health")
-        print("📝 Press Ctrl+C to stop the server")
+        log.info("Starting IMTMA Flooring Backend Server...")
+        log.info("Dashboard: http://localhost:5000/dashboard")
+        log.info("API: http://localhost:5000/api")
+        log.info("Health Check: http://localhost:5000/health")
+        log.info("Press Ctrl+C to stop the server")
+        log.warning("Development server only; use serve.py in production")
         
         try:
             app.run(
@@ -30,8 +34,8 @@ if __name__ == '__main__':
                 use_reloader=True
             )
         except KeyboardInterrupt:
-            print("\n👋 Server stopped by user")
+            log.info("Server stopped by user")
     else:
-        print("❌ Failed to start application")
-        print("🔍 Please check your MongoDB connection and configuration")
+        log.error("Failed to start application")
+        log.error("Please check your MongoDB connection and configuration")
         sys.exit(1)
\ No newline at end of file
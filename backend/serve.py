@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Production server for the IMTMA Flooring backend (gunicorn).
+
+run.py starts the single-process Werkzeug dev server with the reloader;
+this launcher runs a preforking gunicorn master with settings from Config
+(SERVER_* / DETECTION_*, see config.py). Each process pool has a role:
+
+    all        every route in one pool of gthread workers (small deployments)
+    read       the rest of the API; uvicorn workers serving asgi.py
+               (async public reads, Flask for the rest) or gthread workers
+    detection  booth/hall detection uploads; few sync workers, one request
+               per process, long timeout, recycled often to release memory
+
+For separate pools run one launcher per role and let the reverse proxy send
+DETECTION_PATHS to the detection pool:
+
+    python serve.py --role read --bind 127.0.0.1:5001
+    python serve.py --role detection --bind 127.0.0.1:5002
+
+Graceful reload: `kill -HUP <master pid>` (see SERVER_PIDFILE) starts new
+workers running the current code, then retires the old ones once their
+in-flight requests finish. Settings are resolved when the master starts. With SERVER_PRELOAD the app is imported
+once in the master, so code changes need a binary upgrade instead
+(`kill -USR2`, then `kill -QUIT` the old master).
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Production defaults that must be in place before config.py is imported
+os.environ.setdefault('FLASK_DEBUG', 'false')
+
+from gunicorn.app.base import BaseApplication
+from config import Config
+from logs import init_logging
+
+log = logging.getLogger('serve')
+
+ROLES = ('all', 'read', 'detection')
+
+# Routes that run model inference or image processing (proxy these to the detection pool)
+DETECTION_PATHS = (
+    '/detect-from-upload',
+    '/detect-hierarchy-from-upload',
+    '/detect-subsections',
+    '/detect-booth-subsections',
+    '/api/admin/floorplans/area-upload',
+    '/api/admin/floorplans/hall-upload/'
+)
+
+
+def _cpu_count() -> int:
+    try:
+        # Respect CPU affinity / container limits where the platform exposes them
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        return multiprocessing.cpu_count()
+
+
+def server_options(role: str, bind: str = None) -> dict:
+    """gunicorn settings for a role, from Config with CPU-derived defaults"""
+    if role not in ROLES:
+        raise ValueError(f"role must be one of: {', '.join(ROLES)}")
+    cpus = _cpu_count()
+
+    options = {
+        'bind': bind or Config.SERVER_BIND,
+        'preload_app': Config.SERVER_PRELOAD,
+        'keepalive': Config.SERVER_KEEPALIVE,
+        'timeout': Config.SERVER_TIMEOUT,
+        'graceful_timeout': Config.SERVER_GRACEFUL_TIMEOUT,
+        'max_requests': Config.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': Config.SERVER_MAX_REQUESTS_JITTER,
+        'proc_name': f'imtma-flooring-{role}',
+        'accesslog': '-',
+        'errorlog': '-'
+    }
+    if Config.SERVER_PIDFILE:
+        options['pidfile'] = Config.SERVER_PIDFILE
+    if os.path.isdir('/dev/shm'):
+        # Worker heartbeats on tmpfs, so a slow disk can't make the master kill healthy workers
+        options['worker_tmp_dir'] = '/dev/shm'
+
+    if role == 'detection':
+        options.update({
+            'worker_class': 'sync',
+            'workers': Config.DETECTION_WORKERS or max(1, cpus // 2),
+            'threads': 1,
+            'timeout': Config.DETECTION_TIMEOUT,
+            'max_requests': Config.DETECTION_MAX_REQUESTS,
+            'max_requests_jitter': max(1, Config.DETECTION_MAX_REQUESTS // 10)
+        })
+    elif role == 'read' and Config.SERVER_READ_WORKER_CLASS == 'asgi':
+        # One event loop per core carries the concurrency; no threads needed
+        options.update({
+            'worker_class': 'uvicorn.workers.UvicornWorker',
+            'workers': Config.SERVER_WORKERS or cpus
+        })
+    else:
+        options.update({
+            'worker_class': 'gthread',
+            'workers': Config.SERVER_WORKERS or 2 * cpus + 1,
+            'threads': Config.SERVER_THREADS or 4
+        })
+        if role == 'all':
+            # Detection requests share this pool, so they need its timeout
+            options['timeout'] = max(Config.SERVER_TIMEOUT, Config.DETECTION_TIMEOUT)
+    return options
+
+
+class ProductionServer(BaseApplication):
+    """Embedded gunicorn application; workers import the app themselves unless preloaded"""
+
+    def __init__(self, role: str, options: dict):
+        self.role = role
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('on_reload', _on_reload)
+        self.cfg.set('child_exit', _child_exit)
+
+    def load(self):
+        if self.options['worker_class'].startswith('uvicorn'):
+            from asgi import app
+            return app
+
+        from app import create_app
+        return create_app()
+
+
+def _on_reload(arbiter):
+    arbiter.log.info('🔄 Reload requested, replacing workers gracefully')
+
+
+def _child_exit(server, worker):
+    # Drop the live gauges (in-flight requests) of the exited worker
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def prepare_metrics_dir(role: str) -> str:
+    """
+    Directory where this pool's workers share metrics (one per launcher).
+    Must be set before the app, and so prometheus_client, is imported.
+    Emptied first: samples of a previous run would be added to this one's.
+    """
+    default = os.path.join(tempfile.gettempdir(), f'imtma-flooring-metrics-{role}')
+    metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', default)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    return metrics_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--role', default=Config.SERVER_ROLE, choices=ROLES)
+    parser.add_argument('--bind', help=f'address to listen on (default SERVER_BIND, {Config.SERVER_BIND})')
+    parser.add_argument('--print-config', action='store_true', help='print the resolved settings and exit')
+    args = parser.parse_args()
+
+    options = server_options(args.role, args.bind)
+    if args.print_config:
+        for key, value in sorted(options.items()):
+            print(f'{key} = {value}')
+        if args.role != 'all':
+            print(f"detection paths = {', '.join(DETECTION_PATHS)}")
+        return
+
+    init_logging()
+    prepare_metrics_dir(args.role)
+    log.info("Starting IMTMA Flooring Backend (%s) on %s: %s x %s",
+             args.role, options['bind'], options['workers'], options['worker_class'])
+    ProductionServer(args.role, options).run()
+
+
+if __name__ == '__main__':
+    main()
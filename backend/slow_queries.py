@@ -0,0 +1,281 @@
+"""
+Slow-query log.
+
+A command listener on the shared client records every MongoDB command that
+takes SLOW_QUERY_MS or longer into `slow_queries`, a capped collection
+(migration 5), so the log keeps the most recent SLOW_QUERY_LOG_MB and never
+needs cleaning up. An entry has the command, collection, duration, the
+route and request id that sent it, and the normalized query shape of
+query_audit.py (values replaced by their types; the values themselves are
+never stored):
+
+    {ts, database, collection, command, description: 'find floorplans {user_id}',
+     shape, shape_id, duration_ms, route, request_id, failed,
+     explain: {used_index, indexes, collection_scan, docs_examined, keys_examined, returned}}
+
+For a SLOW_QUERY_EXPLAIN_RATE fraction of slow reads (find, aggregate,
+count, distinct), the query is explained with executionStats, which says
+whether it used an index and how many documents it examined to return how
+many. The listener only queues the entry: a writer thread runs the explain
+and inserts the entries, off the request, and drops entries when it falls
+behind. Until migration 5 has made the collection capped, the writer drops
+entries instead of creating an ordinary collection that would grow without
+limit. Admins read the log at:
+
+    GET /api/admin/slow-queries          latest entries (?collection=, ?route=, ?limit=)
+    GET /api/admin/slow-queries/shapes   entries grouped by query shape, slowest first
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from flask import g, has_request_context, jsonify, request
+from pymongo import DESCENDING, monitoring
+from config import Config
+from query_audit import describe_command, query_shape
+
+log = logging.getLogger(__name__)
+
+SLOW_QUERIES_COLLECTION = 'slow_queries'
+
+# Read commands that `explain` can run without side effects
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+_SKIPPED_COMMANDS = {'explain', 'getMore', 'killCursors', 'hello', 'isMaster', 'ping', 'endSessions'}
+_SESSION_FIELDS = {'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber'}
+
+
+def create_slow_query_log(db):
+    """The capped collection of the slow-query log (converts an uncapped one, a no-op if capped)"""
+    size = Config.SLOW_QUERY_LOG_MB * 1024 * 1024
+    if SLOW_QUERIES_COLLECTION not in db.list_collection_names():
+        db.create_collection(SLOW_QUERIES_COLLECTION, capped=True, size=size)
+    elif not db[SLOW_QUERIES_COLLECTION].options().get('capped'):
+        # Created as an ordinary collection by an insert before the migration ran
+        db.command('convertToCapped', SLOW_QUERIES_COLLECTION, size=size)
+
+
+def explain_summary(explain: Dict) -> Dict:
+    """Index use and documents examined, from an executionStats explain of any command"""
+    indexes, scans = set(), [0]
+    stats = {}
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('stage') == 'IXSCAN' and node.get('indexName'):
+                indexes.add(node['indexName'])
+            if node.get('stage') == 'COLLSCAN':
+                scans[0] += 1
+            if 'executionStats' in node and not stats:
+                stats.update(node['executionStats'])
+            for key, value in node.items():
+                if key not in ('rejectedPlans', 'allPlansExecution'):
+                    walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain)
+    return {
+        'used_index': bool(indexes),
+        'indexes': sorted(indexes),
+        'collection_scan': scans[0] > 0,
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'returned': stats.get('nReturned')
+    }
+
+
+class SlowQueryLog:
+    """Writes the slow-query entries handed to it from a writer thread"""
+
+    CAPPED_RECHECK_SECONDS = 60
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._capped = False
+        self._capped_checked_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # A forked worker inherits the queue but not the writer thread
+                self._queue = queue.Queue(self.maxsize)
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def add(self, entry: Dict, explain: Optional[Dict] = None) -> None:
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((entry, explain))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        from database import get_client  # database.py imports this module
+        while True:
+            entry, command = self._queue.get()
+            try:
+                self._write(get_client(), entry, command)
+            except Exception as e:  # keep the writer alive for the next entry
+                log.warning("Could not record slow query: %s", e)
+
+    def _is_capped(self, collection) -> bool:
+        """Whether the log collection is capped; rechecked every CAPPED_RECHECK_SECONDS until it is"""
+        if self._capped:
+            return True
+        checked_at = self._capped_checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.CAPPED_RECHECK_SECONDS:
+            return False
+        self._capped = bool(collection.options().get('capped'))
+        self._capped_checked_at = time.monotonic()
+        if not self._capped:
+            log.warning("%s is not capped; slow queries are not recorded until `migrate.py apply` runs",
+                        SLOW_QUERIES_COLLECTION)
+        return self._capped
+
+    def _write(self, client, entry: Dict, command: Optional[Dict]) -> None:
+        collection = client.get_default_database()[SLOW_QUERIES_COLLECTION]
+        if not self._is_capped(collection):
+            # An insert would create an uncapped collection that grows without limit
+            self.dropped += 1
+            return
+        if command is not None:
+            try:
+                entry['explain'] = explain_summary(
+                    client[entry['database']].command('explain', command, verbosity='executionStats'))
+            except Exception as e:
+                entry['explain'] = {'error': str(e)}
+        collection.insert_one(entry)
+
+
+slow_query_log = SlowQueryLog(Config.SLOW_QUERY_QUEUE_SIZE)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Hands commands slower than SLOW_QUERY_MS to the slow-query log"""
+
+    def __init__(self):
+        self._started = {}
+
+    def started(self, event):
+        if event.command_name in _SKIPPED_COMMANDS or event.command.get(event.command_name) == SLOW_QUERIES_COLLECTION:
+            return
+        route = request_id = None
+        if has_request_context():
+            route, request_id = request.endpoint, g.get('request_id')
+        self._started[(event.connection_id, event.request_id)] = (event.command, route, request_id)
+
+    def _finished(self, event, failed: bool):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < Config.SLOW_QUERY_MS * 1000:
+            return
+        command, route, request_id = started
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        shape = json.dumps(query_shape(command), sort_keys=True)
+        entry = {
+            'ts': datetime.utcnow(),
+            'database': event.database_name,
+            'collection': collection,
+            'command': event.command_name,
+            'description': describe_command(event.command_name, collection, command),
+            'shape': shape,
+            'shape_id': hashlib.sha1(f'{event.command_name} {collection} {shape}'.encode()).hexdigest()[:16],
+            'duration_ms': round(event.duration_micros / 1000, 1),
+            'route': route,
+            'request_id': request_id,
+            'failed': failed
+        }
+        explain = None
+        if (not failed and event.command_name in EXPLAINABLE_COMMANDS
+                and random.random() < Config.SLOW_QUERY_EXPLAIN_RATE):
+            explain = {k: v for k, v in command.items() if k not in _SESSION_FIELDS}
+        slow_query_log.add(entry, explain)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+
+slow_query_listener = SlowQueryListener()
+
+
+def _entry(doc: Dict) -> Dict:
+    doc['id'] = str(doc.pop('_id'))
+    return doc
+
+
+def init_slow_query_log(app):
+    """The admin endpoints of the slow-query log (no-op when SLOW_QUERY_LOG_ENABLED is off)"""
+    if not Config.SLOW_QUERY_LOG_ENABLED:
+        return
+    # database.py imports this module for the listener, and auth.py imports database.py
+    from auth import admin_required
+    from database import get_database
+
+    @app.route('/api/admin/slow-queries')
+    @admin_required
+    def list_slow_queries():
+        query = {}
+        for field in ('collection', 'route', 'shape_id'):
+            if request.args.get(field):
+                query[field] = request.args[field]
+        try:
+            limit = min(int(request.args.get('limit', 100)), 1000)
+        except ValueError:
+            return jsonify({'message': 'Invalid limit'}), 400
+        try:
+            # Newest first: a capped collection keeps insertion order
+            cursor = get_database()[SLOW_QUERIES_COLLECTION].find(query).sort('$natural', DESCENDING).limit(limit)
+            return jsonify({'slow_queries': [_entry(doc) for doc in cursor]}), 200
+        except Exception as e:
+            return jsonify({'message': 'Failed to read slow queries', 'error': str(e)}), 500
+
+    @app.route('/api/admin/slow-queries/shapes')
+    @admin_required
+    def slow_query_shapes():
+        pipeline: List[Dict] = [
+            {'$group': {
+                '_id': '$shape_id',
+                'description': {'$first': '$description'},
+                'collection': {'$first': '$collection'},
+                'shape': {'$first': '$shape'},
+                'routes': {'$addToSet': '$route'},
+                'count': {'$sum': 1},
+                'avg_ms': {'$avg': '$duration_ms'},
+                'max_ms': {'$max': '$duration_ms'},
+                'last_seen': {'$max': '$ts'},
+                'explained': {'$sum': {'$cond': [{'$ifNull': ['$explain', False]}, 1, 0]}},
+                'collection_scans': {'$sum': {'$cond': ['$explain.collection_scan', 1, 0]}},
+                'max_docs_examined': {'$max': '$explain.docs_examined'}
+            }},
+            {'$sort': {'max_ms': -1}},
+            {'$limit': 200}
+        ]
+        try:
+            shapes = list(get_database()[SLOW_QUERIES_COLLECTION].aggregate(pipeline))
+        except Exception as e:
+            return jsonify({'message': 'Failed to read slow queries', 'error': str(e)}), 500
+        for shape in shapes:
+            shape['shape_id'] = shape.pop('_id')
+            shape['avg_ms'] = round(shape['avg_ms'], 1)
+        return jsonify({'shapes': shapes}), 200
@@ -0,0 +1,154 @@
+"""
+Viewport (bounding-box) element queries.
+
+Inline floor plans are served from an in-process uniform grid index over the
+element rectangles. The index is cached per worker and keyed by
+(floorplan_id, version), so it is rebuilt only when the plan changes.
+Chunked floor plans (see element_store) are narrowed down with the stored
+chunk bounds first, so only the chunks overlapping the viewport are read.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from element_store import ELEMENT_CHUNKS_COLLECTION, element_bounds, element_layer, is_chunked
+
+Rect = Tuple[float, float, float, float]
+
+# Fields kept at low zoom: geometry and booth status only, no labels or styling
+LOD_MINIMAL_FIELDS = ('id', 'type', 'x', 'y', 'width', 'height', 'rotation', 'layer', 'status')
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def parse_bbox(value: str) -> Rect:
+    """Parse "x0,y0,x1,y1" into a normalized rectangle"""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+        raise ValueError('bbox must be four numbers: x0,y0,x1,y1')
+    x0, y0, x1, y1 = parts
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+def rects_intersect(a: Rect, b: Rect) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class GridIndex:
+    """Uniform grid over element rectangles; each element is registered in every cell it touches"""
+
+    def __init__(self, elements: List[Dict], cell_size: int = None):
+        self.cell_size = cell_size or Config.SPATIAL_INDEX_CELL_SIZE
+        self.elements = elements
+        self.bounds = [element_bounds(element) for element in elements]
+        self.cells = {}
+        for position, (x0, y0, x1, y1) in enumerate(self.bounds):
+            for cell in self._cells_for(x0, y0, x1, y1):
+                self.cells.setdefault(cell, []).append(position)
+        self.extent = (
+            min(b[0] for b in self.bounds), min(b[1] for b in self.bounds),
+            max(b[2] for b in self.bounds), max(b[3] for b in self.bounds)
+        ) if self.bounds else None
+
+    def _cells_for(self, x0, y0, x1, y1):
+        size = self.cell_size
+        for cx in range(int(math.floor(x0 / size)), int(math.floor(x1 / size)) + 1):
+            for cy in range(int(math.floor(y0 / size)), int(math.floor(y1 / size)) + 1):
+                yield cx, cy
+
+    def query(self, bbox: Rect) -> List[Dict]:
+        """Elements intersecting bbox, in their original order"""
+        if self.extent is None or not rects_intersect(bbox, self.extent):
+            return []
+        # Clamp the viewport to the populated area so huge boxes don't walk empty cells
+        clamped = (max(bbox[0], self.extent[0]), max(bbox[1], self.extent[1]),
+                   min(bbox[2], self.extent[2]), min(bbox[3], self.extent[3]))
+
+        hits = set()
+        for cell in self._cells_for(*clamped):
+            for position in self.cells.get(cell, ()):
+                if position not in hits and rects_intersect(self.bounds[position], bbox):
+                    hits.add(position)
+        return [self.elements[position] for position in sorted(hits)]
+
+
+def _cached_index(key, loader) -> GridIndex:
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+
+    index = GridIndex(loader())
+
+    with _index_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > max(1, Config.SPATIAL_INDEX_CACHE_SIZE):
+            _index_cache.popitem(last=False)
+    return index
+
+
+def viewport_elements(db, floorplan: Dict, bbox: Rect, layer: int = None) -> List[Dict]:
+    """
+    Elements of a floor plan intersecting bbox.
+
+    `floorplan` may be a projected document: for inline plans the elements are
+    only read from the database when the cached index is missing or stale.
+    """
+    if is_chunked(floorplan):
+        collection = db[ELEMENT_CHUNKS_COLLECTION]
+        query = {'floorplan_id': floorplan['_id'], 'chunk_version': floorplan.get('chunk_version')}
+        if layer is not None:
+            query['layer'] = layer
+
+        chunk_ids = []
+        for chunk in collection.find(query, projection={'bounds': 1}):
+            bounds = chunk.get('bounds') or {}
+            chunk_rect = (bounds.get('x', 0), bounds.get('y', 0),
+                          bounds.get('x', 0) + bounds.get('width', 0),
+                          bounds.get('y', 0) + bounds.get('height', 0))
+            if rects_intersect(chunk_rect, bbox):
+                chunk_ids.append(chunk['_id'])
+        if not chunk_ids:
+            return []
+
+        positioned = []
+        for chunk in collection.find({'_id': {'$in': chunk_ids}}, projection={'positions': 1, 'elements': 1}):
+            for position, element in zip(chunk.get('positions', []), chunk.get('elements', [])):
+                if rects_intersect(element_bounds(element), bbox):
+                    positioned.append((position, element))
+        positioned.sort(key=lambda item: item[0])
+        return [element for _, element in positioned]
+
+    def load():
+        elements = (floorplan.get('state') or {}).get('elements')
+        if elements is None:
+            document = db.floorplans.find_one({'_id': floorplan['_id']}, projection={'state.elements': 1})
+            elements = ((document or {}).get('state') or {}).get('elements', [])
+        return elements or []
+
+    index = _cached_index((str(floorplan['_id']), floorplan.get('version')), load)
+    elements = index.query(bbox)
+    if layer is not None:
+        elements = [element for element in elements if element_layer(element) == layer]
+    return elements
+
+
+def resolve_lod(zoom: Optional[float], lod: str = None) -> str:
+    """'minimal' below LOD_MIN_ZOOM unless an explicit ?lod= is given"""
+    if lod in ('full', 'minimal'):
+        return lod
+    if zoom is not None and zoom < Config.LOD_MIN_ZOOM:
+        return 'minimal'
+    return 'full'
+
+
+def apply_lod(elements: List[Dict], lod: str) -> List[Dict]:
+    """Strip labels and styling from elements for low-zoom rendering"""
+    if lod != 'minimal':
+        return elements
+    return [{key: element[key] for key in LOD_MINIMAL_FIELDS if key in element} for element in elements]
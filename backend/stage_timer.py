@@ -0,0 +1,220 @@
+"""
+Per-stage timing and memory of the detection pipeline.
+
+A StageTimer covers one detection run. The detectors mark their steps with
+stage(name); nested stages are named parent.child (booths.color_masks).
+Outside a timer, stage() only yields a throwaway record, so scripts and
+benchmarks that call the detectors directly pay nothing for it.
+
+    with StageTimer('opencv') as timer:
+        with stage('booths') as booths:
+            rects = detect_rects_by_color(path)
+            booths.candidates = len(rects)
+    summary = timer.summary()
+
+Every stage records its wall time and the change in resident memory of the
+process, and is observed in the detection_stage_duration_seconds histogram
+(metrics.py). With DETECTION_TRACE_MEMORY on, tracemalloc also gives the
+peak of Python and NumPy allocations during each stage (OpenCV's own buffers
+aren't traced). Tracing slows allocation-heavy code down and is process
+wide, so concurrent requests in a worker count each other's allocations:
+turn it on while investigating, not in production.
+
+In a request, init_server_timing() adds the stages of every timer of the
+request to the response as a Server-Timing header, which browser devtools
+show in the network panel's Timing tab. With tracing on (tracing.py) every
+stage is also a span, detection.<name>, with the same numbers as attributes.
+"""
+
+import contextvars
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from flask import g, has_request_context
+from config import Config
+from metrics import observe_detection
+from tracing import span
+
+MB = 1024 * 1024
+
+_current_timer = contextvars.ContextVar('stage_timer', default=None)
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):  # pragma: no cover - platform specific
+    _PAGE_SIZE = 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux only; None elsewhere)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """High-water mark of the process's resident set size"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _mb(n: Optional[int]) -> Optional[float]:
+    return None if n is None else round(n / MB, 2)
+
+
+class Stage:
+    """One timed stage; set `candidates` to record how many results it produced"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.candidates: Optional[int] = None
+        self.rss_delta: Optional[int] = None
+        self.traced_peak: Optional[int] = None
+        self._rss_start: Optional[int] = None
+        self._traced_start = 0
+        self._traced_max = 0
+
+    def as_dict(self) -> Dict:
+        stage = {'name': self.name, 'ms': round(self.seconds * 1000, 2)}
+        if self.rss_delta is not None:
+            stage['rss_delta_mb'] = _mb(self.rss_delta)
+        if self.traced_peak is not None:
+            stage['traced_peak_mb'] = _mb(self.traced_peak)
+        if self.candidates is not None:
+            stage['candidates'] = self.candidates
+        return stage
+
+
+class StageTimer:
+    """Stages of one detection run, in the order they started"""
+
+    def __init__(self, detector: str, trace_memory: bool = None):
+        self.detector = detector
+        self.trace_memory = Config.DETECTION_TRACE_MEMORY if trace_memory is None else trace_memory
+        self.stages: List[Stage] = []
+        self.seconds = 0.0
+        self._open: List[Stage] = []
+        self._started = None
+        self._token = None
+        self._peak_rss_start = None
+        self._peak_rss = None
+        self._owns_tracing = False
+
+    def __enter__(self):
+        self._token = _current_timer.set(self)
+        self._peak_rss_start = _peak_rss_bytes()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        if has_request_context():
+            g.setdefault('stage_timers', []).append(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        self._peak_rss = _peak_rss_bytes()
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+        _current_timer.reset(self._token)
+        return False
+
+    def _tracing(self) -> bool:
+        return self.trace_memory and tracemalloc.is_tracing()
+
+    def _fold_traced_peak(self):
+        """Credit the traced peak since the last reset to every open stage, then reset it"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_stage in self._open:
+            open_stage._traced_max = max(open_stage._traced_max, peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name: str):
+        if self._open:
+            name = f'{self._open[-1].name}.{name}'
+        current = Stage(name)
+        self.stages.append(current)
+        tracing = self._tracing()
+        if tracing:
+            self._fold_traced_peak()
+            current._traced_start = current._traced_max = tracemalloc.get_traced_memory()[0]
+        self._open.append(current)
+        current._rss_start = _rss_bytes()
+        started = time.perf_counter()
+        with span(f'detection.{name}', detector=self.detector) as stage_span:
+            try:
+                yield current
+            finally:
+                current.seconds = time.perf_counter() - started
+                rss = _rss_bytes()
+                if rss is not None and current._rss_start is not None:
+                    current.rss_delta = rss - current._rss_start
+                if tracing and tracemalloc.is_tracing():
+                    self._fold_traced_peak()
+                    current.traced_peak = current._traced_max - current._traced_start
+                self._open.pop()
+                observe_detection(self.detector, name, current.seconds, current.candidates)
+                if stage_span.recording:
+                    stage_span.set_attributes({
+                        'detection.candidates': current.candidates,
+                        'detection.rss_delta_bytes': current.rss_delta,
+                        'detection.traced_peak_bytes': current.traced_peak
+                    })
+
+    def summary(self) -> Dict:
+        """Stage breakdown for detection_summary"""
+        summary = {
+            'detector': self.detector,
+            'total_ms': round(self.seconds * 1000, 2),
+            'stages': [s.as_dict() for s in self.stages]
+        }
+        if self._peak_rss is not None:
+            summary['peak_rss_mb'] = _mb(self._peak_rss)
+            summary['peak_rss_growth_mb'] = _mb(self._peak_rss - self._peak_rss_start)
+        return summary
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: the whole run, then each stage"""
+        metrics = [f'detection;desc="{self.detector}";dur={self.seconds * 1000:.1f}']
+        metrics.extend(f'{s.name};dur={s.seconds * 1000:.1f}' for s in self.stages)
+        return ', '.join(metrics)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the active StageTimer; a no-op record without one"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield Stage(name)
+        return
+    with timer.stage(name) as current:
+        yield current
+
+
+def init_server_timing(app):
+    """Send the stages of the request's timers as a Server-Timing header"""
+    if not Config.SERVER_TIMING_ENABLED:
+        return
+
+    @app.after_request
+    def add_server_timing(response):
+        timers = g.pop('stage_timers', None)
+        if timers:
+            response.headers['Server-Timing'] = ', '.join(t.server_timing() for t in timers)
+        return response
@@ -1,7 +1,10 @@
 import cv2
+import logging
 import numpy as np
 from typing import List, Dict, Any
 
+log = logging.getLogger(__name__)
+
 def detect_blue_divisions_in_booth(image_path: str, booth_bounds: Dict) -> List[Dict]:
     """
     Detect blue line divisions within a specific booth area.
@@ -70,7 +73,7 @@ def detect_blue_divisions_in_booth(image_path: str, booth_bounds: Dict) -> List[
         return subsections
         
     except Exception as e:
-        print(f"Error detecting blue divisions: {e}")
+        log.exception("Error detecting blue divisions: %s", e)
         return []
 
 def create_subsection_ids(parent_booth_id: str, count: int) -> List[str]:
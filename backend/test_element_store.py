@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Chunked element storage test for IMTMA Flooring Backend
+Writes new states of a chunked floor plan step by step the way the floor
+plan routes do (write_state, then the document update, then
+drop_stale_chunks) and reads the plan between the steps. Fails if a reader
+ever finds the elements missing or a half-finished write loses the
+current generation.
+
+Needs a MongoDB server (MONGODB_URI); the scratch database
+<default database>_element_store is dropped afterwards.
+
+    cd backend
+    python test_element_store.py      (or: python -m pytest test_element_store.py)
+"""
+
+import os
+import sys
+from bson import ObjectId
+from pymongo import MongoClient
+
+from element_store import (
+    ELEMENT_CHUNKS_COLLECTION, STORAGE_CHUNKED, STORAGE_INLINE,
+    write_state, attach_elements, drop_stale_chunks
+)
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring')
+
+
+def booths(count, prefix):
+    return [{'id': f'{prefix}{i}', 'type': 'booth', 'x': i * 120, 'y': (i % 7) * 90, 'width': 40, 'height': 40}
+            for i in range(count)]
+
+
+def read_elements(db, floorplan_id):
+    """Elements as a reader of the stored floor plan sees them"""
+    floorplan = attach_elements(db, db.floorplans.find_one({'_id': floorplan_id}))
+    return [element['id'] for element in floorplan['state'].get('elements', [])]
+
+
+def chunk_versions(db, floorplan_id):
+    return sorted(set(db[ELEMENT_CHUNKS_COLLECTION].distinct('chunk_version', {'floorplan_id': floorplan_id})))
+
+
+def save(db, floorplan_id, version, elements, storage=STORAGE_CHUNKED):
+    """The document update of a state write, after write_state"""
+    fields = write_state(db, floorplan_id, version, {'elements': elements}, storage)
+    return lambda: db.floorplans.update_one({'_id': floorplan_id}, {'$set': dict(fields, version=version)})
+
+
+def test_readers_never_see_missing_chunks():
+    """Readers between write_state and the document update still get the current elements"""
+    print("🔍 Testing chunk generations...")
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    db = client[f'{client.get_default_database().name}_element_store']
+    client.drop_database(db.name)
+    try:
+        floorplan_id = ObjectId()
+        first, second, third = booths(300, 'a'), booths(250, 'b'), booths(10, 'c')
+        fields = write_state(db, floorplan_id, 1, {'elements': first}, STORAGE_CHUNKED)
+        db.floorplans.insert_one(dict(fields, _id=floorplan_id, version=1))
+        assert read_elements(db, floorplan_id) == [e['id'] for e in first]
+
+        # New generation written, document not yet updated
+        update = save(db, floorplan_id, 2, second)
+        assert read_elements(db, floorplan_id) == [e['id'] for e in first], 'old generation gone before the switch'
+        assert chunk_versions(db, floorplan_id) == [1, 2]
+
+        update()
+        assert read_elements(db, floorplan_id) == [e['id'] for e in second]
+        drop_stale_chunks(db, floorplan_id)
+        assert chunk_versions(db, floorplan_id) == [2]
+        assert read_elements(db, floorplan_id) == [e['id'] for e in second]
+        print("   ✅ chunked write")
+
+        # A write that fails before the document update leaves the plan readable
+        save(db, floorplan_id, 3, third)
+        drop_stale_chunks(db, floorplan_id)
+        assert read_elements(db, floorplan_id) == [e['id'] for e in second], 'failed write lost the current chunks'
+        # ...and its retry replaces the leftovers of the same version
+        save(db, floorplan_id, 3, third)()
+        drop_stale_chunks(db, floorplan_id)
+        assert read_elements(db, floorplan_id) == [e['id'] for e in third]
+        assert chunk_versions(db, floorplan_id) == [3]
+        print("   ✅ failed write")
+
+        # Switching to inline storage keeps the chunks until the document is inline
+        update = save(db, floorplan_id, 4, first, STORAGE_INLINE)
+        assert read_elements(db, floorplan_id) == [e['id'] for e in third], 'chunks dropped before the switch'
+        update()
+        drop_stale_chunks(db, floorplan_id)
+        assert read_elements(db, floorplan_id) == [e['id'] for e in first]
+        assert chunk_versions(db, floorplan_id) == []
+        print("   ✅ switch to inline")
+    finally:
+        client.drop_database(db.name)
+
+if __name__ == "__main__":
+    try:
+        test_readers_never_see_missing_chunks()
+        print("✅ test_readers_never_see_missing_chunks passed")
+    except AssertionError as e:
+        print(f"❌ test_readers_never_see_missing_chunks failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+JSON provider test for IMTMA Flooring Backend
+Pins the wire format of FastJSONProvider (json_provider.py) to the one of
+Flask's DefaultJSONProvider, which the API used before: dates and
+datetimes are HTTP dates, naive values UTC. Checks the orjson path and the
+stdlib fallback. No server or database is needed.
+
+    cd backend
+    python test_json_provider.py      (or: python -m pytest test_json_provider.py)
+"""
+
+import json
+import sys
+from datetime import date, datetime, timedelta, timezone
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from json_provider import FastJSONProvider
+
+DATES = {
+    'naive': datetime(2026, 10, 18, 23, 50, 35, 123456),
+    'utc': datetime(2026, 10, 18, 23, 50, 35, tzinfo=timezone.utc),
+    'offset': datetime(2026, 10, 19, 5, 20, 35, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    'date': date(2026, 2, 1),
+    'nested': {'elements': [{'id': 'b1', 'updated': datetime(2026, 1, 1)}]}
+}
+
+
+def test_datetimes_are_http_dates():
+    """Datetimes and dates are encoded exactly like Flask's default provider does"""
+    print("🔍 Testing datetime format...")
+    app = Flask(__name__)
+    payload = FastJSONProvider(app).loads(FastJSONProvider(app).dumps(DATES))
+    assert payload == json.loads(DefaultJSONProvider(app).dumps(DATES)), payload
+    assert payload['naive'] == 'Sun, 18 Oct 2026 23:50:35 GMT', payload['naive']
+    assert payload['utc'] == payload['offset'] == payload['naive']
+    assert payload['date'] == 'Sun, 01 Feb 2026 00:00:00 GMT', payload['date']
+    assert payload['nested']['elements'][0]['updated'] == 'Thu, 01 Jan 2026 00:00:00 GMT'
+
+
+def test_stdlib_fallback_matches():
+    """Without orjson the provider writes the same values"""
+    print("🔍 Testing stdlib fallback...")
+    app = Flask(__name__)
+    document = dict(DATES, _id=ObjectId('6a5a138aaaaaaaaaaaaaaaaa'))
+    fast = json.loads(FastJSONProvider(app).dumps(document))
+    saved = json_provider.orjson
+    json_provider.orjson = None
+    try:
+        fallback = json.loads(FastJSONProvider(app).dumps(document))
+    finally:
+        json_provider.orjson = saved
+    assert fast == fallback, (fast, fallback)
+    assert fast['_id'] == '6a5a138aaaaaaaaaaaaaaaaa'
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_datetimes_are_http_dates, test_stdlib_fallback_matches):
+        try:
+            test()
+            print(f"✅ {test.__name__} passed")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__} failed: {e}")
+    sys.exit(1 if failed else 0)
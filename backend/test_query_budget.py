@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Query budget test for IMTMA Flooring Backend
+Runs the hot read routes through the Flask test client against a scratch
+database with the query audit on (query_audit.py). Fails if a route sends
+more database commands than its budget, or sends one query shape more than
+once (a query per item, N+1).
+
+Needs a MongoDB server (MONGODB_URI); the scratch database
+<default database>_query_budget is dropped afterwards, and the settings
+the test changes are restored.
+
+    cd backend
+    python test_query_budget.py      (or: python -m pytest test_query_budget.py)
+"""
+
+import os
+import sys
+from pymongo import MongoClient, uri_parser
+
+from config import Config
+from database import close_client
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring')
+EVENT_ID = 'budget-event'
+ITEMS = 5
+
+
+def scratch_uri(uri: str) -> str:
+    name = uri_parser.parse_uri(uri)['database'] or 'imtma_flooring'
+    if f'/{name}' in uri:
+        return uri.replace(f'/{name}', f'/{name}_query_budget', 1)
+    return uri.rstrip('/') + f'/{name}_query_budget'
+
+
+def seed(client):
+    """ITEMS published floor plans in ITEMS halls of one event, created through the API"""
+    r = client.post('/api/auth/register', json={
+        'username': 'budget-admin', 'email': 'budget-admin@example.com', 'password': 'budget', 'role': 'admin'
+    })
+    headers = {'Authorization': f"Bearer {r.get_json()['access_token']}"}
+    floorplan_ids = []
+    for i in range(ITEMS):
+        r = client.post('/api/floorplans', headers=headers, json={
+            'name': f'Budget plan {i}', 'event_id': EVENT_ID, 'status': 'published',
+            'state': {'elements': [{'id': f'b{j}', 'type': 'booth', 'x': j * 50, 'y': 0, 'width': 40, 'height': 40}
+                                   for j in range(10)]}
+        })
+        assert r.status_code == 201, r.get_json()
+        floorplan_ids.append(r.get_json()['floorplan']['id'])
+    hall_ids = []
+    for i, floorplan_id in enumerate(floorplan_ids):
+        r = client.post('/api/halls', headers=headers, json={
+            'name': f'Budget hall {i}', 'event_id': EVENT_ID, 'polygon': [[0, 0], [100, 0], [100, 100]],
+            'floorplan_ids': [floorplan_id]
+        })
+        assert r.status_code == 201, r.get_json()
+        hall_ids.append(r.get_json()['hall']['id'])
+    return headers, floorplan_ids[0], hall_ids[0]
+
+
+def budgets(floorplan_id, hall_id):
+    """(endpoint, path, authenticated, most database commands) for each hot read route"""
+    return [
+        ('floorplan.get_floorplans', '/api/floorplans?limit=50', True, 3),
+        ('floorplan.get_floorplan', f'/api/floorplans/{floorplan_id}', True, 3),
+        ('floorplan.get_public_floorplans', f'/api/public/floorplans?event_id={EVENT_ID}', False, 2),
+        ('floorplan.get_public_floorplan', f'/api/public/floorplans/{floorplan_id}', False, 2),
+        ('hall.list_halls_admin', f'/api/halls?event_id={EVENT_ID}', True, 1),
+        ('hall.list_public_halls', f'/api/public/halls?event_id={EVENT_ID}', False, 1),
+        ('hall.list_public_hall_floorplans', f'/api/public/halls/{hall_id}/floorplans', False, 1),
+        ('hall.get_public_event_hierarchy', f'/api/public/events/{EVENT_ID}/hierarchy', False, 2),
+        ('hierarchical.get_area_plans', '/api/admin/area-plans', True, 2),
+    ]
+
+
+def test_routes_within_query_budget():
+    """Hot read routes stay within their command budgets and send no query per item"""
+    print("🔍 Testing query budgets...")
+    saved = {name: getattr(Config, name)
+             for name in ('MONGODB_URI', 'QUERY_AUDIT_ENABLED', 'QUERY_BUDGET_STRICT', 'QUERY_BUDGETS')}
+    Config.MONGODB_URI = scratch_uri(MONGODB_URI)
+    Config.QUERY_AUDIT_ENABLED = True
+    Config.QUERY_BUDGET_STRICT = True
+    # The shared client picks its URI and listeners when it connects
+    close_client()
+
+    mongo = MongoClient(Config.MONGODB_URI, serverSelectionTimeoutMS=5000)
+    database = mongo.get_default_database().name
+    try:
+        mongo.drop_database(database)
+        from migrations import apply_migrations
+        apply_migrations(mongo[database], log=lambda message: None)
+
+        from app import create_app
+        client = create_app().test_client()
+        headers, floorplan_id, hall_id = seed(client)
+
+        routes = budgets(floorplan_id, hall_id)
+        Config.QUERY_BUDGETS = ','.join(f'{endpoint}={budget}' for endpoint, _, _, budget in routes)
+        failures = []
+        for endpoint, path, authenticated, budget in routes:
+            r = client.get(path, headers=headers if authenticated else None)
+            queries = r.headers.get('X-DB-Queries')
+            repeated = r.headers.get('X-DB-Repeated-Queries')
+            ok = r.status_code == 200 and not repeated
+            print(f"   {'✅' if ok else '❌'} {endpoint}: {queries} commands (budget {budget})"
+                  + (f", repeated: {repeated}" if repeated else ''))
+            if r.status_code != 200:
+                failures.append(f"{endpoint}: {r.status_code} {(r.get_json() or {}).get('error')}")
+            elif repeated:
+                failures.append(f"{endpoint}: repeated queries {repeated}")
+        assert not failures, 'Query budget failures:\n' + '\n'.join(failures)
+    finally:
+        try:
+            mongo.drop_database(database)
+        finally:
+            for name, value in saved.items():
+                setattr(Config, name, value)
+            close_client()
+
+if __name__ == "__main__":
+    try:
+        test_routes_within_query_budget()
+        print("✅ test_routes_within_query_budget passed")
+    except AssertionError as e:
+        print(f"❌ test_routes_within_query_budget failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Query plan check for IMTMA Flooring Backend
+Seeds a scratch database, applies the migrations and explains the hot-path
+queries of the route modules. Fails if any of them (including the $lookup /
+$unionWith sub-pipelines) scans a whole collection instead of using an index.
+
+Needs a MongoDB server (MONGODB_URI); the scratch database
+<default database>_query_plans is dropped afterwards.
+
+    cd backend
+    python test_query_plans.py      (or: python -m pytest test_query_plans.py)
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import MongoClient
+
+from migrations import apply_migrations
+from element_store import ELEMENT_CHUNKS_COLLECTION, chunk_query
+from read_models import PUBLISHED_FLOORPLANS_COLLECTION
+from revisions import REVISIONS_COLLECTION
+from routes.hall_routes import (
+    HIERARCHY_FIELDS,
+    public_halls_pipeline, public_hall_floorplans_pipeline, event_hierarchy_pipeline
+)
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring')
+EVENT_ID = 'event-1'
+USER_ID = ObjectId()
+STATUSES = ('draft', 'active', 'published', 'archived')
+
+
+def seed(db):
+    """A few events worth of users, halls, plans, revisions and chunks"""
+    now = datetime.utcnow()
+    db.users.insert_many([
+        {'_id': USER_ID if i == 0 else ObjectId(), 'username': f'user{i}', 'email': f'user{i}@example.com',
+         'role': 'admin' if i == 0 else 'user'}
+        for i in range(50)
+    ])
+    floorplans = [{
+        '_id': ObjectId(),
+        'name': f'Plan {i}',
+        'description': 'Seeded plan',
+        'user_id': USER_ID if i % 3 == 0 else ObjectId(),
+        'event_id': f'event-{i % 5}',
+        'status': STATUSES[i % len(STATUSES)],
+        'version': 3,
+        'storage': 'chunked',
+        'chunk_version': 3,
+        'last_modified': now - timedelta(minutes=i),
+        'state': {'elements': []}
+    } for i in range(400)]
+    db.floorplans.insert_many(floorplans)
+    db[PUBLISHED_FLOORPLANS_COLLECTION].insert_many([
+        {'_id': fp['_id'], 'name': fp['name'], 'event_id': fp['event_id'], 'status': 'published',
+         'version': fp['version'], 'last_modified': fp['last_modified']}
+        for fp in floorplans if fp['status'] == 'published'
+    ])
+    db[REVISIONS_COLLECTION].insert_many([
+        {'floorplan_id': fp['_id'], 'version': version, 'kind': 'snapshot' if version == 1 else 'delta'}
+        for fp in floorplans[:100] for version in (1, 2, 3)
+    ])
+    db[ELEMENT_CHUNKS_COLLECTION].insert_many([
+        {'floorplan_id': fp['_id'], 'chunk_version': 3, 'layer': 0, 'tile': f'{tile}:0', 'seq': 0,
+         'count': 0, 'elements': []}
+        for fp in floorplans[:100] for tile in range(4)
+    ])
+
+    area_plans = [{'_id': ObjectId(), 'name': f'Area {i}', 'status': STATUSES[i % len(STATUSES)],
+                   'created_by': str(USER_ID), 'created_at': now - timedelta(hours=i)} for i in range(40)]
+    db.area_floorplans.insert_many(area_plans)
+    halls = [{
+        '_id': ObjectId(),
+        'name': f'Hall {i}',
+        'event_id': f'event-{i % 5}',
+        'public': i % 4 != 0,
+        'floorplan_ids': [fp['_id'] for fp in floorplans[i * 4:i * 4 + 4]],
+        'last_modified': now - timedelta(hours=i)
+    } for i in range(60)]
+    db.halls.insert_many(halls)
+    db.hall_floorplans.insert_many([{
+        'name': f'Hall plan {i}',
+        'hall_id': str(halls[i % len(halls)]['_id']),
+        'area_plan_id': str(area_plans[i % len(area_plans)]['_id']),
+        'status': STATUSES[i % len(STATUSES)],
+        'created_at': now - timedelta(hours=i)
+    } for i in range(240)])
+    return floorplans[0], halls[1]
+
+
+def find(collection, query, sort=None):
+    command = {'find': collection, 'filter': query}
+    if sort:
+        command['sort'] = sort
+    return command
+
+def aggregate(collection, pipeline):
+    return {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}}
+
+def hot_queries(floorplan, hall):
+    """(name, find or aggregate command) for each hot-path query shape of the routes"""
+    hall_id = str(hall['_id'])
+    return [
+        # auth_routes register/login, auth.py
+        ('users by email or username', find('users', {'$or': [{'email': 'user3@example.com'}, {'username': 'user3'}]})),
+        # floorplan_routes GET /floorplans
+        ('floor plans (admin)', find('floorplans', {}, {'last_modified': -1})),
+        ('floor plans (user)', find('floorplans', {'status': {'$in': ['active', 'published']}}, {'last_modified': -1})),
+        ('floor plans of an event', find('floorplans', {'event_id': EVENT_ID}, {'last_modified': -1})),
+        ('floor plan by id', find('floorplans', {'_id': floorplan['_id']})),
+        # dashboard_routes
+        ('dashboard floor plans', find('floorplans', {'user_id': USER_ID}, {'last_modified': -1})),
+        # read_models.rebuild_published_floorplans
+        ('published floor plan ids', find('floorplans', {'status': 'published'})),
+        # floorplan_routes GET /public/floorplans
+        ('public floor plans', find(PUBLISHED_FLOORPLANS_COLLECTION, {'status': 'published'}, {'last_modified': -1})),
+        ('public floor plans of an event', find(PUBLISHED_FLOORPLANS_COLLECTION,
+                                                {'status': 'published', 'event_id': EVENT_ID}, {'last_modified': -1})),
+        # revisions
+        ('revision history', find(REVISIONS_COLLECTION, {'floorplan_id': floorplan['_id']}, {'version': -1})),
+        ('revert snapshot', find(REVISIONS_COLLECTION, {'floorplan_id': floorplan['_id'], 'kind': 'snapshot',
+                                                        'version': {'$lte': 2}}, {'version': -1})),
+        # element_store
+        ('element chunks', find(ELEMENT_CHUNKS_COLLECTION, chunk_query(floorplan),
+                                {'layer': 1, 'tile': 1, 'seq': 1})),
+        # hall_routes
+        ('halls of an event (admin)', find('halls', {'event_id': EVENT_ID}, {'last_modified': -1})),
+        ('public halls', aggregate('halls', public_halls_pipeline(EVENT_ID))),
+        ('public hall floor plans', aggregate('halls', public_hall_floorplans_pipeline(hall_id))),
+        ('event hierarchy', aggregate('halls', event_hierarchy_pipeline(EVENT_ID, HIERARCHY_FIELDS))),
+        # hierarchical_routes
+        ('public area plans', find('area_floorplans', {'status': 'published'}, {'created_at': -1})),
+        ('public hall plans', find('hall_floorplans', {'hall_id': hall_id, 'status': 'published'}, {'created_at': -1})),
+        ('admin hall plans', find('hall_floorplans', {'hall_id': hall_id}, {'created_at': -1})),
+        ('public area plan validators', aggregate('area_floorplans', [
+            {'$match': {'status': 'published'}},
+            {'$group': {'_id': None, 'count': {'$sum': 1}, 'last_modified': {'$max': '$created_at'}}}
+        ])),
+    ]
+
+
+def collection_scans(explain, path='') -> list:
+    """Paths of COLLSCAN stages in an explain result; $lookup stages report theirs as collectionScans"""
+    scans = []
+    if isinstance(explain, dict):
+        if explain.get('stage') == 'COLLSCAN':
+            scans.append(path or 'plan')
+        if explain.get('collectionScans'):
+            scans.append(f"{path}: {explain['collectionScans']} collection scans")
+        for key, value in explain.items():
+            if key not in ('rejectedPlans', 'allPlansExecution'):
+                scans.extend(collection_scans(value, f'{path}.{key}' if path else key))
+    elif isinstance(explain, list):
+        for i, value in enumerate(explain):
+            scans.extend(collection_scans(value, f'{path}[{i}]'))
+    return scans
+
+
+def test_hot_queries_use_indexes():
+    """No hot-path query scans a whole collection on the migrated schema"""
+    print("🔍 Testing hot-path query plans...")
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    db = client[f'{client.get_default_database().name}_query_plans']
+    client.drop_database(db.name)
+    try:
+        apply_migrations(db, log=lambda message: None)
+        floorplan, hall = seed(db)
+
+        failures = []
+        for name, command in hot_queries(floorplan, hall):
+            explain = db.command('explain', command, verbosity='executionStats')
+            scans = collection_scans(explain)
+            print(f"   {'❌' if scans else '✅'} {name}")
+            if scans:
+                failures.append(f"{name}: {', '.join(scans)}")
+        assert not failures, 'Collection scans in hot queries:\n' + '\n'.join(failures)
+    finally:
+        client.drop_database(db.name)
+
+if __name__ == "__main__":
+    try:
+        test_hot_queries_use_indexes()
+        print("✅ test_hot_queries_use_indexes passed")
+    except AssertionError as e:
+        print(f"❌ test_hot_queries_use_indexes failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Revision delta test for IMTMA Flooring Backend
+Round-trips floor plan states through compute_state_delta and
+apply_state_delta (revisions.py): element adds, removals, reorders and
+changes, nested dict changes and elements without usable ids. Then records
+a run of revisions across REVISION_SNAPSHOT_INTERVAL and reconstructs every
+version from its snapshot and deltas, also with revisions missing.
+
+The delta tests need nothing else. The snapshot boundary and gap tests need
+a MongoDB server (MONGODB_URI); the scratch database
+<default database>_revisions is dropped afterwards.
+
+    cd backend
+    python test_revisions.py      (or: python -m pytest test_revisions.py)
+"""
+
+import copy
+import os
+import sys
+from bson import ObjectId
+from pymongo import MongoClient
+
+from config import Config
+from revisions import (
+    REVISIONS_COLLECTION, compute_state_delta, apply_state_delta, record_revision, get_revision_state
+)
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/imtma_flooring')
+
+
+def booth(element_id, x=0, **fields):
+    return dict({'id': element_id, 'type': 'booth', 'x': x, 'y': 0, 'width': 40, 'height': 40}, **fields)
+
+
+BASE_STATE = {
+    'elements': [booth('a', 0), booth('b', 50), booth('c', 100)],
+    'canvasSize': {'width': 1000, 'height': 800},
+    'settings': {'grid': {'size': 10, 'snap': True}, 'units': 'm'},
+    'selectedIds': []
+}
+
+
+def round_trip(old_state, new_state):
+    """The delta between two states, after checking it turns the old one into the new one"""
+    before = copy.deepcopy(old_state)
+    delta = compute_state_delta(old_state, new_state)
+    assert apply_state_delta(old_state, delta) == new_state, f"delta {delta} does not reproduce the new state"
+    assert old_state == before, "apply_state_delta modified its input"
+    return delta
+
+
+def with_elements(elements, **fields):
+    return dict(copy.deepcopy(BASE_STATE), elements=elements, **fields)
+
+
+def test_element_changes_round_trip():
+    """Added, removed, reordered and changed elements are reproduced exactly"""
+    print("🔍 Testing element deltas...")
+    a, b, c = BASE_STATE['elements']
+
+    delta = round_trip(BASE_STATE, copy.deepcopy(BASE_STATE))
+    assert delta == {}, delta
+
+    # Appended elements need no ordering
+    delta = round_trip(BASE_STATE, with_elements([a, b, c, booth('d', 150)]))
+    assert delta == {'elements': {'upsert': [booth('d', 150)]}}, delta
+
+    # Inserted in the middle: the order is stored
+    delta = round_trip(BASE_STATE, with_elements([a, booth('d', 150), b, c]))
+    assert delta['elements']['order'] == ['a', 'd', 'b', 'c'], delta
+
+    delta = round_trip(BASE_STATE, with_elements([a, c]))
+    assert delta == {'elements': {'remove': ['b']}}, delta
+
+    delta = round_trip(BASE_STATE, with_elements([c, a, b]))
+    assert delta == {'elements': {'order': ['c', 'a', 'b']}}, delta
+
+    # Only the changed element is stored
+    delta = round_trip(BASE_STATE, with_elements([a, booth('b', 60), c]))
+    assert delta == {'elements': {'upsert': [booth('b', 60)]}}, delta
+
+    # All at once: change, removal, insertion and a new order
+    round_trip(BASE_STATE, with_elements([booth('e', 5), booth('c', 7, status='sold'), a]))
+    round_trip(BASE_STATE, with_elements([]))
+    round_trip(with_elements([]), BASE_STATE)
+
+
+def test_nested_changes_round_trip():
+    """Changes inside nested dicts of the state and of elements are reproduced exactly"""
+    print("🔍 Testing nested deltas...")
+    a, b, c = BASE_STATE['elements']
+
+    new_state = copy.deepcopy(BASE_STATE)
+    new_state['settings']['grid']['size'] = 20
+    delta = round_trip(BASE_STATE, new_state)
+    assert delta == {'set': {'settings': new_state['settings']}}, delta
+
+    new_state = with_elements([a, booth('b', 50, style={'fill': '#fff', 'border': {'width': 2}}), c])
+    newer_state = with_elements([a, booth('b', 50, style={'fill': '#fff', 'border': {'width': 3}}), c])
+    round_trip(new_state, newer_state)
+
+    # Keys added and removed at the top level
+    new_state = copy.deepcopy(BASE_STATE)
+    del new_state['selectedIds']
+    new_state['layers'] = [{'id': 0, 'visible': True}]
+    delta = round_trip(BASE_STATE, new_state)
+    assert delta == {'set': {'layers': new_state['layers']}, 'unset': ['selectedIds']}, delta
+
+
+def test_unkeyed_elements_round_trip():
+    """Elements without unique ids are stored as a whole array"""
+    print("🔍 Testing elements without ids...")
+    a, b, c = BASE_STATE['elements']
+    unkeyed = with_elements([a, {'type': 'text', 'text': 'Hall A'}, c])
+    delta = round_trip(BASE_STATE, unkeyed)
+    assert delta == {'set': {'elements': unkeyed['elements']}}, delta
+    round_trip(unkeyed, BASE_STATE)
+    round_trip(BASE_STATE, with_elements([a, b, booth('a', 90)]))
+
+
+def edit_states(count):
+    """`count` successive states, each one edit away from the previous"""
+    states = [copy.deepcopy(BASE_STATE)]
+    for i in range(1, count):
+        state = copy.deepcopy(states[-1])
+        elements = state['elements']
+        if i % 4 == 0 and len(elements) > 2:
+            elements.pop(1)
+        elif i % 4 == 1:
+            elements.append(booth(f'n{i}', i * 10))
+        elif i % 4 == 2:
+            elements.reverse()
+        else:
+            elements[0]['x'] += 5
+            state['settings']['grid']['size'] = i
+        states.append(state)
+    return states
+
+
+def test_reconstruct_across_snapshots():
+    """Every recorded version is reconstructed exactly, on either side of a snapshot"""
+    print("🔍 Testing snapshot boundaries...")
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    db = client[f'{client.get_default_database().name}_revisions']
+    client.drop_database(db.name)
+    saved_interval = Config.REVISION_SNAPSHOT_INTERVAL
+    Config.REVISION_SNAPSHOT_INTERVAL = 4
+    try:
+        floorplan_id = ObjectId()
+        states = edit_states(11)
+        previous = None
+        for version, state in enumerate(states, start=1):
+            record_revision(db, floorplan_id, version, state, previous_state=previous)
+            previous = state
+
+        kinds = [r['kind'] for r in db[REVISIONS_COLLECTION].find({'floorplan_id': floorplan_id}).sort('version', 1)]
+        assert kinds == ['snapshot', 'delta', 'delta', 'delta'] * 2 + ['snapshot', 'delta', 'delta'], kinds
+        for version, state in enumerate(states, start=1):
+            assert get_revision_state(db, floorplan_id, version) == state, f"version {version} differs"
+        assert get_revision_state(db, floorplan_id, len(states) + 1) is None
+    finally:
+        Config.REVISION_SNAPSHOT_INTERVAL = saved_interval
+        client.drop_database(db.name)
+
+
+def test_gaps_in_history():
+    """A missing revision starts a new snapshot and is never replayed across"""
+    print("🔍 Testing gaps in the revision history...")
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+    db = client[f'{client.get_default_database().name}_revisions']
+    client.drop_database(db.name)
+    saved_interval = Config.REVISION_SNAPSHOT_INTERVAL
+    Config.REVISION_SNAPSHOT_INTERVAL = 10
+    try:
+        floorplan_id = ObjectId()
+        states = edit_states(6)
+        previous = None
+        for version, state in enumerate(states[:3], start=1):
+            record_revision(db, floorplan_id, version, state, previous_state=previous)
+            previous = state
+        # Version 4 was written but its revision never recorded
+        revision = record_revision(db, floorplan_id, 5, states[4], previous_state=states[3])
+        assert revision['kind'] == 'snapshot', revision['kind']
+        assert get_revision_state(db, floorplan_id, 5) == states[4]
+        assert get_revision_state(db, floorplan_id, 4) is None
+
+        # A delta lost from the middle of a chain makes the later versions unavailable, not wrong
+        record_revision(db, floorplan_id, 6, states[5], previous_state=states[4])
+        db[REVISIONS_COLLECTION].delete_one({'floorplan_id': floorplan_id, 'version': 2})
+        assert get_revision_state(db, floorplan_id, 1) == states[0]
+        assert get_revision_state(db, floorplan_id, 3) is None
+        assert get_revision_state(db, floorplan_id, 6) == states[5]
+    finally:
+        Config.REVISION_SNAPSHOT_INTERVAL = saved_interval
+        client.drop_database(db.name)
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_element_changes_round_trip, test_nested_changes_round_trip,
+                 test_unkeyed_elements_round_trip, test_reconstruct_across_snapshots, test_gaps_in_history):
+        try:
+            test()
+            print(f"✅ {test.__name__} passed")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__} failed: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Startup test for IMTMA Flooring Backend
+Times importing the app and create_app() in a fresh interpreter against
+STARTUP_TIME_BUDGET, and checks that the detection stack is not loaded at
+startup. No server or database is needed: MONGODB_URI points at a closed
+port, so any database round trip during startup shows up as a timeout.
+
+    cd backend
+    python test_startup.py      (or: python -m pytest test_startup.py)
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from config import Config
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that belong to detection and must only load on the first detection request
+DETECTION_MODULES = ('cv2', 'numpy', 'PIL', 'ultralytics', 'torch',
+                     'detection', 'detection_hierarchy', 'detection_subsections',
+                     'subsection_manager', 'hall_detection')
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'created': app is not None,
+    'loaded': [name for name in %r if name in sys.modules]
+}))
+""" % (DETECTION_MODULES,)
+
+
+def measure_startup():
+    """Cold start in a new interpreter, so nothing is cached from this process"""
+    env = dict(os.environ, MONGODB_URI='mongodb://127.0.0.1:9/imtma_flooring?serverSelectionTimeoutMS=20000')
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_startup_time():
+    """create_app() (including imports) fits the startup budget"""
+    print("⏱️  Testing startup time...")
+    startup = measure_startup()
+    print(f"   {startup['seconds']:.3f}s (budget {Config.STARTUP_TIME_BUDGET:.1f}s)")
+    assert startup['created'], "create_app() returned None"
+    assert startup['seconds'] <= Config.STARTUP_TIME_BUDGET, \
+        f"Startup took {startup['seconds']:.2f}s, budget is {Config.STARTUP_TIME_BUDGET:.1f}s"
+
+def test_detection_stack_not_imported():
+    """The CV stack and detection modules are imported lazily"""
+    print("📦 Testing lazy detection imports...")
+    startup = measure_startup()
+    assert not startup['loaded'], f"Imported at startup: {', '.join(startup['loaded'])}"
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_startup_time, test_detection_stack_not_imported):
+        try:
+            test()
+            print(f"✅ {test.__name__} passed")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__} failed: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Request tracing test for IMTMA Flooring Backend
+Sends requests through the Flask test client with TRACE_EXPORT pointing at
+a scratch file and reads back the OTLP/JSON lines. Fails if a request that
+is not sampled (TRACE_SAMPLE_RATE 0, or a traceparent with flags 00)
+exports any span, or if the spans of a sampled request are not one trace
+under the request span. No server or database is needed.
+
+    cd backend
+    python test_tracing.py      (or: python -m pytest test_tracing.py)
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+from config import Config
+
+UNSAMPLED_TRACEPARENT = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00'
+
+
+def exported_spans(path):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for resource in json.loads(line)['resourceSpans']:
+                for scope in resource['scopeSpans']:
+                    spans.extend(scope['spans'])
+    return spans
+
+
+def traced_requests(sample_rate, requests):
+    """Spans exported for `requests` ((path, headers) pairs) at the given sample rate"""
+    import tracing
+    from app import create_app
+
+    saved = Config.TRACE_EXPORT, Config.TRACE_SAMPLE_RATE
+    fd, path = tempfile.mkstemp(suffix='.jsonl')
+    os.close(fd)
+    Config.TRACE_EXPORT, Config.TRACE_SAMPLE_RATE = path, sample_rate
+    try:
+        app = create_app()
+
+        @app.route('/api/_test/traced')
+        def traced():
+            with tracing.span('inner'):
+                with tracing.span('innermost'):
+                    pass
+            return {'ok': True}
+
+        client = app.test_client()
+        for request_path, headers in requests:
+            r = client.get(request_path, headers=headers)
+            assert r.status_code == 200, r.get_data(as_text=True)
+        tracing.exporter.shutdown()
+        return exported_spans(path)
+    finally:
+        Config.TRACE_EXPORT, Config.TRACE_SAMPLE_RATE = saved
+        os.remove(path)
+
+
+def test_unsampled_requests_export_no_spans():
+    """Requests that aren't sampled export neither a request span nor child spans"""
+    print("🔍 Testing unsampled requests...")
+    spans = traced_requests(0.0, [('/api/_test/traced', {})] * 20)
+    assert not spans, f"{len(spans)} spans exported at TRACE_SAMPLE_RATE=0: {sorted({s['name'] for s in spans})}"
+
+    spans = traced_requests(1.0, [('/api/_test/traced', {'traceparent': UNSAMPLED_TRACEPARENT})] * 20)
+    assert not spans, f"{len(spans)} spans exported for traceparent flags 00"
+
+
+def test_sampled_request_is_one_trace():
+    """The spans of a sampled request share its trace and hang off the request span"""
+    print("🔍 Testing sampled requests...")
+    spans = traced_requests(1.0, [('/api/_test/traced', {})])
+    names = {s['name']: s for s in spans}
+    assert set(names) == {'GET /api/_test/traced', 'inner', 'innermost'}, sorted(names)
+    root = names['GET /api/_test/traced']
+    assert 'parentSpanId' not in root
+    assert {s['traceId'] for s in spans} == {root['traceId']}
+    assert names['inner']['parentSpanId'] == root['spanId']
+    assert names['innermost']['parentSpanId'] == names['inner']['spanId']
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_unsampled_requests_export_no_spans, test_sampled_request_is_one_trace):
+        try:
+            test()
+            print(f"✅ {test.__name__} passed")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__} failed: {e}")
+    sys.exit(1 if failed else 0)
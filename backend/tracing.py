@@ -0,0 +1,414 @@
+"""
+Request tracing.
+
+A span is one timed step (name, trace / span / parent ids, start and end,
+attributes, status):
+
+    with span('hall_upload.save') as s:
+        file.save(path)
+        s.set_attribute('upload.bytes', os.path.getsize(path))
+
+Spans nest through a context variable. init_tracing() opens a root span per
+request, continuing the trace of an incoming W3C `traceparent` header, and
+returns the trace id in `X-Trace-Id`. Detection stages (stage_timer.py) and
+MongoDB commands on the shared client become child spans on their own.
+Work handed to another thread or process carries the context along:
+
+    job = {'hall_id': hall_id, 'trace': inject()}               # when enqueuing
+    with continue_trace(job.get('trace'), 'jobs.detect_hall'):  # in the worker
+        ...
+
+Finished spans are exported as OTLP/JSON, the JSON encoding of the
+OpenTelemetry protocol: one ExportTraceServiceRequest per line, as read by
+the Collector's otlpjsonfile receiver (and from there Jaeger, Tempo, ...).
+TRACE_EXPORT is '' (off: span() returns a shared no-op span), 'stdout' or a
+file path. A writer thread batches the spans, so exporting never blocks a
+request; spans are dropped when its queue is full. TRACE_SAMPLE_RATE picks
+the fraction of new traces to record; continued traces keep the caller's
+decision. While a span is open its trace and span ids are on every log
+record (logs.py).
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from flask import g, request
+from pymongo import monitoring
+from config import Config
+from logs import bind_log_context, unbind_log_context
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def _attribute_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class Span:
+    """A recorded span; use as a context manager or call end()"""
+
+    recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.events: List[Dict] = []
+        self.status = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = None
+        self._log_token = None
+
+    def set_attribute(self, key: str, value) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.events.append({'name': 'exception', 'time_ns': time.time_ns(), 'attributes': {
+            'exception.type': type(exc).__name__, 'exception.message': str(exc)
+        }})
+        self.status = (STATUS_ERROR, str(exc))
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self._log_token = bind_log_context(trace_id=self.trace_id, span_id=self.span_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        self.end()
+        return False
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._log_token is not None:
+            unbind_log_context(self._log_token)
+            self._log_token = None
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        exporter.export(self)
+
+    def traceparent(self) -> str:
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def to_otlp(self) -> Dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': k, 'value': _attribute_value(v)} for k, v in self.attributes.items()]
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.events:
+            span['events'] = [{
+                'name': e['name'],
+                'timeUnixNano': str(e['time_ns']),
+                'attributes': [{'key': k, 'value': _attribute_value(v)} for k, v in e['attributes'].items()]
+            } for e in self.events]
+        if self.status:
+            code, message = self.status
+            span['status'] = {'code': code, 'message': message} if message else {'code': code}
+        return span
+
+
+class _NoopSpan:
+    """Stands in for a span that isn't recorded (tracing off or trace not sampled)"""
+
+    recording = False
+    trace_id = None
+    span_id = None
+
+    def __init__(self, parent_sampled_out: bool = False):
+        # A no-op child of an unsampled trace keeps its children unsampled too
+        self.sampled_out = parent_sampled_out
+        self._token = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+    def __enter__(self):
+        if self.sampled_out:
+            self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end()
+        return False
+
+    def end(self):
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+
+    def traceparent(self):
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def tracing_enabled() -> bool:
+    return bool(Config.TRACE_EXPORT)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def set_current_attributes(**attributes) -> None:
+    """Add attributes to the current span, if it is recorded"""
+    current = _current_span.get()
+    if current is not None and current.recording:
+        current.set_attributes(attributes)
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, traceparent: str = None, **attributes):
+    """A child of the current span, a continuation of `traceparent`, or a new trace"""
+    if not tracing_enabled():
+        return _NOOP_SPAN
+    parent = _current_span.get()
+    if parent is not None:
+        if not parent.recording:
+            return _NoopSpan(parent_sampled_out=True)
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+    match = _TRACEPARENT.match(traceparent or '')
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        if not int(flags, 16) & 1:
+            return _NoopSpan(parent_sampled_out=True)
+        return Span(name, trace_id, parent_id, kind, attributes)
+    if random.random() >= Config.TRACE_SAMPLE_RATE:
+        return _NoopSpan(parent_sampled_out=True)
+    return Span(name, os.urandom(16).hex(), None, kind, attributes)
+
+
+def span(name: str, **attributes):
+    """Context manager for a span named `name` under the current one"""
+    return start_span(name, **attributes)
+
+
+def inject() -> Dict:
+    """Trace context to hand to a background job ({} outside a recorded span)"""
+    current = _current_span.get()
+    if current is None:
+        return {}
+    if not current.recording:
+        return {'traceparent': f'00-{"0" * 32}-{"0" * 16}-00'}
+    return {'traceparent': current.traceparent()}
+
+
+@contextmanager
+def continue_trace(carrier: Optional[Dict], name: str, **attributes):
+    """Root span of a background job, in the trace of the request that queued it"""
+    traceparent = (carrier or {}).get('traceparent')
+    with start_span(name, traceparent=traceparent, **attributes) as job_span:
+        yield job_span
+
+
+class SpanExporter:
+    """Batches finished spans and writes them as OTLP/JSON lines from a writer thread"""
+
+    BATCH_SIZE = 512
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # A forked worker inherits the queue but not the writer thread
+                self._queue = queue.Queue(self.maxsize)
+                self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def export(self, span: Span) -> None:
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(span.to_otlp())
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                return
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            stop = False
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, spans: List[Dict]) -> None:
+        line = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': Config.TRACE_SERVICE_NAME}},
+                {'key': 'host.name', 'value': {'stringValue': socket.gethostname()}},
+                {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}
+            ]},
+            'scopeSpans': [{'scope': {'name': 'imtma-flooring'}, 'spans': spans}]
+        }]})
+        try:
+            if Config.TRACE_EXPORT == 'stdout':
+                sys.stdout.write(line + '\n')
+                sys.stdout.flush()
+            else:
+                with open(Config.TRACE_EXPORT, 'a') as f:
+                    f.write(line + '\n')
+        except OSError:
+            self.dropped += len(spans)
+
+    def shutdown(self) -> None:
+        """Write what is queued and stop the writer"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                try:
+                    self._queue.put(None, timeout=1)
+                    self._thread.join(timeout=5)
+                except queue.Full:
+                    pass
+            self._thread = None
+
+
+exporter = SpanExporter(Config.TRACE_QUEUE_SIZE)
+atexit.register(exporter.shutdown)
+
+
+class TracingCommandListener(monitoring.CommandListener):
+    """A client span per MongoDB command issued inside a recorded span"""
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None or not parent.recording:
+            return
+        collection = event.command.get(event.command_name)
+        command_span = Span(f'mongodb.{event.command_name}', parent.trace_id, parent.span_id, SPAN_KIND_CLIENT, {
+            'db.system': 'mongodb',
+            'db.name': event.database_name,
+            'db.operation': event.command_name
+        })
+        if isinstance(collection, str):
+            command_span.set_attribute('db.mongodb.collection', collection)
+        self._spans[(event.connection_id, event.request_id)] = command_span
+
+    def succeeded(self, event):
+        command_span = self._spans.pop((event.connection_id, event.request_id), None)
+        if command_span is not None:
+            command_span.end()
+
+    def failed(self, event):
+        command_span = self._spans.pop((event.connection_id, event.request_id), None)
+        if command_span is not None:
+            command_span.status = (STATUS_ERROR, str(event.failure.get('errmsg', '')))
+            command_span.end()
+
+
+mongo_tracing_listener = TracingCommandListener()
+
+
+def init_tracing(app):
+    """A root span per request (no-op when TRACE_EXPORT is unset)"""
+    if not tracing_enabled():
+        return
+
+    @app.before_request
+    def start_request_span():
+        request_span = start_span(f'{request.method} {request.path}', SPAN_KIND_SERVER,
+                                  traceparent=request.headers.get('traceparent'))
+        # Entered even when not sampled, so the spans of the request stay unsampled with it
+        g.request_span = request_span.__enter__()
+        if not request_span.recording:
+            return
+        request_span.set_attributes({
+            'http.method': request.method,
+            'http.target': request.full_path.rstrip('?'),
+            'http.route': request.url_rule.rule if request.url_rule else None,
+            'http.request_content_length': request.content_length,
+            'request_id': g.get('request_id')
+        })
+        if request.url_rule:
+            request_span.name = f'{request.method} {request.url_rule.rule}'
+
+    @app.after_request
+    def tag_request_span(response):
+        request_span = g.get('request_span')
+        if request_span is not None and request_span.recording:
+            request_span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                request_span.status = (STATUS_ERROR, None)
+            response.headers['X-Trace-Id'] = request_span.trace_id
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc=None):
+        request_span = g.pop('request_span', None)
+        if request_span is not None:
+            request_span.__exit__(type(exc) if exc else None, exc, None)
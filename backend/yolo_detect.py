@@ -1,9 +1,15 @@
+import logging
 import os
 from typing import List, Dict, Any, Optional
+from stage_timer import stage
+
+log = logging.getLogger(__name__)
 
 # Lazy import to allow backend to start even if ultralytics isn't installed yet
 _YOLO_MODEL = None
 _YOLO_LOAD_ERROR: Optional[str] = None
+# Set after the first successful inference (the first one also initializes the backend)
+_YOLO_WARMED = False
 
 
 def _load_model() -> Optional[object]:
@@ -26,6 +32,15 @@ def _load_model() -> Optional[object]:
         return None
 
 
+def model_status() -> Dict[str, Any]:
+    """Load state of the model in this process; never loads it"""
+    return {
+        'loaded': _YOLO_MODEL is not None,
+        'warmed': _YOLO_WARMED,
+        'error': _YOLO_LOAD_ERROR
+    }
+
+
 def detect_booths(image_path: str,
                   conf: float = 0.25,
                   iou: float = 0.45,
@@ -39,14 +54,18 @@ def detect_booths(image_path: str,
     booth_class_names: optional list of class names to include (e.g., ['booth', 'table'])
     If None, all detections are returned.
     """
-    model = _load_model()
+    with stage('model_load'):
+        model = _load_model()
     if model is None:
         # Provide empty, but include a hint in score
         return []
 
+    global _YOLO_WARMED
     try:
-        # Run inference
-        results = model.predict(source=image_path, conf=conf, iou=iou, verbose=False)
+        # Run inference (decode, preprocess and the forward pass)
+        with stage('inference'):
+            results = model.predict(source=image_path, conf=conf, iou=iou, verbose=False)
+        _YOLO_WARMED = True
         if not results:
             return []
         result = results[0]
@@ -94,5 +113,5 @@ def detect_booths(image_path: str,
         return rects
     except Exception as e:
         # On any failure, return empty list; backend handler can log details
-        print(f"YOLO detection error: {e}")
+        log.exception("YOLO detection error: %s", e)
         return []
\ No newline at end of file